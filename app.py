@@ -3,7 +3,7 @@ import os
 import json
 import base64
 import datetime
-import tempfile
+import time
 from data.data_loader import DataLoader
 from components.slides.summary_slide import SummarySlide
 from components.slides.income_statement_slide import IncomeStatementSlide
@@ -26,7 +26,12 @@ from data.financial_statement_processor import FinancialStatementProcessor
 
 # PDF 재무제표 추출기 임포트
 from pdf_extractor_app import FinancialStatementDetector, PDFViewer
-import pdfplumber
+from data.pdf_session import PdfDocumentSession
+from data.context_packer import ContextPacker
+from data.llm_cache import format_cache_stats, format_usage_stats
+from data.extraction_pipeline import ExtractionPipeline
+from data.image_optimizer import format_image_stats
+from data.stream_json import StreamDivergenceError
 
 def get_image_as_base64(file_path):
     with open(file_path, "rb") as img_file:
@@ -58,27 +63,21 @@ def get_available_companies():
     
     return companies
 
-def extract_text_from_pdf_pages(pdf_path, pages):
-    """선택된 페이지들에서만 텍스트 추출"""
-    text = ""
+def extract_text_from_pdf_pages(pdf_path, pages, page_scores=None, packer=None):
+    """선택된 페이지들에서만 텍스트 추출 (토큰 예산 초과 시 탐지 점수가 높은 페이지 우선)
+    
+    pdf_path는 파일 경로, PDF 바이트 또는 문서 세션이며, 탐지에 사용한 세션을 전달하면
+    탐지 단계에서 추출한 페이지 텍스트를 다시 파싱하지 않고 재사용함
+    """
+    packer = packer or ContextPacker()
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            total_pages = len(pdf.pages)
-            for page_num in pages:
-                # 0-인덱스로 변환 및 범위 확인
-                idx = page_num - 1
-                if 0 <= idx < total_pages:
-                    page = pdf.pages[idx]
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += f"\n--- 페이지 {page_num} ---\n"
-                        text += page_text
+        return packer.pack(pdf_path, pages, page_scores)
     except Exception as e:
         st.error(f"PDF 텍스트 추출 오류: {str(e)}")
     
     return {
-        "text": text,
-        "pages": len(pages)
+        "text": "",
+        "pages": 0
     }
 
 def extract_financial_statement_pages(pdf_path):
@@ -92,6 +91,14 @@ def extract_financial_statement_pages(pdf_path):
         st.error(f"재무제표 페이지 탐지 오류: {str(e)}")
         return [], {}
 
+def show_validation_issues(issues, limit=5):
+    """분석 결과가 JSON 템플릿 구조와 다른 항목 표시 (결과는 그대로 사용)"""
+    if not issues:
+        return
+    shown = ", ".join(issues[:limit])
+    more = f" 외 {len(issues) - limit}개" if len(issues) > limit else ""
+    st.warning(f"분석 결과 검증: 템플릿과 다른 항목이 있습니다 - {shown}{more}")
+
 def main():
     st.set_page_config(
         page_title="Financial Analysis System",
@@ -161,6 +168,48 @@ def main():
             # 재무제표 분석 설정
             st.sidebar.markdown("### PDF 분석 설정")
             auto_detect = st.sidebar.checkbox("재무제표 페이지 자동 탐지", value=True)
+            early_stop = st.sidebar.checkbox(
+                "재무제표 블록 이후 조기 종료",
+                value=False,
+                help="연결/별도 재무제표를 모두 찾은 뒤 주석 페이지가 이어지면 나머지 페이지 스캔을 생략합니다."
+            )
+            llm_input_mode = st.sidebar.radio(
+                "LLM 입력 형식",
+                options=["text", "tables"],
+                format_func=lambda mode: {"text": "페이지 텍스트", "tables": "압축 표 (TSV)"}[mode],
+                help="압축 표는 탐지된 페이지의 표만 탭 구분 형식으로 전달하여 입력 토큰을 줄입니다."
+            )
+            extraction_mode = st.sidebar.radio(
+                "LLM 추출 방식",
+                options=["single", "statements", "local"],
+                format_func=lambda mode: {
+                    "single": "단일 요청",
+                    "statements": "재무제표 유형별 동시 요청",
+                    "local": "로컬 표 파싱 우선"
+                }[mode],
+                help="유형별 동시 요청은 재무상태표/손익계산서/현금흐름표를 각각 작은 요청으로 동시에 추출하고 "
+                     "비율과 성장률은 추출된 금액으로 직접 계산합니다. 로컬 표 파싱 우선은 표준 계정과목 표를 "
+                     "LLM 없이 읽고 찾지 못한 항목만 요청합니다. 자동 탐지된 페이지가 있을 때만 적용됩니다."
+            )
+            include_narrative = True
+            if extraction_mode != "single":
+                include_narrative = st.sidebar.checkbox(
+                    "인사이트/결론 작성 (LLM)",
+                    value=True,
+                    help="끄면 재무 수치만 추출합니다. 로컬 표 파싱과 함께 사용하면 API 호출 없이 분석할 수 있습니다."
+                )
+            pack_image_requests = True
+            if len(image_files) > 1:
+                pack_image_requests = st.sidebar.checkbox(
+                    "이미지 여러 장을 한 요청으로 분석",
+                    value=True,
+                    help="같은 보고서의 여러 페이지를 촬영한 경우 최대 4장씩 한 요청에 담아 함께 분석합니다."
+                )
+            processor.use_response_cache = st.sidebar.checkbox(
+                "LLM 응답 캐시 사용",
+                value=True,
+                help="같은 입력으로 이전에 받은 분석 결과를 재사용합니다. 끄면 Claude API를 다시 호출합니다."
+            )
             
             # 민감도 설정 (자동 탐지 활성화된 경우만)
             detection_sensitivity = 5
@@ -179,6 +228,8 @@ def main():
                     
                     # PDF 파일 처리
                     if pdf_files:
+                        pdf_session = None
+                        started = time.perf_counter()
                         try:
                             # 진행 상태 표시
                             progress_bar = st.progress(0)
@@ -188,16 +239,16 @@ def main():
                             status_text.text("PDF 파일 병합 중...")
                             progress_bar.progress(25)
                             
+                            # 병합된 PDF는 임시 파일 없이 메모리에서 한 번만 열어 탐지/텍스트 추출 단계가 공유
                             merged_pdf = processor.merge_pdfs(pdf_files)
-                            
-                            # 임시 파일로 저장
-                            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                                tmp_file.write(merged_pdf)
-                                pdf_path = tmp_file.name
+                            pdf_session = PdfDocumentSession(merged_pdf)
                             
                             # 자동 탐지 활성화된 경우에만 재무제표 페이지 탐지
                             detected_pages = []
                             statement_types = {}
+                            page_scores = {}  # 토큰 예산 초과 시 페이지 우선순위
+                            
+                            pipeline_result = None  # 유형별 동시 요청 모드에서 탐지와 함께 받은 추출 결과
                             
                             if auto_detect:
                                 status_text.text("재무제표 페이지 탐지 중...")
@@ -209,8 +260,38 @@ def main():
                                     detector.min_score_threshold = 5 + (detection_sensitivity - 5) * 1  # 5~15 범위
                                     detector.min_accounts_required = max(2, int(3 + (detection_sensitivity - 5) * 0.5))  # 2~5 범위
                                     detector.numeric_content_ratio = 0.15 + (detection_sensitivity - 5) * 0.03  # 0.15~0.3 범위
+                                if early_stop:
+                                    detector.early_stop = True
+                                    detector.early_stop_sets = ("연결", "별도")
+                                
+                                # 페이지별 판정 결과를 받으면서 진행 상태 갱신 (40~60%)
+                                def track_verdict(verdict):
+                                    if verdict['type']:
+                                        detected_pages.append(verdict['page_num'])
+                                        statement_types[verdict['page_num']] = verdict['type']
+                                        page_scores[verdict['page_num']] = verdict['score']
+                                    progress_bar.progress(40 + int(20 * verdict['page_num'] / verdict['total_pages']))
+                                    status_text.text(
+                                        f"재무제표 페이지 탐지 중... {verdict['page_num']}/{verdict['total_pages']}페이지 "
+                                        f"(발견 {len(detected_pages)}페이지)"
+                                    )
+                                
+                                if extraction_mode in ("statements", "local"):
+                                    # 재무제표 블록이 확정되는 대로 유형별 추출 요청을 보내고 나머지 페이지 스캔을 계속함
+                                    pipeline = ExtractionPipeline(
+                                        detector, processor, input_mode=llm_input_mode, workers=os.cpu_count(),
+                                        use_local_parser=extraction_mode == "local",
+                                        include_narrative=include_narrative
+                                    )
+                                    pipeline_result = pipeline.run(pdf_session, on_verdict=track_verdict)
+                                else:
+                                    for verdict in detector.iter_detect_financial_statements(pdf_session, workers=os.cpu_count()):
+                                        track_verdict(verdict)
                                 
-                                detected_pages, statement_types = detector.detect_financial_statements(pdf_path)
+                                # 1차 필터 제외율 및 단계별 소요 시간 (또는 캐시 사용 여부) 표시
+                                scan_summary = detector.format_scan_stats()
+                                if scan_summary:
+                                    st.caption(scan_summary)
                                 
                                 # 탐지 결과 표시
                                 if detected_pages:
@@ -240,67 +321,140 @@ def main():
                                 else:
                                     st.warning("재무제표 페이지를 찾을 수 없습니다. 전체 PDF 내용을 분석합니다.")
                             
-                            # 데이터 추출 부분
-                            progress_bar.progress(60)
-                            status_text.text("텍스트 추출 중...")
-                            
-                            # 탐지된 페이지만 처리하거나 전체 PDF 처리
-                            if auto_detect and detected_pages:
-                                # 탐지된 페이지에서만 텍스트 추출
-                                file_data = extract_text_from_pdf_pages(pdf_path, detected_pages)
-                                status_text.text(f"탐지된 {len(detected_pages)}개 재무제표 페이지 분석 중...")
-                            else:
-                                # 전체 PDF에서 텍스트 추출
-                                file_data = processor.extract_text_from_pdf(merged_pdf)
-                                status_text.text("전체 PDF 내용 분석 중...")
-                            
-                            progress_bar.progress(75)
-                            
-                            # Claude API 호출
-                            json_result = processor.process_with_claude(file_data)
-                            
-                            progress_bar.progress(90)
-                            
-                            # JSON 결과 정리
-                            try:
-                                parsed_json = processor.parse_json_response(json_result)
-                                results.append(parsed_json)
+                            if pipeline_result is not None and pipeline_result['company_data'] is not None:
+                                # 탐지와 겹쳐 실행된 재무제표 유형별 추출 결과 사용
+                                for name, error in pipeline_result['failures'].items():
+                                    st.warning(f"{name} 추출 실패: {error}")
+                                st.caption(ExtractionPipeline.format_timings(pipeline_result['timings']))
+                                results.append(pipeline_result['company_data'])
                                 progress_bar.progress(100)
                                 status_text.text("분석 완료!")
-                            except json.JSONDecodeError as e:
-                                st.error(f"JSON 파싱 오류: {str(e)}")
-                                st.error("디버깅을 위한 LLM 출력 결과:")
-                                st.code(json_result, language="json")
-                                return
-                            
-                            # 임시 파일 삭제
-                            try:
-                                os.unlink(pdf_path)
-                            except:
-                                pass
+                            else:
+                                # 데이터 추출 부분
+                                progress_bar.progress(60)
+                                status_text.text("텍스트 추출 중...")
+                                
+                                # 탐지된 페이지만 처리하거나 전체 PDF 처리
+                                if auto_detect and detected_pages:
+                                    # 탐지된 페이지에서만 텍스트 추출
+                                    file_data = extract_text_from_pdf_pages(
+                                        pdf_session, detected_pages, page_scores, processor.context_packer
+                                    )
+                                    status_text.text(f"탐지된 {len(detected_pages)}개 재무제표 페이지 분석 중...")
+                                else:
+                                    # 전체 PDF에서 재무제표 관련도가 높은 페이지 위주로 텍스트 추출
+                                    file_data = processor.extract_text_from_pdf(pdf_session)
+                                    status_text.text("전체 PDF 내용 분석 중...")
+                                
+                                # 압축 표 입력 형식 - 같은 페이지 범위의 표를 TSV로 변환하고 토큰 수를 함께 표시
+                                if llm_input_mode == "tables":
+                                    table_pages = detected_pages if auto_detect and detected_pages else None
+                                    table_data = processor.extract_tables_from_pdf(pdf_session, table_pages, page_scores)
+                                    if table_data['text']:
+                                        text_tokens = file_data.get('estimated_tokens', 0)
+                                        table_tokens = table_data['estimated_tokens']
+                                        saving = 1 - table_tokens / text_tokens if text_tokens else 0
+                                        st.caption(
+                                            f"입력 토큰(추정): 페이지 텍스트 {text_tokens:,} · 압축 표 {table_tokens:,} "
+                                            f"({saving:.0%} 절감)"
+                                        )
+                                        file_data = table_data
+                                    else:
+                                        st.warning("추출된 표가 없어 페이지 텍스트로 분석합니다.")
+                                
+                                # 토큰 예산으로 일부 페이지만 사용한 경우 표시
+                                if file_data.get('truncated'):
+                                    st.caption(
+                                        f"토큰 예산({processor.context_packer.token_budget:,})에 맞춰 "
+                                        f"{file_data['pages']}개 페이지(추정 {file_data['estimated_tokens']:,}토큰)를 분석에 사용합니다."
+                                    )
+                                
+                                progress_bar.progress(75)
+                                
+                                # Claude API 호출 - 응답을 스트리밍으로 받으며 완성된 항목을 바로 표시
+                                received_sections = []
+                                section_preview = st.empty()
+                                
+                                def show_section(key, value):
+                                    if not received_sections:
+                                        st.caption(f"첫 항목 수신 {time.perf_counter() - started:.1f}초")
+                                    received_sections.append(key)
+                                    progress_bar.progress(min(89, 75 + len(received_sections)))
+                                    status_text.text(f"분석 결과 수신 중... {len(received_sections)}개 항목 완료 ({key})")
+                                    if key == "performance_data" and isinstance(value, dict):
+                                        with section_preview.container():
+                                            st.write("**실적 데이터 (수신 완료)**")
+                                            st.dataframe(value, use_container_width=True)
+                                
+                                try:
+                                    json_result = processor.process_with_claude(file_data, on_section=show_section)
+                                except StreamDivergenceError as e:
+                                    st.error(f"LLM 응답이 JSON 형식에서 벗어나 생성을 중단했습니다: {str(e)}")
+                                    st.error("디버깅을 위한 LLM 출력 결과:")
+                                    st.code(e.partial_text, language="json")
+                                    return
+                                section_preview.empty()
+                                
+                                progress_bar.progress(90)
+                                
+                                # JSON 결과 정리
+                                try:
+                                    parsed_json = processor.parse_json_response(json_result)
+                                    show_validation_issues(processor.validate_json_result(parsed_json))
+                                    results.append(parsed_json)
+                                    progress_bar.progress(100)
+                                    status_text.text("분석 완료!")
+                                    st.caption(f"전체 처리 시간 {time.perf_counter() - started:.1f}초")
+                                except json.JSONDecodeError as e:
+                                    st.error(f"JSON 파싱 오류: {str(e)}")
+                                    st.error("디버깅을 위한 LLM 출력 결과:")
+                                    st.code(json_result, language="json")
+                                    return
                         
                         except Exception as e:
                             st.error(f"PDF 처리 오류: {str(e)}")
                             return
+                        
+                        finally:
+                            # 문서 세션 해제
+                            if pdf_session is not None:
+                                pdf_session.close()
                     
-                    # 이미지 파일 처리
-                    for image_file in image_files:
+                    # 이미지 파일 처리 - 전송용으로 줄인 이미지를 동시에 요청하고 업로드 순서대로 결과 확인
+                    if image_files:
                         try:
-                            file_data = processor.process_image(image_file)
-                            json_result = processor.process_with_claude(file_data)
+                            image_data_list, optimized_images = processor.prepare_images(
+                                image_files, pack=pack_image_requests
+                            )
+                            st.caption(format_image_stats(optimized_images, len(image_data_list)))
+                            
+                            started = time.perf_counter()
+                            json_results = processor.process_many_with_claude(image_data_list)
+                            st.caption(f"이미지 분석 시간 {time.perf_counter() - started:.1f}초")
+                        except Exception as e:
+                            st.error(f"이미지 처리 오류: {str(e)}")
+                            return
+                        
+                        for json_result in json_results:
+                            if isinstance(json_result, Exception):
+                                st.error(f"이미지 처리 오류: {str(json_result)}")
+                                return
                             
                             try:
                                 parsed_json = processor.parse_json_response(json_result)
+                                show_validation_issues(processor.validate_json_result(parsed_json))
                                 results.append(parsed_json)
                             except json.JSONDecodeError as e:
                                 st.error(f"JSON 파싱 오류: {str(e)}")
                                 st.error("디버깅을 위한 LLM 출력 결과:")
                                 st.code(json_result, language="json")
                                 return
-                        
-                        except Exception as e:
-                            st.error(f"이미지 처리 오류: {str(e)}")
-                            return
+                    
+                    # LLM 응답 캐시 적중/미적중 현황과 API 토큰 사용량(프롬프트 캐시 쓰기/읽기 포함)
+                    st.caption(format_cache_stats(processor.response_cache))
+                    usage_summary = format_usage_stats(processor.usage_log)
+                    if usage_summary:
+                        st.caption(usage_summary)
                     
                     if results:
                         # 결과를 session_state에 저장
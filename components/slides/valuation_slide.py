@@ -193,8 +193,20 @@ class ValuationSlide(BaseSlide):
             if st.button("AI 기업 가치 평가 시작", type="primary", use_container_width=True, key="start_valuation_btn"):
                 with st.spinner("AI가 기업 가치를 평가 중입니다. 잠시만 기다려주세요..."):
                     
-                    # 가치 평가 실행
-                    valuation_results = self._run_valuation_analysis()
+                    # 가치 평가 실행 - 응답을 스트리밍으로 받으며 완성된 평가 항목을 바로 표시
+                    section_status = st.empty()
+                    received_sections = []
+                    
+                    def show_section(key, value):
+                        received_sections.append(key)
+                        message = f"평가 결과 수신 중... {len(received_sections)}/6개 항목 완료"
+                        if key in ("ebitda_valuation", "dcf_valuation") and isinstance(value, dict):
+                            method = "EBITDA" if key == "ebitda_valuation" else "DCF"
+                            message += f" · {method} 기본 시나리오 {value.get('base', '-')}억원"
+                        section_status.info(message)
+                    
+                    valuation_results = self._run_valuation_analysis(on_section=show_section)
+                    section_status.empty()
                     
                     # 세션 상태에 결과 저장
                     if valuation_results["status"] == "success":
@@ -205,8 +217,12 @@ class ValuationSlide(BaseSlide):
                     else:
                         st.error(f"분석 오류: {valuation_results.get('message', '알 수 없는 오류')}")
     
-    def _run_valuation_analysis(self):
-        """기업 가치 평가 분석 실행"""
+    def _run_valuation_analysis(self, on_section=None):
+        """기업 가치 평가 분석 실행
+        
+        Args:
+            on_section (callable, optional): 스트리밍 응답의 최상위 항목이 완성될 때마다 호출할 함수 (키, 값)
+        """
         # API 키 확인
         api_key = st.secrets.get("anthropic_api_key", None) if hasattr(st, "secrets") else None
         if not api_key:
@@ -266,7 +282,8 @@ class ValuationSlide(BaseSlide):
             company_info, 
             financial_data, 
             industry_info,
-            api_key
+            api_key,
+            on_section=on_section
         )
     
     def _render_valuation_results(self):
@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("finance_analysis.cache")
+
+
+class FileCacheStore:
+    """JSON 파일 기반 로컬 캐시 저장소
+
+    항목마다 하나의 파일로 저장하고 임시 파일 + os.replace로 원자적으로 기록하므로
+    여러 Streamlit 세션(프로세스/스레드)이 같은 디렉토리를 동시에 사용해도 안전함.
+    파일 수정 시각을 마지막 사용 시각으로 사용하여 전체 크기 초과 시 LRU 순서로 제거함.
+    memory_items를 지정하면 최근 항목을 메모리에도 보관하여 디스크 읽기와 JSON 파싱을 생략함.
+    ttl_seconds를 지정하면 저장 시각을 함께 기록하고 유효 기간이 지난 항목은 없는 것으로 처리함.
+    """
+
+    def __init__(self, namespace, cache_dir=None, max_bytes=200 * 1024 * 1024, memory_items=0, ttl_seconds=None):
+        """
+        FileCacheStore 클래스 초기화
+
+        Args:
+            namespace (str): 캐시 종류별 하위 디렉토리 이름
+            cache_dir (str, optional): 캐시 루트 디렉토리. 없으면 data/cache 사용
+            max_bytes (int, optional): 캐시 디렉토리 최대 크기 (바이트)
+            memory_items (int, optional): 메모리에 함께 보관할 최근 항목 수 (0이면 사용 안 함)
+            ttl_seconds (float, optional): 항목 유효 기간 (초). 없으면 크기 초과 시에만 제거
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+        self.cache_dir = os.path.join(cache_dir, namespace)
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    @staticmethod
+    def make_key(*parts):
+        """키 구성 요소들로 SHA-256 캐시 키 생성"""
+        digest = hashlib.sha256()
+        for part in parts:
+            if not isinstance(part, (bytes, bytearray)):
+                part = json.dumps(part, ensure_ascii=False, sort_keys=True).encode("utf-8")
+            digest.update(part)
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_file(file_path, chunk_size=1024 * 1024):
+        """파일 내용의 SHA-256 해시 계산"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def hash_bytes(data):
+        """메모리에 있는 바이트 데이터의 SHA-256 해시 계산"""
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """캐시 항목 조회 (없거나 손상되었거나 유효 기간이 지난 경우 None)"""
+        record = None
+        if self.memory_items:
+            with self._memory_lock:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    record = self._memory[key]
+
+        path = self._path(key)
+        if record is None:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError, OSError):
+                self.misses += 1
+                return None
+
+            # 마지막 사용 시각 갱신 (LRU)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self._remember(key, record)
+
+        if self.ttl_seconds is not None:
+            if not isinstance(record, dict) or time.time() - record.get("created_at", 0) > self.ttl_seconds:
+                self._discard(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+            record = record.get("value")
+
+        self.hits += 1
+        return record
+
+    def set(self, key, value):
+        """캐시 항목 저장 후 크기 초과 시 오래된 항목 제거"""
+        if self.ttl_seconds is not None:
+            value = {"created_at": time.time(), "value": value}
+        self._remember(key, value)
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp_", suffix=".json")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(value, f, ensure_ascii=False)
+                os.replace(temp_path, self._path(key))
+            except Exception:
+                os.unlink(temp_path)
+                raise
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"캐시 저장 실패: {str(e)}")
+            return
+
+        self._evict()
+
+    def stats(self):
+        """캐시 적중/미적중 횟수와 현재 저장된 항목 수, 전체 크기 반환"""
+        entries = self._scan_entries()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries)
+        }
+
+    def _discard(self, key):
+        """항목을 메모리와 디스크에서 제거"""
+        with self._memory_lock:
+            self._memory.pop(key, None)
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"캐시 항목 삭제 실패: {str(e)}")
+
+    def _remember(self, key, value):
+        """최근 항목을 메모리에 보관 (memory_items 초과 시 가장 오래된 항목 제거)"""
+        if not self.memory_items:
+            return
+
+        with self._memory_lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _scan_entries(self):
+        """캐시 디렉토리의 (마지막 사용 시각, 크기, 경로) 목록"""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(".json") or entry.name.startswith(".tmp_"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue  # 다른 세션이 이미 제거함
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _evict(self):
+        """전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 항목부터 제거"""
+        entries = self._scan_entries()
+        total_bytes = sum(size for _, size, _ in entries)
+
+        if total_bytes <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(entries):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            if total_bytes <= self.max_bytes:
+                break
@@ -0,0 +1,179 @@
+import re
+import math
+import logging
+
+from data.pdf_session import PdfDocumentSession
+
+logger = logging.getLogger("finance_analysis.context_packer")
+
+# 점수 정보가 없을 때 페이지 관련도 계산에 사용할 기본 재무제표 키워드
+DEFAULT_QUERY_TERMS = [
+    "재무상태표", "손익계산서", "포괄손익계산서", "현금흐름표", "자본변동표",
+    "자산총계", "부채총계", "자본총계", "유동자산", "비유동자산", "유동부채",
+    "매출액", "매출원가", "영업이익", "법인세비용", "당기순이익",
+    "영업활동", "투자활동", "재무활동", "이익잉여금"
+]
+
+
+def estimate_tokens(text):
+    """LLM 입력 토큰 수 추정 (한글 음절은 약 1토큰, 그 외 문자는 약 3.5자당 1토큰)"""
+    if not text:
+        return 0
+    hangul_chars = len(re.findall(r'[가-힣]', text))
+    return hangul_chars + math.ceil((len(text) - hangul_chars) / 3.5)
+
+
+class ContextPacker:
+    """토큰 예산 안에서 재무제표와 관련도가 높은 페이지부터 LLM 입력 텍스트로 묶는 클래스
+
+    탐지기 점수가 있으면 점수 순으로, 없으면 재무제표 키워드에 대한 BM25 관련도 순으로 페이지를 고르고
+    예산이 찰 때까지만 텍스트를 추출함. 선택된 페이지는 문서 순서대로 이어붙임.
+    """
+
+    def __init__(self, token_budget=12000, query_terms=None):
+        """
+        ContextPacker 클래스 초기화
+
+        Args:
+            token_budget (int, optional): 묶을 텍스트의 최대 추정 토큰 수
+            query_terms (list, optional): BM25 관련도 계산에 사용할 키워드 목록
+        """
+        self.token_budget = token_budget
+        self.query_terms = [
+            re.sub(r'\s+', '', term) for term in (query_terms or DEFAULT_QUERY_TERMS) if term.strip()
+        ]
+        self.bm25_k1 = 1.2
+        self.bm25_b = 0.75
+
+    def pack(self, pdf_source, pages=None, page_scores=None, layout_text=True, page_encoder=None):
+        """
+        PDF 페이지들을 토큰 예산 안에서 관련도 순으로 골라 하나의 텍스트로 묶음
+
+        Args:
+            pdf_source (str | bytes | PdfDocumentSession): PDF 파일 경로, PDF 바이트 또는 문서 세션
+            pages (list, optional): 후보 페이지 번호 목록 (없으면 전체 페이지)
+            page_scores (dict, optional): 페이지 번호별 탐지기 점수 (없으면 BM25 관련도 사용)
+            layout_text (bool, optional): True면 pdfplumber 레이아웃 텍스트, False면 PyMuPDF 텍스트 사용
+            page_encoder (callable, optional): (세션, 페이지 번호)를 받아 페이지 텍스트를 만드는 함수
+                (예: TableEncoder.encode_pdf_page - 지정하면 layout_text는 무시)
+
+        Returns:
+            dict: 묶인 텍스트와 페이지 정보 (text, pages, packed_pages, estimated_tokens, truncated)
+        """
+        session, owns_session = PdfDocumentSession.wrap(pdf_source)
+        try:
+            page_count = session.page_count
+            if pages is None:
+                pages = list(range(1, page_count + 1))
+            pages = [page_num for page_num in pages if 1 <= page_num <= page_count]
+
+            if page_encoder is not None:
+                get_text = lambda page_num: page_encoder(session, page_num)
+            else:
+                get_text = session.get_text if layout_text else session.get_fitz_text
+            ranked_pages = self._rank_pages(session, pages, page_scores)
+
+            # 관련도 순으로 예산이 허용하는 페이지만 텍스트 추출
+            packed = {}
+            used_tokens = 0
+            truncated = False
+            for page_num in ranked_pages:
+                if used_tokens >= self.token_budget:
+                    truncated = True
+                    break
+
+                page_text = get_text(page_num)
+                if not page_text or not page_text.strip():
+                    continue
+
+                chunk = f"\n--- 페이지 {page_num} ---\n{page_text}"
+                chunk_tokens = estimate_tokens(chunk)
+                if used_tokens + chunk_tokens > self.token_budget:
+                    truncated = True
+                    if packed:
+                        continue  # 더 작은 다음 순위 페이지가 남은 예산에 들어갈 수 있음
+                    # 첫 페이지부터 예산을 넘으면 예산만큼 잘라서 사용
+                    chunk = self.truncate_text(chunk, self.token_budget)
+                    chunk_tokens = estimate_tokens(chunk)
+
+                packed[page_num] = chunk
+                used_tokens += chunk_tokens
+        finally:
+            if owns_session:
+                session.close()
+
+        packed_pages = sorted(packed)
+        if truncated:
+            logger.info(
+                f"토큰 예산 {self.token_budget}: 후보 {len(pages)}페이지 중 {len(packed_pages)}페이지 사용 "
+                f"(추정 {used_tokens}토큰)"
+            )
+
+        return {
+            "text": "".join(packed[page_num] for page_num in packed_pages),
+            "pages": len(packed_pages),
+            "packed_pages": packed_pages,
+            "estimated_tokens": used_tokens,
+            "truncated": truncated
+        }
+
+    def truncate_text(self, text, token_budget=None):
+        """텍스트를 추정 토큰 예산 이내로 자르기 (줄 단위로 자름)"""
+        token_budget = self.token_budget if token_budget is None else token_budget
+        if estimate_tokens(text) <= token_budget:
+            return text
+
+        kept_lines = []
+        used_tokens = 0
+        for line in text.split("\n"):
+            line_tokens = estimate_tokens(line) + 1
+            if used_tokens + line_tokens > token_budget:
+                break
+            kept_lines.append(line)
+            used_tokens += line_tokens
+        return "\n".join(kept_lines)
+
+    def _rank_pages(self, session, pages, page_scores=None):
+        """페이지를 관련도가 높은 순으로 정렬 (동점이면 앞 페이지 우선)"""
+        if page_scores:
+            return sorted(pages, key=lambda page_num: (-page_scores.get(page_num, 0), page_num))
+
+        # 점수 정보가 없으면 PyMuPDF 텍스트(1차 필터와 공유)로 BM25 관련도 계산
+        normalized_texts = {
+            page_num: re.sub(r'\s+', '', session.get_fitz_text(page_num)) for page_num in pages
+        }
+        relevance = self._bm25_scores(normalized_texts)
+        return sorted(pages, key=lambda page_num: (-relevance[page_num], page_num))
+
+    def _bm25_scores(self, normalized_texts):
+        """재무제표 키워드에 대한 페이지별 BM25 점수 계산
+
+        한국어 PDF 텍스트는 띄어쓰기가 불규칙하므로 공백을 제거한 텍스트에서 키워드 출현 횟수를 셈
+        """
+        page_count = len(normalized_texts)
+        if page_count == 0:
+            return {}
+
+        term_counts = {
+            page_num: {term: text.count(term) for term in self.query_terms}
+            for page_num, text in normalized_texts.items()
+        }
+        average_length = sum(len(text) for text in normalized_texts.values()) / page_count or 1
+
+        scores = {}
+        for term in self.query_terms:
+            document_frequency = sum(1 for counts in term_counts.values() if counts[term])
+            if not document_frequency:
+                continue
+            idf = math.log(1 + (page_count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+            for page_num, counts in term_counts.items():
+                term_frequency = counts[term]
+                if not term_frequency:
+                    continue
+                length_ratio = len(normalized_texts[page_num]) / average_length
+                scores[page_num] = scores.get(page_num, 0) + idf * term_frequency * (self.bm25_k1 + 1) / (
+                    term_frequency + self.bm25_k1 * (1 - self.bm25_b + self.bm25_b * length_ratio)
+                )
+
+        return {page_num: scores.get(page_num, 0) for page_num in normalized_texts}
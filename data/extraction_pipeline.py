@@ -0,0 +1,201 @@
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from data.pdf_session import PdfDocumentSession
+from data.statement_extractor import StatementExtractor, STATEMENT_SCHEMAS
+from data.local_statement_parser import LocalStatementParser
+
+logger = logging.getLogger("finance_analysis.extraction_pipeline")
+
+
+class ExtractionPipeline:
+    """재무제표 탐지와 유형별 LLM 추출을 겹쳐 실행하는 파이프라인
+
+    탐지기가 재무제표 블록(예: 재무상태표와 연속 페이지)을 확정하면 나머지 페이지를 스캔하는 동안
+    해당 유형의 추출 요청을 바로 보냄. 페이지 스캔은 별도 스레드에서 진행하고 API 요청은 이벤트 루프에서
+    동시에 처리하며, 판정 콜백은 호출한 스레드에서 실행됨. 같은 유형의 블록이 여러 개면(연결/별도)
+    먼저 확정된 블록을 사용함.
+    """
+
+    def __init__(self, detector, processor, input_mode="text", workers=None, temperature=0.1,
+                 use_local_parser=False, include_narrative=True):
+        """
+        ExtractionPipeline 클래스 초기화
+
+        Args:
+            detector (FinancialStatementDetector): 재무제표 페이지 탐지기
+            processor (FinancialStatementProcessor): API 호출과 응답 캐시를 담당하는 처리기
+            input_mode (str, optional): 'text'면 페이지 텍스트, 'tables'면 압축 표(TSV) 입력
+            workers (int, optional): 페이지 스캔에 사용할 프로세스 수
+            temperature (float, optional): 모델 온도
+            use_local_parser (bool, optional): 표준 계정과목 표를 LLM 없이 읽고 찾지 못한 항목만 요청할지 여부
+            include_narrative (bool, optional): 인사이트/결론 서술 요청 포함 여부
+        """
+        self.detector = detector
+        self.processor = processor
+        self.extractor = StatementExtractor(processor)
+        self.extractor.include_narrative = include_narrative
+        if use_local_parser:
+            self.extractor.local_parser = LocalStatementParser()
+        self.input_mode = input_mode
+        self.workers = workers
+        self.temperature = temperature
+
+    def run(self, pdf_source, on_verdict=None):
+        """
+        탐지와 추출을 겹쳐 실행하고 병합된 company_data와 단계별 소요 시간 반환
+
+        Args:
+            pdf_source (str | bytes | PdfDocumentSession): PDF 파일 경로, PDF 바이트 또는 문서 세션
+            on_verdict (callable, optional): 페이지 판정 결과를 받을 때마다 호출할 함수
+
+        Returns:
+            dict: 파이프라인 결과
+                (company_data, failures, financial_pages, statement_types, page_scores, timings)
+                - 재무제표 페이지를 찾지 못하면 company_data는 None
+        """
+        return asyncio.run(self.run_async(pdf_source, on_verdict))
+
+    async def run_async(self, pdf_source, on_verdict=None):
+        """run()의 비동기 버전 (이미 실행 중인 이벤트 루프에서 사용)"""
+        started = time.perf_counter()
+        session, owns_session = PdfDocumentSession.wrap(pdf_source)
+        semaphore = asyncio.Semaphore(max(1, self.processor.max_concurrency))
+        loop = asyncio.get_running_loop()
+
+        # 탐지 제너레이터는 항상 같은 스레드에서 진행하고, 요청 구성은 판정 사이에 이 스레드에서 수행하므로
+        # 문서 세션에 동시에 접근하지 않음
+        scanner = ThreadPoolExecutor(max_workers=1)
+        verdicts = self.detector.iter_detect_financial_statements(session, workers=self.workers)
+
+        financial_pages = []
+        statement_types = {}
+        page_scores = {}
+        handled_types = set()
+        local_results = {}
+        tasks = {}
+        dispatch_times = {}
+        client = None  # 로컬 파싱으로 모두 처리되면 API 클라이언트를 만들지 않음
+
+        try:
+            def dispatch(name, request):
+                nonlocal client
+                if request is None:
+                    return
+                if client is None:
+                    if not self.processor.api_key:
+                        raise ValueError("API 키가 설정되지 않았습니다.")
+                    client = self.processor.client_pool.async_client(self.processor.api_key)
+                system_message, user_message, max_tokens = request
+
+                async def call():
+                    async with semaphore:
+                        return await self.processor._call_claude_api_async(
+                            client, system_message, user_message, self.temperature, max_tokens
+                        )
+
+                tasks[name] = asyncio.ensure_future(call())
+                dispatch_times[name] = time.perf_counter() - started
+                logger.info(f"{name} 추출 요청 시작 ({dispatch_times[name]:.2f}초)")
+
+            def dispatch_block(statement_type, pages):
+                # 먼저 확정된 블록만 사용하고 추출 대상이 아닌 유형(자본변동표 등)은 건너뜀
+                if statement_type not in STATEMENT_SCHEMAS or statement_type in handled_types:
+                    return
+                handled_types.add(statement_type)
+                local_result, request = self.extractor.plan_statement(
+                    session, statement_type, pages, page_scores, self.input_mode
+                )
+                if local_result:
+                    local_results[statement_type] = local_result
+                dispatch(statement_type, request)
+
+            block_type = None
+            block_pages = []
+            while True:
+                verdict = await loop.run_in_executor(scanner, next, verdicts, None)
+                if verdict is None:
+                    break
+
+                if on_verdict is not None:
+                    on_verdict(verdict)
+
+                # 유형이 바뀌면 직전 블록이 확정됨
+                if verdict['type'] != block_type:
+                    if block_type:
+                        dispatch_block(block_type, block_pages)
+                    block_type = verdict['type']
+                    block_pages = []
+
+                if verdict['type']:
+                    financial_pages.append(verdict['page_num'])
+                    statement_types[verdict['page_num']] = verdict['type']
+                    page_scores[verdict['page_num']] = verdict['score']
+                    block_pages.append(verdict['page_num'])
+
+            if block_type:
+                dispatch_block(block_type, block_pages)
+            scan_finished = time.perf_counter() - started
+            scan_dispatched = len(tasks)
+
+            if financial_pages:
+                # 탐지되지 않은 유형은 전체 탐지 페이지에서 관련도 높은 페이지로 요청
+                for statement_type in STATEMENT_SCHEMAS:
+                    dispatch_block(statement_type, financial_pages)
+                if self.extractor.include_narrative:
+                    dispatch("분석", self.extractor.build_narrative_request(
+                        session, financial_pages, page_scores, self.input_mode
+                    ))
+
+            names = list(tasks)
+            responses = await asyncio.gather(*(tasks[name] for name in names), return_exceptions=True)
+        finally:
+            verdicts.close()
+            scanner.shutdown(wait=True)
+            for task in tasks.values():
+                task.cancel()  # 오류로 중단된 경우 아직 진행 중인 요청 취소
+            if client is not None:
+                await client.close()
+            if owns_session:
+                session.close()
+
+        company_data = None
+        failures = {}
+        if names or local_results:
+            company_data, failures = self.extractor.merge_responses(dict(zip(names, responses)), local_results)
+
+        total = time.perf_counter() - started
+        timings = {
+            'total_seconds': total,
+            'scan_seconds': scan_finished,
+            'extraction_wait_seconds': total - scan_finished,  # 스캔이 끝난 뒤 응답을 기다린 시간
+            'requests': len(names),
+            'local_statements': len(local_results),
+            'requests_during_scan': scan_dispatched,
+            'first_request_seconds': min(dispatch_times.values()) if dispatch_times else None
+        }
+        logger.info(self.format_timings(timings))
+
+        return {
+            'company_data': company_data,
+            'failures': failures,
+            'financial_pages': financial_pages,
+            'statement_types': statement_types,
+            'page_scores': page_scores,
+            'timings': timings
+        }
+
+    @staticmethod
+    def format_timings(timings):
+        """파이프라인 소요 시간을 화면 표시용 문자열로 반환"""
+        summary = (
+            f"전체 {timings['total_seconds']:.1f}초 · 탐지 {timings['scan_seconds']:.1f}초 · "
+            f"탐지 후 추출 대기 {timings['extraction_wait_seconds']:.1f}초"
+        )
+        if timings['requests']:
+            summary += f" · 요청 {timings['requests']}개 중 {timings['requests_during_scan']}개를 탐지 중 시작"
+        if timings.get('local_statements'):
+            summary += f" · 로컬 파싱 {timings['local_statements']}개 재무제표"
+        return summary
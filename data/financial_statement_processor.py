@@ -1,16 +1,28 @@
-import tempfile
 import base64
-from PIL import Image
 import io
 import os
+import asyncio
+import logging
 import fitz  # PyMuPDF for PDF processing
-from anthropic import Anthropic
+from data.context_packer import ContextPacker
+from data.table_encoder import TableEncoder
+from data.statement_extractor import load_template_dict
+from data.stream_json import StreamingJsonParser, iter_sections
+from data.json_repair import repair_json, validate_against_template
+from data.image_optimizer import ImageOptimizer, pack_images
+from data.llm_cache import (
+    default_response_cache, default_single_flight, make_response_key, cacheable_system, PromptUsageLog
+)
+from data.llm_client import default_client_pool
 import json
 
+logger = logging.getLogger("finance_analysis.financial_statement_processor")
+
 class FinancialStatementProcessor:
     """재무제표 처리 클래스: PDF 병합 및 분석을 처리합니다."""
     
-    def __init__(self, api_key=None, prompt_path="prompt.txt", json_template_path="finance_format.json"):
+    def __init__(self, api_key=None, prompt_path="prompt.txt", json_template_path="finance_format.json",
+                 response_cache=None, client_pool=None, single_flight=None):
         """
         FinancialStatementProcessor 클래스 초기화
         
@@ -18,14 +30,47 @@ class FinancialStatementProcessor:
             api_key (str, optional): Anthropic API 키
             prompt_path (str, optional): 프롬프트 파일 경로
             json_template_path (str, optional): JSON 템플릿 파일 경로
+            response_cache (FileCacheStore, optional): LLM 응답 캐시 (없으면 공유 기본 캐시 사용)
+            client_pool (LLMClientPool, optional): API 클라이언트 풀 (없으면 프로세스 공유 풀 사용)
+            single_flight (SingleFlight, optional): 진행 중인 같은 요청 공유 (없으면 프로세스 공유 목록 사용)
         """
         self.api_key = api_key
+        self.model = "claude-3-7-sonnet-20250219"
         self.prompt_path = os.path.join(os.path.dirname(__file__), prompt_path)
         self.json_template_path = os.path.join(os.path.dirname(__file__), json_template_path)
         self.client = None
         
+        # API 키별 공유 클라이언트와 프로세스 전체의 요청 속도 제한, 재시도(429/529/5xx)
+        self.client_pool = client_pool if client_pool is not None else default_client_pool
+        
+        # LLM 입력 텍스트를 토큰 예산 안에서 관련도 높은 페이지 위주로 구성
+        self.context_packer = ContextPacker()
+        self.table_encoder = TableEncoder()
+        
+        # 비전 입력 이미지 최적화 - 표 영역 자르기, 축소, 흑백 변환, 가장 작은 형식 선택
+        self.image_optimizer = ImageOptimizer()
+        self.images_per_request = 4
+        
+        # 여러 파일 동시 처리 설정 - 동시 요청 수 제한과 요청별 제한 시간(초)
+        self.max_concurrency = 4
+        self.request_timeout = 180
+        
+        # LLM 응답 캐시 - 같은 모델/프롬프트/입력/온도의 요청은 API를 다시 호출하지 않음
+        self.use_response_cache = True
+        self.response_cache = response_cache if response_cache is not None else default_response_cache
+        
+        # 여러 세션이 같은 입력으로 동시에 요청하면 API를 한 번만 호출하고 응답을 함께 사용
+        self.single_flight = single_flight if single_flight is not None else default_single_flight
+        
+        # 프롬프트 캐시 - 고정된 시스템 프롬프트(프롬프트 + JSON 템플릿)를 API 캐시 지점으로 표시하고 요청별 사용량 기록
+        self.use_prompt_cache = True
+        self.usage_log = PromptUsageLog()
+        
+        # 출력 한도(max_tokens)로 잘린 응답은 처음부터 다시 생성하지 않고 이어서 작성하도록 요청 (최대 횟수)
+        self.max_continuations = 2
+        
         if api_key:
-            self.client = Anthropic(api_key=api_key)
+            self.client = self.client_pool.client(api_key)
             
         self.prompt = self.load_prompt()
         self.json_template = self.load_json_template()
@@ -50,7 +95,7 @@ class FinancialStatementProcessor:
     def set_api_key(self, api_key):
         """API 키 설정"""
         self.api_key = api_key
-        self.client = Anthropic(api_key=api_key)
+        self.client = self.client_pool.client(api_key)
     
     def merge_pdfs(self, pdf_files):
         """
@@ -62,19 +107,16 @@ class FinancialStatementProcessor:
         Returns:
             bytes: 병합된 PDF 파일 바이트
         """
+        # 파일이 하나면 병합 없이 업로드된 바이트를 그대로 사용
+        if len(pdf_files) == 1:
+            return pdf_files[0].getvalue()
+        
         merged_pdf = fitz.open()
         
+        # 업로드된 파일을 임시 파일 없이 메모리에서 열어 병합
         for pdf_file in pdf_files:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-                temp_file.write(pdf_file.getvalue())
-                temp_path = temp_file.name
-            
-            pdf_document = fitz.open(temp_path)
-            merged_pdf.insert_pdf(pdf_document)
-            
-            # 임시 파일 삭제
-            pdf_document.close()
-            os.unlink(temp_path)
+            with fitz.open(stream=pdf_file.getvalue(), filetype="pdf") as pdf_document:
+                merged_pdf.insert_pdf(pdf_document)
         
         # 병합된 PDF를 메모리에 저장
         merged_bytes = io.BytesIO()
@@ -87,91 +129,195 @@ class FinancialStatementProcessor:
         """
         PDF 파일에서 텍스트 추출
         
+        전체 페이지를 재무제표 키워드 관련도 순으로 정렬하여 토큰 예산(context_packer.token_budget)
+        안에 들어가는 페이지만 사용함
+        
         Args:
-            pdf_bytes (bytes): PDF 파일 바이트
+            pdf_bytes (bytes | PdfDocumentSession): PDF 파일 바이트 또는 문서 세션
+                (세션을 전달하면 1차 필터에서 추출한 페이지 텍스트를 재사용)
             
         Returns:
-            dict: 추출된 텍스트와 페이지 수
+            dict: 추출된 텍스트와 페이지 정보 (text, pages, packed_pages, estimated_tokens, truncated)
         """
-        # 임시 파일 생성
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
-            temp_file.write(pdf_bytes)
-            temp_path = temp_file.name
-        
-        doc = fitz.open(temp_path)
-        text = ""
-        page_count = len(doc)
-        
-        # 텍스트 추출
-        for i in range(page_count):
-            page = doc[i]
-            text += page.get_text()
-        
-        # 임시 파일 삭제
-        doc.close()
-        os.unlink(temp_path)
+        return self.context_packer.pack(pdf_bytes, layout_text=False)
+    
+    def extract_tables_from_pdf(self, pdf_bytes, pages=None, page_scores=None):
+        """
+        PDF 페이지의 표를 압축 TSV 텍스트로 추출 (process_with_claude의 'tables' 입력 형식)
         
-        return {
-            "text": text,
-            "pages": page_count
-        }
+        Args:
+            pdf_bytes (bytes | PdfDocumentSession): PDF 파일 바이트 또는 문서 세션
+            pages (list, optional): 대상 페이지 번호 목록 (없으면 전체 페이지)
+            page_scores (dict, optional): 토큰 예산 초과 시 사용할 페이지별 탐지 점수
+            
+        Returns:
+            dict: 압축된 표 텍스트와 페이지 정보 (text, pages, packed_pages, estimated_tokens, truncated, input_mode)
+        """
+        table_data = self.context_packer.pack(
+            pdf_bytes, pages, page_scores, page_encoder=self.table_encoder.encode_pdf_page
+        )
+        table_data["input_mode"] = "tables"
+        return table_data
     
     def process_image(self, image_file):
         """
-        이미지 파일 처리
+        이미지 파일 처리 - 비전 입력용으로 최적화 (image_optimizer 설정 사용)
         
         Args:
             image_file: 이미지 파일 객체
             
         Returns:
-            dict: 이미지 바이트와 크기 정보
+            dict: 이미지 바이트, 미디어 타입, 크기 정보와 최적화 전후 크기
         """
-        image = Image.open(image_file)
-        
-        # 이미지를 메모리에 저장
-        buffer = io.BytesIO()
-        image.save(buffer, format="PNG")
-        image_bytes = buffer.getvalue()
+        return self.image_optimizer.optimize(image_file)
+    
+    def prepare_images(self, image_files, pack=True):
+        """
+        여러 이미지 파일을 최적화하고 요청 단위로 묶음
         
-        return {
-            "image": image_bytes,
-            "width": image.width,
-            "height": image.height
-        }
+        Args:
+            image_files (list): 이미지 파일 객체 목록
+            pack (bool, optional): 작은 이미지 여러 개를 한 요청에 담을지 여부 (최대 images_per_request개)
+            
+        Returns:
+            tuple: (process_many_with_claude에 전달할 요청별 데이터 목록, 최적화된 이미지 목록)
+        """
+        images = [self.process_image(image_file) for image_file in image_files]
+        groups = pack_images(images, self.images_per_request if pack else 1)
+        file_data_list = [group[0] if len(group) == 1 else {"images": group} for group in groups]
+        return file_data_list, images
     
     def encode_image_to_base64(self, image_bytes):
         """이미지를 Base64로 인코딩"""
         return base64.b64encode(image_bytes).decode('utf-8')
     
-    def _call_claude_api(self, system_message, user_message, temperature=0.1, max_tokens=8000):
+    def _call_claude_api(self, system_message, user_message, temperature=0.1, max_tokens=8000,
+                         on_section=None, template=None):
         """
         Claude API 호출을 위한 공통 메서드
         
+        on_section이 주어지면 응답을 스트리밍으로 받아 최상위 JSON 항목이 닫힐 때마다 on_section(키, 값)을
+        호출하고, 응답이 template 구조에서 벗어나면 남은 출력을 기다리지 않고 생성을 중단함
+        
         Args:
             system_message (str): 시스템 메시지
             user_message (str or list): 사용자 메시지
             temperature (float): 모델 온도
             max_tokens (int): 최대 토큰 수
+            on_section (callable, optional): 완성된 최상위 항목을 받을 함수
+            template (dict, optional): 스트리밍 응답이 따라야 할 최상위 JSON 구조
             
         Returns:
             str: API 응답
+            
+        Raises:
+            StreamDivergenceError: 스트리밍 응답이 template 구조에서 벗어나 중단한 경우
         """
+        messages = [
+            {"role": "user", "content": user_message}
+        ]
+        cache_key = self._response_cache_key(system_message, messages, temperature, max_tokens)
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                if on_section is not None:
+                    for key, value in iter_sections(cached, template):
+                        on_section(key, value)
+                return cached
+        
         if not self.client:
             raise ValueError("API 키가 설정되지 않았습니다.")
-            
-        response = self.client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            system=system_message,
-            messages=[
-                {"role": "user", "content": user_message}
-            ],
-            temperature=temperature,
-            max_tokens=max_tokens
+        
+        request = self._build_request(system_message, messages, temperature, max_tokens)
+        
+        # 다른 세션에서 같은 입력으로 진행 중인 요청이 있으면 새로 호출하지 않고 그 응답을 함께 사용
+        flight_key = cache_key or make_response_key(self.model, system_message, messages, temperature, max_tokens)
+        text, leader = self.single_flight.do(
+            flight_key, lambda: self._request_claude(request, cache_key, on_section, template),
+            timeout=self._flight_timeout()
         )
+        if not leader and on_section is not None:
+            for key, value in iter_sections(text, template):
+                on_section(key, value)
+        return text
+    
+    def _request_claude(self, request, cache_key, on_section=None, template=None):
+        """API를 호출하고(잘린 응답은 이어서 요청) 응답 텍스트를 캐시에 저장하여 반환"""
+        if on_section is None:
+            response = self.client_pool.call(self.client.messages.create, request)
+            self.usage_log.record(response)
+            text = response.content[0].text
+        else:
+            # 구조가 어긋나면 파서가 예외를 발생시키고 스트림을 닫아 남은 토큰 생성을 중단함
+            parser = StreamingJsonParser(template)
+            with self.client_pool.stream(self.client, request) as stream:
+                for chunk in stream.text_stream:
+                    for key, value in parser.feed(chunk):
+                        on_section(key, value)
+                response = stream.get_final_message()
+            self.usage_log.record(response)
+            text = response.content[0].text
+        
+        # 출력 한도로 잘린 경우 받은 부분을 assistant 메시지로 넘겨 나머지만 생성
+        for _ in range(self.max_continuations):
+            if response.stop_reason != "max_tokens":
+                break
+            response = self.client_pool.call(self.client.messages.create, self._continuation_request(request, text))
+            self.usage_log.record(response, "continuation")
+            continuation = response.content[0].text
+            text = text.rstrip() + continuation
+            if on_section is not None:
+                for key, value in parser.feed(continuation):
+                    on_section(key, value)
         
-        return response.content[0].text
+        return self._store_response(cache_key, response, text)
+    
+    def _response_cache_key(self, system_message, messages, temperature, max_tokens):
+        """LLM 응답 캐시 키 (캐시를 사용하지 않으면 None)"""
+        if not self.use_response_cache:
+            return None
+        return make_response_key(self.model, system_message, messages, temperature, max_tokens)
+    
+    def _build_request(self, system_message, messages, temperature, max_tokens):
+        """messages.create()/stream() 요청 인자 (프롬프트 캐시를 사용하면 시스템 프롬프트에 캐시 지점 표시)"""
+        return {
+            "model": self.model,
+            "system": cacheable_system(system_message) if self.use_prompt_cache else system_message,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "timeout": self.request_timeout
+        }
+    
+    def _flight_timeout(self):
+        """진행 중인 같은 요청을 기다릴 최대 시간(초) - 첫 요청과 이어서 작성 요청의 제한 시간 합계"""
+        return self.request_timeout * (self.max_continuations + 1)
+    
+    def _continuation_request(self, request, partial_text):
+        """잘린 응답을 이어서 작성하도록 받은 부분을 assistant 메시지로 덧붙인 요청
+        
+        API는 마지막 assistant 메시지 끝의 공백을 허용하지 않으므로 끝 공백을 제거하여 전달함
+        """
+        logger.info(f"출력 한도로 잘린 응답 이어서 요청 ({len(partial_text)}자 수신)")
+        return dict(request, messages=request["messages"] + [
+            {"role": "assistant", "content": partial_text.rstrip()}
+        ])
+    
+    def _store_response(self, cache_key, response, text=None):
+        """응답 텍스트를 캐시에 저장하고 반환 (출력 한도로 잘린 응답은 저장하지 않음)
+        
+        Args:
+            cache_key (str): 캐시 키 (캐시를 사용하지 않으면 None)
+            response: 마지막 API 응답 (stop_reason 확인용)
+            text (str, optional): 이어서 받은 부분까지 합친 응답 텍스트 (없으면 response의 텍스트)
+        """
+        if text is None:
+            text = response.content[0].text
+        if cache_key and response.stop_reason != "max_tokens":
+            self.response_cache.set(cache_key, text)
+        return text
 
-    def process_with_claude(self, file_data, temperature=0.1, custom_prompt=None):
+    def process_with_claude(self, file_data, temperature=0.1, custom_prompt=None, on_section=None):
         """
         Claude API를 사용하여 파일 처리
         
@@ -179,50 +325,203 @@ class FinancialStatementProcessor:
             file_data (dict): 처리할 파일 데이터 (PDF 텍스트, 이미지 또는 JSON 데이터)
             temperature (float, optional): 모델 온도
             custom_prompt (str, optional): 사용자 지정 프롬프트
+            on_section (callable, optional): 응답을 스트리밍으로 받으며 performance_data 같은 최상위 항목이
+                완성될 때마다 호출할 함수 (키, 값) - 응답이 JSON 템플릿 구조에서 벗어나면 생성을 중단함
             
         Returns:
             str: API 응답
         """
+        messages = self._build_messages(file_data, custom_prompt)
+        if messages is None:
+            return None
+        system_message, user_message = messages
+        template = self.template_dict() if on_section is not None else None
+        return self._call_claude_api(
+            system_message, user_message, temperature, on_section=on_section, template=template
+        )
+    
+    def template_dict(self):
+        """스트리밍 구조 검사에 사용할 JSON 템플릿 딕셔너리 (템플릿이 없거나 읽을 수 없으면 None)"""
+        try:
+            return load_template_dict(self.json_template) or None
+        except ValueError:
+            return None
+    
+    def process_many_with_claude(self, file_data_list, temperature=0.1, custom_prompt=None):
+        """
+        여러 파일을 Claude API로 동시에 처리하고 입력 순서대로 결과 반환
+        
+        동시 요청 수는 max_concurrency, 요청별 제한 시간은 request_timeout(초)으로 제한함
+        
+        Args:
+            file_data_list (list): 처리할 파일 데이터 목록 (process_with_claude와 같은 형식)
+            temperature (float, optional): 모델 온도
+            custom_prompt (str, optional): 사용자 지정 프롬프트
+            
+        Returns:
+            list: 파일별 API 응답 문자열 또는 실패한 경우 발생한 예외 (입력 순서 유지)
+        """
+        if not file_data_list:
+            return []
+        return asyncio.run(self.process_many_async(file_data_list, temperature, custom_prompt))
+    
+    async def process_many_async(self, file_data_list, temperature=0.1, custom_prompt=None):
+        """process_many_with_claude()의 비동기 버전 (이미 실행 중인 이벤트 루프에서 사용)"""
+        message_pairs = [self._build_messages(file_data, custom_prompt) for file_data in file_data_list]
+        return await self.call_many_async(message_pairs, temperature)
+    
+    async def call_many_async(self, message_pairs, temperature=0.1, max_tokens=8000):
+        """
+        (시스템 메시지, 사용자 메시지) 목록을 Claude API로 동시에 요청하고 입력 순서대로 결과 반환
+        
+        Args:
+            message_pairs (list): (시스템 메시지, 사용자 메시지) 튜플 목록 (None이면 요청하지 않음)
+                - 세 번째 값으로 요청별 최대 출력 토큰 수를 지정할 수 있음
+            temperature (float, optional): 모델 온도
+            max_tokens (int, optional): 최대 출력 토큰 수 (요청별로 지정하지 않은 경우)
+            
+        Returns:
+            list: 요청별 API 응답 문자열 또는 실패한 경우 발생한 예외 (입력 순서 유지)
+        """
+        if not self.api_key:
+            raise ValueError("API 키가 설정되지 않았습니다.")
+        
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        
+        # 비동기 클라이언트는 이벤트 루프에 묶이므로 호출마다 생성하고 종료 시 연결 정리
+        async with self.client_pool.async_client(self.api_key) as client:
+            async def call_one(messages):
+                if messages is None:
+                    return None
+                system_message, user_message, *options = messages
+                request_max_tokens = options[0] if options else max_tokens
+                async with semaphore:
+                    return await self._call_claude_api_async(
+                        client, system_message, user_message, temperature, request_max_tokens
+                    )
+            
+            # gather는 완료 순서와 관계없이 입력 순서대로 결과를 반환
+            return await asyncio.gather(
+                *(call_one(messages) for messages in message_pairs),
+                return_exceptions=True
+            )
+    
+    async def _call_claude_api_async(self, client, system_message, user_message, temperature=0.1, max_tokens=8000):
+        """_call_claude_api()의 비동기 버전 - request_timeout을 넘으면 TimeoutError 발생"""
+        messages = [
+            {"role": "user", "content": user_message}
+        ]
+        cache_key = self._response_cache_key(system_message, messages, temperature, max_tokens)
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        request = self._build_request(system_message, messages, temperature, max_tokens)
+        flight_key = cache_key or make_response_key(self.model, system_message, messages, temperature, max_tokens)
+        text, _ = await self.single_flight.do_async(
+            flight_key, lambda: self._request_claude_async(client, request, cache_key),
+            timeout=self._flight_timeout()
+        )
+        return text
+    
+    async def _request_claude_async(self, client, request, cache_key):
+        """_request_claude()의 비동기 버전 - request_timeout을 넘으면 TimeoutError 발생"""
+        try:
+            response = await asyncio.wait_for(
+                self.client_pool.call_async(client.messages.create, request), timeout=self.request_timeout
+            )
+            self.usage_log.record(response)
+            text = response.content[0].text
+            
+            # 출력 한도로 잘린 경우 나머지만 이어서 생성
+            for _ in range(self.max_continuations):
+                if response.stop_reason != "max_tokens":
+                    break
+                response = await asyncio.wait_for(
+                    self.client_pool.call_async(client.messages.create, self._continuation_request(request, text)),
+                    timeout=self.request_timeout
+                )
+                self.usage_log.record(response, "continuation")
+                text = text.rstrip() + response.content[0].text
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Claude API 응답 시간 초과 ({self.request_timeout}초)")
+        
+        return self._store_response(cache_key, response, text)
+    
+    def _build_messages(self, file_data, custom_prompt=None):
+        """
+        파일 데이터로 시스템 메시지와 사용자 메시지 구성
+        
+        Returns:
+            tuple: (시스템 메시지, 사용자 메시지) - 처리할 수 없는 데이터면 None
+        """
         prompt = custom_prompt if custom_prompt else self.prompt
         system_message = f"{prompt}\n\nJSON 템플릿:\n{self.json_template}"
         
         # JSON 데이터 처리
-        if isinstance(file_data, dict) and not any(key in file_data for key in ['text', 'image', 'sections']):
+        if isinstance(file_data, dict) and not any(key in file_data for key in ['text', 'image', 'images', 'sections']):
             user_message = f"다음 재무제표 데이터를 분석하여 지정된 JSON 형식으로 변환해주세요. 데이터: {json.dumps(file_data, ensure_ascii=False)}"
-            return self._call_claude_api(system_message, user_message, temperature)
+            return system_message, user_message
         
-        # PDF 텍스트 처리
+        # PDF 텍스트 처리 - 토큰 예산으로 구성되지 않은 텍스트는 예산 이내로 자름
         elif 'text' in file_data:
-            user_message = f"다음 재무제표 또는 감사보고서 내용을 분석하여 지정된 JSON 형식으로 변환해주세요. 문서 내용: {file_data['text'][:20000]}"
-            return self._call_claude_api(system_message, user_message, temperature)
+            document_text = self.context_packer.truncate_text(file_data['text'])
+            if file_data.get('input_mode') == 'tables':
+                user_message = (
+                    "다음은 재무제표 페이지의 표를 탭으로 구분한 데이터입니다. 숫자의 쉼표는 제거되었고 "
+                    "괄호나 △로 표기된 음수는 -로 표시되어 있습니다. 각 페이지의 단위 표기를 참고하여 "
+                    f"지정된 JSON 형식으로 변환해주세요. 표 데이터:\n{document_text}"
+                )
+            else:
+                user_message = f"다음 재무제표 또는 감사보고서 내용을 분석하여 지정된 JSON 형식으로 변환해주세요. 문서 내용: {document_text}"
+            return system_message, user_message
         # 이미지 처리
         elif 'image' in file_data:
-            base64_image = self.encode_image_to_base64(file_data['image'])
             user_message = [
                 {
                     "type": "text", 
                     "text": "이 재무제표나 감사보고서 이미지를 분석하여 지정된 JSON 형식으로 정보를 추출해주세요."
                 },
+                self._image_block(file_data)
+            ]
+            return system_message, user_message
+        # 여러 이미지를 한 요청으로 처리 (같은 보고서의 여러 페이지)
+        elif 'images' in file_data:
+            user_message = [
                 {
-                    "type": "image", 
-                    "source": {
-                        "type": "base64", 
-                        "media_type": "image/png",
-                        "data": base64_image
-                    }
+                    "type": "text", 
+                    "text": f"다음 {len(file_data['images'])}개 이미지는 같은 재무제표 또는 감사보고서의 페이지입니다. "
+                            "모든 이미지를 함께 분석하여 지정된 JSON 형식으로 정보를 추출해주세요."
                 }
-            ]
-            return self._call_claude_api(system_message, user_message, temperature)
+            ] + [self._image_block(image_data) for image_data in file_data['images']]
+            return system_message, user_message
+    
+    def _image_block(self, image_data):
+        """이미지 데이터를 API 메시지의 이미지 블록으로 변환"""
+        return {
+            "type": "image", 
+            "source": {
+                "type": "base64", 
+                "media_type": image_data.get("media_type", "image/png"),
+                "data": self.encode_image_to_base64(image_data['image'])
+            }
+        }
     
     def parse_json_response(self, json_result):
         """
         JSON 응답 파싱
         
+        바로 읽을 수 없으면 주석, 마지막 쉼표, 잘린 괄호 등을 고쳐서 다시 읽음 (repair_json 참고)
+        
         Args:
             json_result (str): JSON 문자열
             
         Returns:
             dict: 파싱된 JSON 객체
+            
+        Raises:
+            json.JSONDecodeError: 수정 후에도 읽을 수 없는 경우
         """
         json_str = json_result
         
@@ -233,4 +532,23 @@ class FinancialStatementProcessor:
             json_str = json_str.split("```")[1].split("```")[0].strip()
         
         # JSON 객체로 변환
-        return json.loads(json_str)
\ No newline at end of file
+        try:
+            return json.loads(json_str)
+        except json.JSONDecodeError:
+            data, _ = repair_json(json_result)
+            return data
+    
+    def validate_json_result(self, data):
+        """
+        파싱된 결과를 JSON 템플릿 구조와 비교
+        
+        Args:
+            data (dict): parse_json_response() 결과
+            
+        Returns:
+            list: 빠진 항목, 형식이 다른 항목, 연도 수와 길이가 다른 배열 등 문제 설명 목록
+        """
+        template = self.template_dict()
+        if template is None:
+            return []
+        return validate_against_template(data, template)
\ No newline at end of file
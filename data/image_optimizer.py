@@ -0,0 +1,202 @@
+import io
+import os
+import time
+import logging
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageOps, features
+
+logger = logging.getLogger("finance_analysis.image_optimizer")
+
+# 인코딩 형식별 API 미디어 타입
+MEDIA_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+def estimate_image_tokens(width, height, max_long_edge=1568, max_tokens=1600):
+    """Claude 비전 입력 토큰 수 추정 (약 750픽셀당 1토큰, 큰 이미지는 API가 줄인 크기 기준)"""
+    scale = min(1, max_long_edge / max(width, height, 1))
+    return min(max_tokens, int(width * scale * height * scale / 750))
+
+
+class ImageOptimizer:
+    """재무제표 사진/스캔 이미지를 비전 API 전송용으로 줄이는 클래스
+
+    EXIF 회전을 바로잡은 뒤 글자(어두운 픽셀)가 모여 있는 표 영역만 남기고, 긴 변을 목표 크기로 줄여
+    흑백으로 변환한 다음 PNG/JPEG/WebP 중 가장 작은 형식으로 인코딩함.
+    """
+
+    def __init__(self, max_long_edge=1568, grayscale=True, crop_content=True, quality=85):
+        """
+        ImageOptimizer 클래스 초기화
+
+        Args:
+            max_long_edge (int, optional): 긴 변의 최대 픽셀 수 (API가 내부적으로 줄이는 크기와 같게 설정)
+            grayscale (bool, optional): 흑백 변환 여부
+            crop_content (bool, optional): 글자가 있는 표 영역만 잘라낼지 여부
+            quality (int, optional): JPEG/WebP 인코딩 품질
+        """
+        self.max_long_edge = max_long_edge
+        self.grayscale = grayscale
+        self.crop_content = crop_content
+        self.quality = quality
+        self.ink_contrast = 40        # 주변 평균보다 이 값 이상 어두운 픽셀을 글자/괘선으로 봄
+        self.paper_level = 200        # 주변 평균이 이 값 이상인 밝은 영역만 종이로 봄 (자동 대비 조정 후)
+        self.min_line_density = 0.01  # 글자 픽셀 비율이 이 값 이상인 행/열만 내용으로 봄
+        self.crop_margin = 0.02       # 잘라낸 영역 바깥 여백 (긴 변 대비)
+        self.formats = ["PNG", "JPEG"] + (["WEBP"] if features.check("webp") else [])
+
+    def optimize(self, image_file):
+        """
+        이미지 파일을 전송용으로 최적화
+
+        Args:
+            image_file: 이미지 파일 객체, 파일 경로 또는 이미지 바이트
+
+        Returns:
+            dict: 최적화된 이미지 바이트와 크기 정보
+                (image, media_type, width, height, original_bytes, original_width, original_height,
+                bytes, elapsed_seconds)
+        """
+        started = time.perf_counter()
+        if isinstance(image_file, (bytes, bytearray)):
+            original_bytes = len(image_file)
+            image = Image.open(io.BytesIO(image_file))
+        else:
+            image = Image.open(image_file)
+            original_bytes = self._source_size(image_file)
+
+        # 휴대폰 사진은 EXIF 방향 정보로만 회전되어 있는 경우가 많음
+        image = ImageOps.exif_transpose(image)
+        original_width, original_height = image.size
+
+        if self.grayscale:
+            image = ImageOps.grayscale(image)
+        elif image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        if self.crop_content:
+            image = self._crop_to_content(image)
+
+        if max(image.size) > self.max_long_edge:
+            scale = self.max_long_edge / max(image.size)
+            image = image.resize(
+                (max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS
+            )
+
+        image_format, data = self._smallest_encoding(image)
+        result = {
+            "image": data,
+            "media_type": MEDIA_TYPES[image_format],
+            "width": image.width,
+            "height": image.height,
+            "original_bytes": original_bytes,
+            "original_width": original_width,
+            "original_height": original_height,
+            "bytes": len(data),
+            "elapsed_seconds": time.perf_counter() - started
+        }
+        logger.info(
+            f"이미지 최적화: {original_width}x{original_height} {original_bytes / 1024:.0f}KB → "
+            f"{image.width}x{image.height} {image_format} {len(data) / 1024:.0f}KB "
+            f"({result['elapsed_seconds']:.2f}초)"
+        )
+        return result
+
+    def _crop_to_content(self, image):
+        """글자 픽셀의 행/열 분포로 표 영역을 찾아 잘라냄 (영역이 불분명하면 원본 유지)
+
+        책상 같은 배경은 고르게 어둡고 글자와 괘선은 주변 종이보다 훨씬 어두우므로,
+        절대 밝기 대신 주변 평균(흐림 처리한 이미지)과의 차이로 글자 픽셀을 판단함.
+        종이 가장자리도 배경과의 경계에서 어둡게 보이므로 밝은 종이 영역 안쪽의 픽셀만 사용함
+        """
+        preview = ImageOps.grayscale(image) if image.mode != "L" else image
+        preview = ImageOps.autocontrast(preview.reduce(max(1, max(preview.size) // 800)), cutoff=1)
+        blurred = preview.filter(ImageFilter.BoxBlur(12))
+        paper = blurred.point(lambda value: 255 if value >= self.paper_level else 0).filter(ImageFilter.MinFilter(25))
+
+        background = np.asarray(blurred, dtype=np.int16)
+        ink = (np.asarray(preview, dtype=np.int16) < background - self.ink_contrast) & (np.asarray(paper) > 0)
+
+        rows = np.flatnonzero(ink.mean(axis=1) >= self.min_line_density)
+        columns = np.flatnonzero(ink.mean(axis=0) >= self.min_line_density)
+        if rows.size == 0 or columns.size == 0:
+            return image
+
+        scale_x = image.width / preview.width
+        scale_y = image.height / preview.height
+        margin = int(max(image.size) * self.crop_margin)
+        box = (
+            max(0, int(columns[0] * scale_x) - margin),
+            max(0, int(rows[0] * scale_y) - margin),
+            min(image.width, int((columns[-1] + 1) * scale_x) + margin),
+            min(image.height, int((rows[-1] + 1) * scale_y) + margin)
+        )
+
+        # 거의 전체이거나 너무 작은 영역은 배경/잡음으로 판단하여 자르지 않음
+        area_ratio = (box[2] - box[0]) * (box[3] - box[1]) / (image.width * image.height)
+        if area_ratio > 0.95 or area_ratio < 0.05:
+            return image
+        return image.crop(box)
+
+    def _smallest_encoding(self, image):
+        """사용 가능한 형식으로 모두 인코딩하여 가장 작은 결과 반환"""
+        best = None
+        for image_format in self.formats:
+            buffer = io.BytesIO()
+            if image_format == "PNG":
+                image.save(buffer, format="PNG", optimize=True)
+            else:
+                image.save(buffer, format=image_format, quality=self.quality)
+            data = buffer.getvalue()
+            if best is None or len(data) < len(best[1]):
+                best = (image_format, data)
+        return best
+
+    def _source_size(self, image_file):
+        """업로드 파일 객체 또는 경로의 원본 크기(바이트)"""
+        if hasattr(image_file, "getbuffer"):
+            return image_file.getbuffer().nbytes
+        if hasattr(image_file, "size") and isinstance(image_file.size, int):
+            return image_file.size
+        if isinstance(image_file, str):
+            return os.path.getsize(image_file)
+        return 0
+
+
+def pack_images(images, max_images=4, max_bytes=4 * 1024 * 1024):
+    """
+    최적화된 이미지들을 요청 단위로 묶음 (업로드 순서 유지)
+
+    Args:
+        images (list): ImageOptimizer.optimize() 결과 목록
+        max_images (int, optional): 한 요청에 넣을 최대 이미지 수 (1이면 묶지 않음)
+        max_bytes (int, optional): 한 요청에 넣을 이미지의 최대 합계 크기
+
+    Returns:
+        list: 요청별 이미지 목록
+    """
+    groups = []
+    for image in images:
+        if (groups and len(groups[-1]) < max(1, max_images)
+                and sum(item["bytes"] for item in groups[-1]) + image["bytes"] <= max_bytes):
+            groups[-1].append(image)
+        else:
+            groups.append([image])
+    return groups
+
+
+def format_image_stats(images, request_count=None):
+    """이미지 최적화 전후 전송 크기와 추정 토큰 수를 화면 표시용 문자열로 반환"""
+    original_bytes = sum(image["original_bytes"] for image in images)
+    optimized_bytes = sum(image["bytes"] for image in images)
+    original_tokens = sum(estimate_image_tokens(image["original_width"], image["original_height"]) for image in images)
+    optimized_tokens = sum(estimate_image_tokens(image["width"], image["height"]) for image in images)
+    elapsed = sum(image["elapsed_seconds"] for image in images)
+
+    summary = (
+        f"이미지 {len(images)}개: 전송 크기 {original_bytes / 1024:,.0f}KB → {optimized_bytes / 1024:,.0f}KB, "
+        f"추정 토큰 {original_tokens:,} → {optimized_tokens:,} (최적화 {elapsed:.1f}초)"
+    )
+    if request_count is not None:
+        summary += f" · 요청 {request_count}개"
+    return summary
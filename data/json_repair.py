@@ -0,0 +1,218 @@
+import re
+import json
+import logging
+
+logger = logging.getLogger("finance_analysis.json_repair")
+
+# 닫는 괄호
+CLOSERS = {"{": "}", "[": "]"}
+
+# 템플릿의 키 일부가 예시 값인 항목 - 경로별로 검사할 고정 키만 지정 (radar_data의 회사명 키는 회사마다 다름)
+FIXED_KEYS = {"radar_data": ("metric", "업계평균")}
+
+
+def repair_json(text):
+    """
+    LLM 응답에서 JSON을 찾아 흔한 오류를 고친 뒤 파싱
+
+    코드 블록 표시와 앞뒤 설명문을 제거하고, // 및 /* */ 주석, 마지막 요소 뒤의 쉼표, 문자열 안의 줄바꿈,
+    Python 형식의 True/False/None을 고침. 출력 한도로 잘린 응답은 마지막으로 완성된 값까지만 남기고
+    열린 괄호를 닫음.
+
+    Args:
+        text (str): LLM 응답 텍스트
+
+    Returns:
+        tuple: (파싱된 JSON 객체, 적용한 수정 목록)
+
+    Raises:
+        json.JSONDecodeError: 수정 후에도 JSON으로 읽을 수 없는 경우
+    """
+    start = _find_start(text)
+    if start is None:
+        raise json.JSONDecodeError("JSON 객체를 찾을 수 없습니다", text, 0)
+
+    repairs = []
+    if re.sub(r'```(?:json)?', '', text[:start]).strip():
+        repairs.append("앞쪽 설명문 제거")
+
+    out = []
+    stack = []           # 열린 괄호와 객체에서 다음에 올 요소 ('key' 또는 'value')
+    safe = (0, [])       # 마지막으로 완성된 값 직후의 (출력 길이, 괄호 스택)
+    in_string = False
+    escaped = False
+    position = start
+    length = len(text)
+
+    def mark_safe():
+        nonlocal safe
+        safe = (len(out), [frame[:] for frame in stack])
+
+    while position < length:
+        char = text[position]
+
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+                out.append(char)
+                position += 1
+                if stack and stack[-1][0] == "{" and stack[-1][1] == "key":
+                    stack[-1][1] = "colon"
+                else:
+                    mark_safe()
+                continue
+            elif char == "\n":
+                out.append("\\n")
+                _note(repairs, "문자열 안의 줄바꿈 변환")
+                position += 1
+                continue
+            out.append(char)
+            position += 1
+            continue
+
+        # 주석 제거
+        if text.startswith("//", position):
+            end = text.find("\n", position)
+            position = length if end == -1 else end
+            _note(repairs, "주석 제거")
+            continue
+        if text.startswith("/*", position):
+            end = text.find("*/", position + 2)
+            position = length if end == -1 else end + 2
+            _note(repairs, "주석 제거")
+            continue
+
+        if char == '"':
+            in_string = True
+            out.append(char)
+        elif char in "{[":
+            stack.append([char, "key" if char == "{" else "value"])
+            out.append(char)
+            mark_safe()  # 빈 객체/배열로 닫을 수 있는 위치
+        elif char in "}]":
+            _strip_trailing_comma(out, repairs)
+            if not stack:
+                break
+            if CLOSERS[stack[-1][0]] != char:
+                raise json.JSONDecodeError("괄호 짝이 맞지 않습니다", text, position)
+            stack.pop()
+            out.append(char)
+            if not stack:
+                break
+            mark_safe()
+        elif char == ":":
+            if stack and stack[-1][0] == "{":
+                stack[-1][1] = "value"
+            out.append(char)
+        elif char == ",":
+            if stack and stack[-1][0] == "{":
+                stack[-1][1] = "key"
+            out.append(char)
+        elif char == "`" and text.startswith("```", position):
+            break
+        elif char.isspace():
+            out.append(char)
+        else:
+            # 숫자, true/false/null 등 따옴표 없는 값
+            match = re.match(r'[^\s,:{}\[\]"/`]+|.', text[position:])
+            token = match.group(0)
+            replacement = {"True": "true", "False": "false", "None": "null", "NaN": "null"}.get(token)
+            if replacement:
+                _note(repairs, "Python 형식 값 변환")
+            out.append(replacement or token)
+            position += len(token)
+            if position < length:
+                mark_safe()
+            continue
+        position += 1
+
+    if stack:
+        # 잘린 응답 - 마지막으로 완성된 값까지만 남기고 열린 괄호를 닫음
+        cut, open_frames = safe
+        out = out[:cut]
+        _strip_trailing_comma(out, repairs)
+        out.extend(CLOSERS[frame[0]] for frame in reversed(open_frames))
+        repairs.append("잘린 응답의 괄호 닫기")
+
+    repaired = "".join(out)
+    data = json.loads(repaired)
+    if repairs:
+        logger.info(f"JSON 응답 수정: {', '.join(repairs)}")
+    return data, repairs
+
+
+def validate_against_template(data, template, path=""):
+    """
+    파싱된 결과를 JSON 템플릿 구조와 비교하여 문제 목록 반환
+
+    템플릿에 있는 키가 없거나 형식(객체/배열/값)이 다르면 문제로 기록하고, 'year' 배열이 있는 항목은
+    각 배열의 길이가 연도 수와 같은지 확인함. 템플릿에 없는 키는 허용하며, FIXED_KEYS에 있는 경로는
+    고정 키만 검사함 (radar_data의 '풍전비철'처럼 예시 회사명이 키인 경우).
+
+    Args:
+        data: 파싱된 결과
+        template: 기대하는 구조 (finance_format.json 등)
+        path (str, optional): 오류 메시지에 표시할 상위 경로
+
+    Returns:
+        list: 문제 설명 목록 (문제가 없으면 빈 목록)
+    """
+    issues = []
+    if not isinstance(template, dict):
+        return issues
+    if not isinstance(data, dict):
+        return [f"{path or '최상위'}: 객체가 아닙니다"]
+
+    fixed_keys = FIXED_KEYS.get(path)
+    for key, expected in template.items():
+        if fixed_keys is not None and key not in fixed_keys:
+            continue
+        name = f"{path}.{key}" if path else key
+        if key not in data:
+            issues.append(f"{name}: 항목 없음")
+            continue
+        value = data[key]
+        if isinstance(expected, dict):
+            issues.extend(validate_against_template(value, expected, name))
+        elif isinstance(expected, list) and not isinstance(value, list):
+            issues.append(f"{name}: 배열이 아닙니다")
+        elif not isinstance(expected, (dict, list)) and isinstance(value, (dict, list)):
+            issues.append(f"{name}: 단일 값이어야 합니다")
+
+    years = data.get("year")
+    if isinstance(years, list) and "year" in template:
+        for key, value in data.items():
+            if key != "year" and isinstance(value, list) and isinstance(template.get(key), list) \
+                    and len(value) != len(years):
+                issues.append(f"{path}.{key}: 연도 수({len(years)})와 값 개수({len(value)})가 다릅니다")
+    return issues
+
+
+def _find_start(text):
+    """JSON 시작 위치 (코드 블록이 있으면 블록 안의 첫 '{' 또는 '[')"""
+    fence = re.search(r'```(?:json)?', text)
+    offset = fence.end() if fence else 0
+    match = re.search(r'[{\[]', text[offset:])
+    if match is None and fence:
+        match = re.search(r'[{\[]', text)
+        offset = 0
+    return offset + match.start() if match else None
+
+
+def _strip_trailing_comma(out, repairs):
+    """출력 끝의 쉼표(뒤따르는 공백 포함) 제거"""
+    index = len(out) - 1
+    while index >= 0 and out[index].isspace():
+        index -= 1
+    if index >= 0 and out[index] == ",":
+        del out[index:]
+        _note(repairs, "마지막 쉼표 제거")
+
+
+def _note(repairs, repair):
+    if repair not in repairs:
+        repairs.append(repair)
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from data.cache_store import FileCacheStore
+
+logger = logging.getLogger("finance_analysis.llm_cache")
+
+# LLM 응답 캐시 형식 버전 - 저장 형식이 바뀌면 올려서 이전 응답을 무효화
+RESPONSE_CACHE_VERSION = 1
+
+# 같은 프로세스의 모든 세션이 공유하는 기본 LLM 응답 캐시 (7일 유효)
+default_response_cache = FileCacheStore(
+    "llm_responses",
+    max_bytes=100 * 1024 * 1024,
+    memory_items=32,
+    ttl_seconds=7 * 24 * 3600
+)
+
+
+class _LeaderAbandoned(Exception):
+    """리더가 오류가 아닌 이유(세션 재실행, 중단, 취소)로 끝나 기다리던 호출 중 하나가 다시 실행해야 함을 알리는 신호"""
+
+
+class SingleFlight:
+    """같은 키의 요청이 이미 진행 중이면 다시 실행하지 않고 진행 중인 결과를 함께 기다리게 하는 클래스
+
+    여러 세션(스레드)과 이벤트 루프가 공유하며, 먼저 시작한 호출(리더)의 결과나 오류(Exception)를 뒤따른
+    호출이 그대로 받음. 리더가 Streamlit 재실행/중지, KeyboardInterrupt, 작업 취소처럼 Exception이 아닌
+    이유로 끝나면 그 세션의 사정이므로 다른 세션에 전달하지 않고, 기다리던 호출 중 하나가 새 리더가 되어
+    다시 실행함. 완료된 결과는 보관하지 않으므로 이후 요청은 응답 캐시나 새 호출로 처리됨.
+    """
+
+    def __init__(self):
+        """SingleFlight 클래스 초기화"""
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key, func, timeout=None):
+        """
+        key의 요청이 진행 중이면 그 결과를 기다리고, 아니면 func()를 실행하여 결과를 공유
+
+        Args:
+            key (str): 입력 해시 (LLM 응답 캐시 키)
+            func (callable): 인자 없이 결과를 반환하는 함수
+            timeout (float, optional): 진행 중인 요청을 기다릴 최대 시간(초) - 요청 자체의 제한 시간과 맞춤
+
+        Returns:
+            tuple: (결과, 직접 실행했는지 여부)
+
+        Raises:
+            TimeoutError: 진행 중인 요청이 timeout 안에 끝나지 않은 경우
+        """
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return future.result(timeout), False
+            except _LeaderAbandoned:
+                continue
+            except FutureTimeoutError:
+                raise TimeoutError(f"진행 중인 같은 LLM 요청이 {timeout}초 안에 끝나지 않았습니다.")
+        try:
+            result = func()
+        except Exception as error:
+            self._finish(key, future, error=error)
+            raise
+        except BaseException:
+            self._finish(key, future, error=_LeaderAbandoned())
+            raise
+        self._finish(key, future, result)
+        return result, True
+
+    async def do_async(self, key, func, timeout=None):
+        """do()의 비동기 버전 (func는 코루틴을 반환하는 함수, 다른 스레드의 이벤트 루프와도 공유)"""
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                # 기다리던 쪽이 취소되거나 시간이 초과되어도 공유 Future는 건드리지 않음
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout), False
+            except _LeaderAbandoned:
+                continue
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"진행 중인 같은 LLM 요청이 {timeout}초 안에 끝나지 않았습니다.")
+        try:
+            result = await func()
+        except Exception as error:
+            self._finish(key, future, error=error)
+            raise
+        except BaseException:
+            self._finish(key, future, error=_LeaderAbandoned())
+            raise
+        self._finish(key, future, result)
+        return result, True
+
+    def _join(self, key):
+        """진행 중인 요청의 Future를 찾거나 새로 등록 (새로 등록하면 리더)"""
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.followers += 1
+                logger.info("진행 중인 같은 LLM 요청의 응답을 함께 기다림")
+                return future, False
+            future = Future()
+            future.set_running_or_notify_cancel()  # 기다리던 쪽이 취소되어도 리더의 결과는 유지
+            self._flights[key] = future
+            self.leaders += 1
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        """진행 목록에서 제거한 뒤 기다리는 호출에 결과 또는 예외 전달"""
+        with self._lock:
+            self._flights.pop(key, None)
+        if isinstance(error, _LeaderAbandoned):
+            logger.info("LLM 요청을 시작한 세션이 중단되어 기다리던 세션에서 다시 요청")
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+# 같은 프로세스의 모든 세션이 공유하는 진행 중 요청 목록
+default_single_flight = SingleFlight()
+
+
+def make_response_key(model, system_message, messages, temperature, max_tokens):
+    """모델, 시스템 프롬프트, 사용자 입력, 온도, 최대 토큰 수로 LLM 응답 캐시 키 생성"""
+    return FileCacheStore.make_key(
+        RESPONSE_CACHE_VERSION, model, system_message, messages, temperature, max_tokens
+    )
+
+
+def format_cache_stats(response_cache):
+    """LLM 응답 캐시 통계를 화면 표시용 문자열로 반환"""
+    cache_stats = response_cache.stats()
+    return (
+        f"LLM 응답 캐시: 적중 {cache_stats['hits']}회 · 미적중 {cache_stats['misses']}회 "
+        f"(저장 {cache_stats['entries']}건, {cache_stats['bytes'] / 1024 / 1024:.1f}MB)"
+    )
+
+
+def cacheable_system(system_message):
+    """시스템 프롬프트를 프롬프트 캐시 지점(cache_control)이 표시된 텍스트 블록 목록으로 변환
+
+    고정된 시스템 프롬프트(프롬프트 + JSON 템플릿)를 매 요청 같은 바이트로 보내야 캐시가 적중하므로
+    요청별로 바뀌는 내용은 시스템 프롬프트에 넣지 않음. 최소 길이(모델별 1024~2048토큰)보다 짧으면
+    API가 캐시 표시를 무시하고 일반 요청으로 처리함.
+    """
+    if isinstance(system_message, list):
+        return system_message
+    return [{"type": "text", "text": system_message, "cache_control": {"type": "ephemeral"}}]
+
+
+class PromptUsageLog:
+    """API 응답별 입력/출력 토큰과 프롬프트 캐시 쓰기/읽기 토큰 기록"""
+
+    def __init__(self):
+        """PromptUsageLog 클래스 초기화"""
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(self, response, label=None):
+        """
+        API 응답의 토큰 사용량 기록
+
+        Args:
+            response: messages.create() 또는 스트림의 최종 메시지 (usage 속성이 없으면 기록하지 않음)
+            label (str, optional): 요청 구분용 이름
+
+        Returns:
+            dict: 기록된 사용량 (usage가 없으면 None)
+        """
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return None
+        entry = {
+            "label": label,
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0
+        }
+        with self._lock:
+            self.records.append(entry)
+        return entry
+
+    def summary(self):
+        """기록된 요청 수와 항목별 토큰 합계, 캐시 읽기 비율 반환"""
+        with self._lock:
+            records = list(self.records)
+        totals = {
+            key: sum(record[key] for record in records)
+            for key in ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+        }
+        # input_tokens에는 캐시 지점 이후의 토큰만 포함되므로 전체 입력은 세 항목의 합
+        prompt_tokens = totals["input_tokens"] + totals["cache_creation_input_tokens"] + totals["cache_read_input_tokens"]
+        totals["requests"] = len(records)
+        totals["cache_read_ratio"] = totals["cache_read_input_tokens"] / prompt_tokens if prompt_tokens else 0
+        return totals
+
+
+def format_usage_stats(usage_log):
+    """토큰 사용량과 프롬프트 캐시 현황을 화면 표시용 문자열로 반환 (기록이 없으면 빈 문자열)"""
+    usage = usage_log.summary()
+    if not usage["requests"]:
+        return ""
+    return (
+        f"API 요청 {usage['requests']}회: 입력 {usage['input_tokens']:,} · 출력 {usage['output_tokens']:,}토큰, "
+        f"프롬프트 캐시 쓰기 {usage['cache_creation_input_tokens']:,} · 읽기 {usage['cache_read_input_tokens']:,}토큰 "
+        f"(입력의 {usage['cache_read_ratio']:.0%} 캐시 사용)"
+    )
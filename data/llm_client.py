@@ -0,0 +1,364 @@
+import os
+import time
+import json
+import random
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+
+from anthropic import Anthropic, AsyncAnthropic, APIStatusError, APIConnectionError
+
+from data.context_packer import estimate_tokens
+
+logger = logging.getLogger("finance_analysis.llm_client")
+
+# 재시도할 HTTP 상태 코드 (요청 시간 초과, 충돌, 요청 한도 초과, 서버 오류/과부하 529)
+RETRY_STATUS_CODES = {408, 409, 429}
+
+# 이미지 블록 하나의 입력 토큰 추정치 (API가 줄이는 최대 크기 기준)
+IMAGE_BLOCK_TOKENS = 1600
+
+# 환경변수 또는 Streamlit secrets로 바꿀 수 있는 기본 풀 설정 (인자 이름: (설정 이름, 기본값))
+# 값이 비어 있거나 0/none이면 해당 제한을 끔. 분당 토큰 수는 계정 등급마다 달라 기본으로 제한하지 않음
+POOL_SETTINGS = {
+    "requests_per_minute": ("LLM_REQUESTS_PER_MINUTE", 50),
+    "tokens_per_minute": ("LLM_TOKENS_PER_MINUTE", None),
+    "max_in_flight": ("LLM_MAX_IN_FLIGHT", 8),
+    "max_retries": ("LLM_MAX_RETRIES", 4)
+}
+
+
+class RateLimiter:
+    """분당 요청 수와 분당 입력 토큰 수를 함께 제한하는 토큰 버킷
+
+    요청마다 버킷에서 바로 차감하고(잔량이 음수가 될 수 있음) 잔량이 0으로 회복될 때까지 기다릴 시간을
+    돌려주므로, 여러 스레드와 이벤트 루프가 같은 버킷을 공유해도 도착 순서대로 간격이 벌어짐.
+    요청 버킷 크기는 burst_seconds 동안의 한도로 제한하여 1분 한도를 한 번에 몰아 보내지 않게 함.
+    토큰 버킷은 API와 같이 1분 한도까지 채워지고 요청 하나의 차감은 버킷 크기로 제한하므로,
+    버킷이 차 있으면 최대 크기의 요청도 기다리지 않고 바로 보냄.
+    """
+
+    def __init__(self, requests_per_minute=50, tokens_per_minute=None, burst_seconds=10):
+        """
+        RateLimiter 클래스 초기화
+
+        Args:
+            requests_per_minute (int, optional): 분당 최대 요청 수 (None이면 제한 없음)
+            tokens_per_minute (int, optional): 분당 최대 입력 토큰 수 (None이면 제한 없음)
+            burst_seconds (float, optional): 쉬고 난 뒤 한 번에 보낼 수 있는 요청 수 (이 시간 동안의 한도)
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_capacity = max(1.0, requests_per_minute * burst_seconds / 60) if requests_per_minute else None
+        self.token_capacity = tokens_per_minute or None
+        self._requests = self.request_capacity or 0
+        self._tokens = self.token_capacity or 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens):
+        """
+        요청 1회와 입력 토큰을 차감하고 보내기 전에 기다려야 할 시간(초) 반환
+
+        Args:
+            tokens (int): 추정 입력 토큰 수 (버킷 크기보다 크면 버킷 크기로 제한)
+
+        Returns:
+            float: 대기 시간(초)
+        """
+        with self._lock:
+            self._refill()
+            waits = [0]
+            if self.requests_per_minute:
+                self._requests -= 1
+                waits.append(-self._requests / self.requests_per_minute * 60)
+            if self.tokens_per_minute:
+                self._tokens -= min(tokens, self.token_capacity)
+                waits.append(-self._tokens / self.tokens_per_minute * 60)
+            return max(waits)
+
+    def adjust(self, tokens):
+        """실제 사용량과 추정치의 차이만큼 토큰 버킷 보정 (양수면 추가 차감)"""
+        if not self.tokens_per_minute:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+
+    def acquire(self, tokens):
+        """한도에 맞을 때까지 현재 스레드에서 대기"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens):
+        """한도에 맞을 때까지 이벤트 루프를 막지 않고 대기"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.request_capacity, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.token_capacity, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+
+class LLMClientPool:
+    """API 키별 Anthropic 클라이언트를 프로세스 전체에서 공유하고 요청 속도와 재시도를 관리하는 클래스
+
+    동기 클라이언트는 API 키별로 하나만 만들어 HTTP 연결을 재사용함. 비동기 클라이언트는 이벤트 루프에
+    묶이므로 호출한 쪽의 실행 단위(asyncio.run 한 번)마다 만들어 닫지만 같은 속도 제한을 공유함.
+    SDK 자체 재시도는 끄고, 429/529/5xx와 연결 오류는 retry-after 또는 지터를 준 지수 백오프로 재시도함.
+    """
+
+    def __init__(self, requests_per_minute=50, tokens_per_minute=None, max_in_flight=8, max_retries=4,
+                 base_delay=1.0, max_delay=30.0):
+        """
+        LLMClientPool 클래스 초기화
+
+        Args:
+            requests_per_minute (int, optional): 분당 최대 요청 수 (모든 세션 합계, None이면 제한 없음)
+            tokens_per_minute (int, optional): 분당 최대 입력 토큰 수 (모든 세션 합계, None이면 제한 없음)
+            max_in_flight (int, optional): 동시에 진행할 수 있는 최대 요청 수 (모든 세션 합계)
+            max_retries (int, optional): 재시도 가능한 오류의 최대 재시도 횟수
+            base_delay (float, optional): 첫 재시도 대기 시간(초), 재시도마다 두 배
+            max_delay (float, optional): 재시도 대기 시간 상한(초)
+        """
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._slot_released = threading.Condition(self._lock)
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "wait_seconds": 0.0}
+
+    def client(self, api_key):
+        """API 키별 공유 동기 클라이언트 (처음 요청할 때 생성)"""
+        with self._lock:
+            if api_key not in self._clients:
+                self._clients[api_key] = Anthropic(api_key=api_key, max_retries=0)
+            return self._clients[api_key]
+
+    def async_client(self, api_key):
+        """재시도를 이 풀에서 처리하는 비동기 클라이언트 (이벤트 루프에 묶이므로 호출한 쪽에서 닫아야 함)"""
+        return AsyncAnthropic(api_key=api_key, max_retries=0)
+
+    def call(self, func, request):
+        """
+        속도 제한과 재시도를 적용하여 API 호출 (예: func=client.messages.create)
+
+        Args:
+            func (callable): 요청 인자를 키워드로 받는 API 메서드
+            request (dict): 요청 인자
+
+        Returns:
+            API 응답
+        """
+        tokens = estimate_request_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            self._wait(self.limiter.acquire(tokens))
+            with self._slot():
+                try:
+                    response = func(**request)
+                    self._settle(tokens, response)
+                    return response
+                except Exception as error:
+                    delay = self._retry_delay(error, attempt)
+            time.sleep(delay)
+
+    async def call_async(self, func, request):
+        """call()의 비동기 버전 (예: func=async_client.messages.create)"""
+        tokens = estimate_request_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            self._wait(await self.limiter.acquire_async(tokens))
+            await self._acquire_slot_async()
+            try:
+                response = await func(**request)
+                self._settle(tokens, response)
+                return response
+            except Exception as error:
+                delay = self._retry_delay(error, attempt)
+            finally:
+                self._release_slot()
+            await asyncio.sleep(delay)
+
+    @contextmanager
+    def stream(self, client, request):
+        """
+        속도 제한과 재시도를 적용하여 스트리밍 응답 열기 (응답을 받기 시작한 뒤의 오류는 재시도하지 않음)
+
+        스트림을 끝까지 읽으면 최종 메시지의 사용량으로 토큰 버킷을 보정하고, 호출한 쪽에서 중단하면
+        요청 수만 기록함
+
+        Args:
+            client (Anthropic): 동기 클라이언트
+            request (dict): 요청 인자
+
+        Yields:
+            MessageStream: text_stream과 get_final_message()를 제공하는 스트림
+        """
+        tokens = estimate_request_tokens(request)
+        for attempt in range(self.max_retries + 1):
+            self._wait(self.limiter.acquire(tokens))
+            with self._slot():
+                manager = client.messages.stream(**request)
+                try:
+                    stream = manager.__enter__()
+                except Exception as error:
+                    delay = self._retry_delay(error, attempt)
+                else:
+                    try:
+                        yield stream
+                    except BaseException:
+                        self._settle(tokens, None)
+                        raise
+                    else:
+                        self._settle(tokens, stream.get_final_message())
+                    finally:
+                        manager.__exit__(None, None, None)
+                    return
+            time.sleep(delay)
+
+    def stats(self):
+        """요청/재시도/실패 횟수와 속도 제한으로 기다린 시간 합계"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _retry_delay(self, error, attempt):
+        """재시도할 오류면 대기 시간(초)을 반환하고, 아니면 오류를 다시 발생시킴"""
+        status = getattr(error, "status_code", None)
+        retryable = isinstance(error, APIConnectionError) or (
+            isinstance(error, APIStatusError) and (status in RETRY_STATUS_CODES or status >= 500)
+        )
+        if not retryable or attempt >= self.max_retries:
+            with self._lock:
+                self._stats["failures"] += 1
+            raise error
+
+        # 서버가 알려준 대기 시간을 우선 사용하고, 없으면 지수 백오프에 전체 지터 적용
+        delay = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                delay = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                delay = None
+        if delay is None:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        delay = min(delay, self.max_delay)
+
+        with self._lock:
+            self._stats["retries"] += 1
+        logger.warning(f"Claude API 재시도 {attempt + 1}/{self.max_retries} ({delay:.1f}초 후): {error}")
+        return delay
+
+    def _settle(self, tokens, response):
+        """응답의 실제 입력 토큰으로 토큰 버킷 보정 (캐시에서 읽은 토큰은 제외, 응답이 없으면 요청 수만 기록)"""
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            actual = (getattr(usage, "input_tokens", 0) or 0) + (getattr(usage, "cache_creation_input_tokens", 0) or 0)
+            self.limiter.adjust(actual - tokens)
+        with self._lock:
+            self._stats["requests"] += 1
+
+    def _wait(self, seconds):
+        if seconds > 0:
+            with self._lock:
+                self._stats["wait_seconds"] += seconds
+
+    @contextmanager
+    def _slot(self):
+        """동시 요청 수 제한 (동기 호출용)"""
+        with self._slot_released:
+            while self._in_flight >= self.max_in_flight:
+                self._slot_released.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._release_slot()
+
+    async def _acquire_slot_async(self):
+        """동시 요청 수 제한 (비동기 호출용 - 다른 스레드와 공유하므로 짧게 양보하며 확인)"""
+        while True:
+            with self._lock:
+                if self._in_flight < self.max_in_flight:
+                    self._in_flight += 1
+                    return
+            await asyncio.sleep(0.05)
+
+    def _release_slot(self):
+        with self._slot_released:
+            self._in_flight -= 1
+            self._slot_released.notify()
+
+
+def estimate_request_tokens(request):
+    """요청의 입력 토큰 수 추정 (시스템 프롬프트 + 메시지 텍스트, 이미지 블록은 블록당 고정값)"""
+    tokens = 0
+    for part in [request.get("system")] + [message.get("content") for message in request.get("messages", [])]:
+        if isinstance(part, str):
+            tokens += estimate_tokens(part)
+        elif isinstance(part, list):
+            for block in part:
+                if not isinstance(block, dict):
+                    tokens += estimate_tokens(json.dumps(block, ensure_ascii=False, default=str))
+                elif block.get("type") == "image":
+                    tokens += IMAGE_BLOCK_TOKENS
+                else:
+                    tokens += estimate_tokens(block.get("text", ""))
+    return tokens
+
+
+def load_pool_settings():
+    """
+    환경변수 또는 Streamlit secrets에서 기본 풀 설정 읽기 (환경변수 우선)
+
+    Returns:
+        dict: LLMClientPool 인자 (설정이 없으면 POOL_SETTINGS의 기본값)
+    """
+    settings = {}
+    for name, (key, default) in POOL_SETTINGS.items():
+        value = _read_setting(key)
+        if value is None:
+            settings[name] = default
+            continue
+        value = str(value).strip()
+        if value.lower() in ("", "0", "none", "off"):
+            settings[name] = 0 if name == "max_retries" else None
+            continue
+        try:
+            settings[name] = int(float(value))
+        except ValueError:
+            logger.warning(f"{key} 설정값 '{value}'을 숫자로 읽을 수 없어 기본값 {default} 사용")
+            settings[name] = default
+    if settings["max_in_flight"] is None:
+        settings["max_in_flight"] = float("inf")
+    return settings
+
+
+def _read_setting(key):
+    """환경변수, 없으면 Streamlit secrets의 설정값 (둘 다 없으면 None)"""
+    value = os.getenv(key)
+    if value is not None:
+        return value
+    try:
+        import streamlit as st
+        return st.secrets.get(key)
+    except Exception:
+        return None
+
+
+# 같은 프로세스의 모든 세션이 공유하는 기본 클라이언트 풀
+default_client_pool = LLMClientPool(**load_pool_settings())
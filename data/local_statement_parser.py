@@ -0,0 +1,266 @@
+import re
+import logging
+
+from data.table_encoder import TableEncoder, UNIT_PATTERN
+
+logger = logging.getLogger("finance_analysis.local_statement_parser")
+
+# 재무제표 유형별 하위 스키마 항목에 대응하는 표준 계정과목 (공백, 번호, '(손실)' 표기를 제거한 이름)
+ACCOUNT_ALIASES = {
+    "재무상태표": {
+        "총자산": ["자산총계"],
+        "총부채": ["부채총계"],
+        "자본총계": ["자본총계"],
+        "유동자산": ["유동자산"],
+        "유동부채": ["유동부채"],
+        "매출채권": ["매출채권", "매출채권및기타채권", "매출채권및기타유동채권", "단기매출채권"],
+        "재고자산": ["재고자산"],
+        "매입채무": ["매입채무", "매입채무및기타채무", "매입채무및기타유동채무"]
+    },
+    "손익계산서": {
+        "매출액": ["매출액", "매출", "영업수익", "수익(매출액)"],
+        "매출원가": ["매출원가", "영업원가"],
+        "영업이익": ["영업이익"],
+        "이자비용": ["이자비용"],
+        "순이익": ["당기순이익", "연결당기순이익", "당기순손익"]
+    },
+    "현금흐름표": {
+        "영업활동": ["영업활동현금흐름", "영업활동으로인한현금흐름", "영업활동순현금흐름", "영업활동으로인한순현금흐름"],
+        "투자활동": ["투자활동현금흐름", "투자활동으로인한현금흐름", "투자활동순현금흐름", "투자활동으로인한순현금흐름"],
+        "재무활동": ["재무활동현금흐름", "재무활동으로인한현금흐름", "재무활동순현금흐름", "재무활동으로인한순현금흐름"],
+        "유형자산취득": ["유형자산의취득", "유형자산취득"]
+    }
+}
+
+# 금액 단위별 억원 환산 배율
+UNIT_SCALES = {"원": 1e-8, "천원": 1e-5, "백만원": 1e-2, "십억원": 10, "억원": 1}
+
+
+class LocalStatementParser:
+    """표준 계정과목으로 작성된 재무제표 표를 LLM 없이 하위 스키마 형식으로 변환하는 클래스
+
+    표의 첫 열(계정과목)을 ACCOUNT_ALIASES의 표준 계정명과 비교하고, 머리글의 당기/전기 열 묶음에서
+    금액을 읽어 페이지의 단위 표기에 따라 억원으로 환산함. 머리글에 연도가 없으면 페이지 상단의
+    기간 표기(예: "제 55 기 2024년 12월 31일 현재")에 나온 연도를 열 묶음 순서대로 사용함.
+    연도나 단위를 확인할 수 없으면 잘못된 숫자를 만들지 않도록 해당 유형 전체를 LLM에 맡김.
+    """
+
+    def __init__(self):
+        """LocalStatementParser 클래스 초기화"""
+        self.table_encoder = TableEncoder()
+        self.max_header_rows = 3
+
+    def parse(self, session, statement_type, pages):
+        """
+        재무제표 페이지의 표에서 하위 스키마 항목 추출
+
+        Args:
+            session (PdfDocumentSession): 문서 세션
+            statement_type (str): ACCOUNT_ALIASES의 재무제표 유형
+            pages (list): 해당 유형의 페이지 번호 목록
+
+        Returns:
+            tuple: (하위 스키마 형식의 추출 결과 또는 None, LLM에 요청해야 할 항목 목록)
+        """
+        aliases = ACCOUNT_ALIASES.get(statement_type)
+        if not aliases:
+            return None, []
+
+        account_fields = {
+            alias: field for field, field_aliases in aliases.items() for alias in field_aliases
+        }
+        values = {}       # 항목 -> 열 묶음 순서별 금액
+        years = None
+        scale = None
+        company_name = ""
+        layout = None
+
+        for page_num in sorted(pages):
+            page_text = session.get_text(page_num)
+            scale = self._find_scale(page_text) or scale
+            page_years = self._find_years(page_text)
+            company_name = company_name or self._find_company_name(page_text)
+
+            for table in session.get_tables(page_num):
+                table_layout, body = self._column_layout(table)
+                if table_layout is None:
+                    # 머리글 없이 이어지는 표는 같은 열 구성의 직전 머리글을 사용
+                    if layout is None or layout['width'] != max(len(row) for row in table):
+                        continue
+                    table_layout = layout
+                layout = table_layout
+
+                # 표마다 열 묶음의 연도를 확인하여 첫 표의 연도 순서에 맞춤 (기간 수나 연도가 다른 표는 건너뜀)
+                table_years = self._label_years(layout, page_years)
+                if years is None:
+                    years = table_years
+                    if years is None:
+                        continue
+                order = self._period_order(layout, table_years, years)
+                if order is None:
+                    logger.info(f"{statement_type} 로컬 파싱: {page_num}페이지 표의 기간 구성이 달라 건너뜀 "
+                                f"({table_years or len(layout['periods'])} / {years})")
+                    continue
+
+                for row in body:
+                    field = account_fields.get(self._normalize_account(row[0] if row else ""))
+                    if field is None or field in values:
+                        continue
+                    amounts = [self._read_amount(row, layout['periods'][index]) for index in order]
+                    if any(amount is not None for amount in amounts):
+                        values[field] = amounts
+
+        if not values or years is None or scale is None:
+            return None, list(aliases)
+
+        # 유형자산 취득액은 양수, 부채총계가 없으면 자산총계 - 자본총계로 계산
+        if "유형자산취득" in values:
+            values["유형자산취득"] = [abs(amount) if amount is not None else None for amount in values["유형자산취득"]]
+        if statement_type == "재무상태표" and "총부채" not in values and {"총자산", "자본총계"} <= set(values):
+            values["총부채"] = [
+                assets - equity if assets is not None and equity is not None else None
+                for assets, equity in zip(values["총자산"], values["자본총계"])
+            ]
+
+        # 연도 오름차순으로 정렬하고 억원으로 환산
+        order = sorted(range(len(years)), key=lambda index: years[index])
+        result = {"year": [years[index] for index in order]}
+        if statement_type == "재무상태표":
+            result["company_name"] = company_name
+            result["report_year"] = result["year"][-1]
+        for field, amounts in values.items():
+            result[field] = [
+                round(amounts[index] * scale, 1) if amounts[index] is not None else 0 for index in order
+            ]
+
+        # 찾지 못한 항목은 모두 LLM에 요청 (0으로 남기면 회전율/이자보상배율 등이 실제 값처럼 계산됨)
+        # 응답이 오기 전까지는 0으로 두고, 병합 단계에서 LLM이 추출한 값으로 채움
+        missing = [field for field in aliases if field not in values]
+        for field in missing:
+            result[field] = [0] * len(order)
+
+        if missing:
+            logger.info(f"{statement_type} 로컬 파싱: 찾지 못한 항목 {', '.join(missing)} - LLM에 요청")
+        return result, missing
+
+    def _column_layout(self, table):
+        """표 머리글에서 당기/전기 열 묶음을 찾음
+
+        Returns:
+            tuple: ({'width', 'periods', 'labels'} 또는 머리글이 없으면 None, 머리글을 제외한 본문 행)
+        """
+        rows = [row for row in table if row]
+        if not rows:
+            return None, []
+        width = max(len(row) for row in rows)
+
+        # 첫 행과 계정과목 칸이 빈 다음 행들이 머리글 (금액이 있거나 계정과목이 있으면 본문 시작)
+        if any(self._is_amount_cell(cell) for cell in rows[0][1:]):
+            return None, rows
+        header_count = 1
+        while (header_count < min(self.max_header_rows, len(rows)) and not rows[header_count][0]
+               and not any(self._is_amount_cell(cell) for cell in rows[header_count][1:])):
+            header_count += 1
+
+        # 병합된 머리글 칸(None 또는 빈 칸)은 왼쪽 열과 같은 묶음으로 처리
+        groups = []
+        for column in range(1, width):
+            cells = [row[column] if column < len(row) else None for row in rows[:header_count]]
+            label = " ".join(str(cell).strip() for cell in cells if cell and str(cell).strip())
+            if not label and groups:
+                groups[-1][1].append(column)
+            else:
+                groups.append([label, [column]])
+
+        periods = [
+            (label, columns) for label, columns in groups
+            if label and not re.search(r'주\s*석|비\s*고|Note', label)
+        ]
+        if not periods:
+            return None, rows
+        return {
+            'width': width,
+            'labels': [label for label, _ in periods],
+            'periods': [columns for _, columns in periods]
+        }, rows[header_count:]
+
+    def _label_years(self, layout, page_years):
+        """열 묶음별 연도 - 머리글의 연도를 우선 사용하고 없으면 페이지 기간 표기의 연도를 순서대로 사용"""
+        years = []
+        for index, label in enumerate(layout['labels']):
+            match = re.search(r'(19|20)\d{2}', label)
+            if match:
+                years.append(match.group(0))
+            elif index < len(page_years):
+                years.append(page_years[index])
+            else:
+                return None
+        return years if len(set(years)) == len(years) else None
+
+    def _period_order(self, layout, table_years, years):
+        """표의 열 묶음 순서를 기준 연도 순서에 맞춘 인덱스 목록 (맞출 수 없으면 None)"""
+        if len(layout['periods']) != len(years):
+            return None
+        if table_years is None:
+            return list(range(len(years)))
+        if sorted(table_years) != sorted(years):
+            return None
+        return [table_years.index(year) for year in years]
+
+    def _find_years(self, page_text):
+        """페이지 상단 기간 표기에 나온 연도를 나온 순서대로 반환 (중복 제거)"""
+        years = []
+        for match in re.finditer(r'((?:19|20)\d{2})\s*(?:년|\.|-|/)', page_text[:600]):
+            if match.group(1) not in years:
+                years.append(match.group(1))
+        return years
+
+    def _find_scale(self, page_text):
+        """페이지의 단위 표기를 억원 환산 배율로 변환 (단위를 찾지 못하면 None)"""
+        match = re.search(UNIT_PATTERN, page_text)
+        if not match:
+            return None
+        unit = re.sub(r'\s+', '', match.group(1))
+        for name in sorted(UNIT_SCALES, key=len, reverse=True):
+            if unit.startswith(name):
+                return UNIT_SCALES[name]
+        return None
+
+    def _find_company_name(self, page_text):
+        """페이지 상단에서 회사명 찾기 (주식회사/㈜ 표기 기준)"""
+        for line in page_text.splitlines()[:10]:
+            match = re.search(r'(주식회사[ \t]*[^\s(]+|[^\s(]+[ \t]*주식회사|㈜[ \t]*[^\s(]+|\(주\)[ \t]*[^\s(]+)', line)
+            if match:
+                return match.group(1).strip()
+        return ""
+
+    def _normalize_account(self, name):
+        """계정과목 이름 정규화 - 공백, 앞 번호(Ⅰ., 1., (1), 가.), 주석/손익 괄호 표기 제거"""
+        if not name:
+            return ""
+        name = re.sub(r'\s+', '', str(name))
+        name = re.sub(r'^(?:[ⅠⅡⅢⅣⅤⅥⅦⅧⅨⅩ]+|[IVX]+|\d+|[가-하])[.)]', '', name)
+        name = re.sub(r'^\(\d+\)', '', name)
+        return re.sub(r'\((?:주석[^)]*|[\d,]+|손실|이익)\)', '', name)
+
+    def _read_amount(self, row, columns):
+        """열 묶음에서 처음 나오는 금액 (소계 열과 합계 열이 나뉜 표 대응)"""
+        for column in columns:
+            if column < len(row):
+                amount = self._parse_amount(row[column])
+                if amount is not None:
+                    return amount
+        return None
+
+    def _is_amount_cell(self, cell):
+        """머리글 판별용 - 금액 셀인지 여부 ('2024'처럼 연도만 적힌 머리글 칸은 금액으로 보지 않음)"""
+        if re.fullmatch(r'(?:19|20)\d{2}', re.sub(r'\s+', '', str(cell or ''))):
+            return False
+        return self._parse_amount(cell) is not None
+
+    def _parse_amount(self, cell):
+        """셀 금액을 숫자로 변환 ((1,234)/△1,234는 음수, 숫자가 아니면 None)"""
+        value = self.table_encoder.normalize_cell(cell)
+        if re.fullmatch(r'-?\d+(\.\d+)?', value):
+            return float(value)
+        return None
@@ -0,0 +1,167 @@
+from io import BytesIO
+
+import fitz  # PyMuPDF
+import pdfplumber
+
+from data.cache_store import FileCacheStore
+
+
+def open_fitz_document(pdf_source):
+    """PDF 파일 경로 또는 PDF 바이트로 PyMuPDF 문서 열기 (바이트는 임시 파일 없이 메모리에서 열음)"""
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=pdf_source, filetype="pdf")
+    return fitz.open(pdf_source)
+
+
+def open_pdfplumber_document(pdf_source, **kwargs):
+    """PDF 파일 경로 또는 PDF 바이트로 pdfplumber 문서 열기 (바이트는 임시 파일 없이 메모리에서 열음)"""
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        return pdfplumber.open(BytesIO(pdf_source), **kwargs)
+    return pdfplumber.open(pdf_source, **kwargs)
+
+
+def hash_pdf_source(pdf_source):
+    """PDF 파일 경로 또는 PDF 바이트의 SHA-256 해시 계산"""
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        return FileCacheStore.hash_bytes(pdf_source)
+    return FileCacheStore.hash_file(pdf_source)
+
+
+class PdfDocumentSession:
+    """PDF 문서를 한 번만 열어 탐지, 텍스트 추출, 페이지 렌더링 단계가 공유하는 세션
+
+    PyMuPDF/pdfplumber 문서는 처음 필요할 때 한 번만 열고, 페이지별 텍스트·표·렌더링 이미지는
+    처음 요청될 때 계산하여 보관하므로 같은 페이지를 여러 단계에서 다시 파싱하지 않음.
+    with 문으로 사용하거나 close()를 호출하면 열린 문서와 보관된 결과를 즉시 해제함.
+    페이지 번호는 모두 1부터 시작함.
+    """
+
+    def __init__(self, pdf_source, memoize_pages=True):
+        """
+        PdfDocumentSession 클래스 초기화
+
+        Args:
+            pdf_source (str | bytes): PDF 파일 경로 또는 메모리에 있는 PDF 바이트
+            memoize_pages (bool, optional): 페이지별 텍스트/표 결과 보관 여부
+                (False면 대용량 문서 스캔 시 메모리 사용량을 일정하게 유지)
+        """
+        self.pdf_source = pdf_source
+        self.memoize_pages = memoize_pages
+        self._fitz_doc = None
+        self._plumber_doc = None
+        self._pdf_hash = None
+        self._fitz_text = {}   # 페이지 번호 -> PyMuPDF 텍스트
+        self._text = {}        # 페이지 번호 -> pdfplumber 텍스트
+        self._tables = {}      # 페이지 번호 -> pdfplumber 표 목록
+        self._images = {}      # (페이지 번호, 해상도) -> PNG 바이트
+
+    @classmethod
+    def wrap(cls, pdf_source, **kwargs):
+        """세션이면 그대로, 경로/바이트면 새 세션 생성 (kwargs는 새 세션 생성 시에만 사용)
+
+        Returns:
+            tuple: (세션, 호출한 쪽에서 닫아야 하는지 여부)
+        """
+        if isinstance(pdf_source, cls):
+            return pdf_source, False
+        return cls(pdf_source, **kwargs), True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """열린 문서와 보관된 페이지 결과 해제"""
+        self.release_parser()
+        if self._fitz_doc is not None:
+            self._fitz_doc.close()
+            self._fitz_doc = None
+        self._fitz_text.clear()
+        self._text.clear()
+        self._tables.clear()
+        self._images.clear()
+
+    def release_parser(self):
+        """pdfplumber 문서를 닫아 파서 캐시 해제 (보관된 결과는 유지하고 다음 요청 시 다시 열림)"""
+        if self._plumber_doc is not None:
+            self._plumber_doc.close()
+            self._plumber_doc = None
+
+    @property
+    def fitz_document(self):
+        """PyMuPDF 문서 (처음 접근 시 열림)"""
+        if self._fitz_doc is None:
+            self._fitz_doc = open_fitz_document(self.pdf_source)
+        return self._fitz_doc
+
+    @property
+    def plumber_document(self):
+        """pdfplumber 문서 (처음 접근 시 열림)"""
+        if self._plumber_doc is None:
+            self._plumber_doc = open_pdfplumber_document(self.pdf_source)
+        return self._plumber_doc
+
+    @property
+    def page_count(self):
+        """전체 페이지 수"""
+        return len(self.fitz_document)
+
+    @property
+    def pdf_hash(self):
+        """PDF 내용의 SHA-256 해시 (한 번만 계산)"""
+        if self._pdf_hash is None:
+            self._pdf_hash = hash_pdf_source(self.pdf_source)
+        return self._pdf_hash
+
+    def get_fitz_text(self, page_num):
+        """PyMuPDF로 추출한 페이지 텍스트 (1차 필터, 전체 텍스트 추출용)"""
+        if page_num in self._fitz_text:
+            return self._fitz_text[page_num]
+
+        text = self.fitz_document[page_num - 1].get_text()
+        if self.memoize_pages:
+            self._fitz_text[page_num] = text
+        return text
+
+    def get_text(self, page_num):
+        """pdfplumber로 추출한 페이지 텍스트 (레이아웃 기반, 재무제표 페이지 분석용)"""
+        if page_num in self._text:
+            return self._text[page_num]
+
+        text = self.plumber_document.pages[page_num - 1].extract_text() or ""
+        if self.memoize_pages:
+            self._text[page_num] = text
+        return text
+
+    def get_tables(self, page_num):
+        """pdfplumber로 추출한 페이지 표 목록"""
+        if page_num in self._tables:
+            return self._tables[page_num]
+
+        tables = self.plumber_document.pages[page_num - 1].extract_tables() or []
+        if self.memoize_pages:
+            self._tables[page_num] = tables
+        return tables
+
+    def release_page(self, page_num):
+        """페이지의 pdfplumber 레이아웃 캐시 비우기 (추출된 텍스트/표는 유지)"""
+        if self._plumber_doc is not None:
+            self._plumber_doc.pages[page_num - 1].close()
+
+    def render_page(self, page_num, resolution=150):
+        """페이지를 PNG 이미지로 렌더링
+
+        Args:
+            page_num (int): 페이지 번호 (1부터 시작)
+            resolution (int, optional): 렌더링 해상도 (DPI)
+
+        Returns:
+            bytes: PNG 이미지 바이트
+        """
+        key = (page_num, resolution)
+        if key not in self._images:
+            pixmap = self.fitz_document[page_num - 1].get_pixmap(dpi=resolution)
+            self._images[key] = pixmap.tobytes("png")
+        return self._images[key]
@@ -0,0 +1,450 @@
+import re
+import json
+import copy
+import logging
+
+from data.context_packer import ContextPacker
+
+logger = logging.getLogger("finance_analysis.statement_extractor")
+
+# 재무제표 유형별 하위 스키마 - 원시 계정 금액만 추출하고 비율/성장률은 병합 단계에서 계산
+STATEMENT_SCHEMAS = {
+    "재무상태표": {
+        "company_name": "",
+        "report_year": "",
+        "year": ["2022", "2023", "2024"],
+        "총자산": [0, 0, 0],
+        "총부채": [0, 0, 0],
+        "자본총계": [0, 0, 0],
+        "유동자산": [0, 0, 0],
+        "유동부채": [0, 0, 0],
+        "매출채권": [0, 0, 0],
+        "재고자산": [0, 0, 0],
+        "매입채무": [0, 0, 0]
+    },
+    "손익계산서": {
+        "year": ["2022", "2023", "2024"],
+        "매출액": [0, 0, 0],
+        "매출원가": [0, 0, 0],
+        "영업이익": [0, 0, 0],
+        "이자비용": [0, 0, 0],
+        "순이익": [0, 0, 0]
+    },
+    "현금흐름표": {
+        "year": ["2022", "2023", "2024"],
+        "영업활동": [0, 0, 0],
+        "투자활동": [0, 0, 0],
+        "재무활동": [0, 0, 0],
+        "유형자산취득": [0, 0, 0]
+    }
+}
+
+# 유형별 추출 지침 (공통 규칙은 STATEMENT_PROMPT에 있음)
+STATEMENT_INSTRUCTIONS = {
+    "재무상태표": "재무상태표에서 자산총계, 부채총계, 자본총계와 운전자본 계정(유동자산, 유동부채, 매출채권, 재고자산, 매입채무)을 추출하세요. "
+                 "회사명과 보고서 기준 연도도 함께 기입하세요.",
+    "손익계산서": "손익계산서(포괄손익계산서)에서 매출액, 매출원가, 영업이익, 이자비용(금융비용 중 이자비용), 당기순이익을 추출하세요.",
+    "현금흐름표": "현금흐름표에서 영업/투자/재무활동 현금흐름과 유형자산의 취득액(양수)을 추출하세요."
+}
+
+STATEMENT_PROMPT = """당신은 재무 분석 전문가입니다. 주어진 재무제표 페이지에서 지정된 계정의 금액만 정확하게 추출하여 JSON으로 답하세요.
+
+처리 규칙:
+1. 금액 단위는 억원으로 통일하세요. 원/천원/백만원 단위는 페이지의 단위 표기를 확인하여 억원으로 변환하세요.
+2. 연도는 YYYY 형식의 문자열로 오름차순으로 표기하고, 각 계정 배열은 year와 같은 순서와 길이로 작성하세요.
+3. 연결재무제표와 별도재무제표가 함께 있으면 연결재무제표 금액을 사용하세요.
+4. 숫자는 문자열이 아닌 숫자 형식으로 입력하고, 찾을 수 없는 금액은 0으로 두세요.
+5. 설명 없이 JSON만 출력하세요."""
+
+# 기업 개요, 업계 평균, 인사이트와 결론을 작성하는 서술 요청 (계정 추출 요청과 동시에 실행)
+NARRATIVE_PROMPT = """당신은 재무 분석 전문가입니다. 주어진 재무제표 페이지를 분석하여 기업 개요, 업계 평균 지표, 인사이트와 결론을 JSON으로 작성하세요.
+
+처리 규칙:
+1. sector는 기업의 산업 분류를 기입하세요 (예: 금속/비철금속, 전자/반도체 등).
+2. 업계평균은 metric 순서대로 해당 산업의 일반적인 평균 수치를 숫자로 기입하세요.
+3. insights와 conclusion은 재무제표 수치를 근거로 구체적으로 작성하고, 실질적인 경영 전략 제안을 포함하세요.
+4. 비율은 %로 표시하고 소수점 둘째 자리까지만 표기하세요.
+5. 설명 없이 JSON만 출력하세요."""
+
+RADAR_METRICS = ["ROE", "ROA", "영업이익률", "순이익률", "재무안정성 (부채비율 역수)", "유동성 (유동비율/100)"]
+
+
+def load_template_dict(template_text):
+    """// 주석이 포함된 JSON 템플릿 텍스트를 딕셔너리로 변환 (문자열 안의 //는 유지)"""
+    lines = []
+    for line in template_text.splitlines():
+        in_string = False
+        escaped = False
+        for index, char in enumerate(line):
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = not in_string
+            elif char == "/" and not in_string and line[index + 1:index + 2] == "/":
+                line = line[:index]
+                break
+        lines.append(line)
+    return json.loads("\n".join(lines))
+
+
+class StatementExtractor:
+    """탐지된 재무제표 유형별로 작은 LLM 요청을 구성하고 응답을 company_data로 병합하는 클래스 (요청 실행은 ExtractionPipeline)
+
+    재무상태표/손익계산서/현금흐름표 페이지를 각각의 하위 스키마로 요청하여 원시 계정 금액만 받고,
+    인사이트와 결론은 별도의 서술 요청으로 동시에 받음. 비율, 성장률, 듀퐁 분석, 레이더 지표는
+    추출된 금액으로 병합 단계에서 직접 계산하므로 같은 입력이면 항상 같은 결과가 나옴.
+    """
+
+    def __init__(self, processor, token_budget=4000, narrative_token_budget=8000):
+        """
+        StatementExtractor 클래스 초기화
+
+        Args:
+            processor (FinancialStatementProcessor): API 호출과 응답 캐시를 담당하는 처리기
+            token_budget (int, optional): 재무제표 유형별 입력 텍스트의 최대 추정 토큰 수
+            narrative_token_budget (int, optional): 서술 요청 입력 텍스트의 최대 추정 토큰 수
+        """
+        self.processor = processor
+        self.context_packer = ContextPacker(token_budget=token_budget)
+        self.narrative_packer = ContextPacker(token_budget=narrative_token_budget)
+        self.statement_max_tokens = 2000
+        self.narrative_max_tokens = 6000
+        self.include_narrative = True
+        # 설정하면(LocalStatementParser) 표준 계정과목 표는 LLM 없이 읽고 찾지 못한 항목만 요청
+        self.local_parser = None
+        self.template = load_template_dict(processor.json_template)
+
+    def merge_responses(self, responses, local_results=None):
+        """
+        요청 이름별 API 응답(또는 예외)을 파싱하여 company_data로 병합
+
+        Args:
+            responses (dict): 요청 이름별 응답 문자열 또는 요청 중 발생한 예외
+            local_results (dict, optional): 재무제표 유형별 로컬 파싱 결과 (응답보다 우선)
+
+        Returns:
+            tuple: (company_data 딕셔너리, 실패한 요청별 오류 메시지 딕셔너리)
+        """
+        results = dict(local_results or {})
+        failures = {}
+        for name, response in responses.items():
+            if isinstance(response, Exception):
+                failures[name] = str(response)
+                continue
+            try:
+                extracted = self.processor.parse_json_response(response)
+            except (json.JSONDecodeError, IndexError) as e:
+                failures[name] = f"JSON 파싱 오류: {e}"
+                continue
+            if not isinstance(extracted, dict):
+                failures[name] = f"JSON 객체가 아닌 응답: {type(extracted).__name__}"
+                continue
+            results[name] = self._combine(results[name], extracted) if name in results else extracted
+
+        for name, error in failures.items():
+            logger.warning(f"{name} 추출 실패: {error}")
+
+        if not any(name in results for name in STATEMENT_SCHEMAS):
+            raise ValueError("재무제표 유형별 추출이 모두 실패했습니다: " + "; ".join(
+                f"{name}: {error}" for name, error in failures.items()
+            ))
+
+        return self.merge(results), failures
+
+    def plan_statement(self, session, statement_type, pages, page_scores=None, input_mode="text"):
+        """
+        한 재무제표 유형을 로컬 파싱으로 읽고 부족한 항목만 LLM 요청으로 구성
+
+        Returns:
+            tuple: (로컬 파싱 결과 또는 None, LLM 요청 또는 필요 없으면 None)
+        """
+        fields = None
+        local_result = None
+        if self.local_parser is not None:
+            local_result, missing = self.local_parser.parse(session, statement_type, pages)
+            if local_result is not None:
+                if not missing:
+                    return local_result, None
+                fields = missing
+        return local_result, self.build_statement_request(
+            session, statement_type, pages, page_scores, input_mode, fields
+        )
+
+    def build_statement_request(self, session, statement_type, pages, page_scores=None, input_mode="text",
+                                fields=None):
+        """
+        한 재무제표 유형의 계정 추출 요청 구성
+
+        Args:
+            session (PdfDocumentSession): 문서 세션
+            statement_type (str): STATEMENT_SCHEMAS의 재무제표 유형
+            pages (list): 입력으로 사용할 페이지 번호 목록
+            page_scores (dict, optional): 페이지 번호별 탐지 점수
+            input_mode (str, optional): 'text'면 페이지 텍스트, 'tables'면 압축 표(TSV) 입력
+            fields (list, optional): 요청할 항목 목록 (없으면 하위 스키마의 모든 항목)
+
+        Returns:
+            tuple: (시스템 메시지, 사용자 메시지, 최대 출력 토큰) - 입력 텍스트가 없으면 None
+        """
+        text = self._pack_pages(self.context_packer, session, pages, page_scores, input_mode)
+        if not text:
+            return None
+
+        schema = STATEMENT_SCHEMAS[statement_type]
+        instruction = STATEMENT_INSTRUCTIONS[statement_type]
+        if fields is not None:
+            schema = {key: value for key, value in schema.items() if key == "year" or key in fields}
+            instruction = f"{statement_type}에서 다음 항목만 추출하세요: {', '.join(fields)}"
+
+        system_message = (
+            f"{STATEMENT_PROMPT}\n\n추출 대상: {instruction}\n\n"
+            f"JSON 형식:\n{json.dumps(schema, ensure_ascii=False, indent=2)}"
+        )
+        user_message = f"다음 {statement_type} 페이지에서 지정된 계정 금액을 추출해주세요. 문서 내용:{text}"
+        return system_message, user_message, self.statement_max_tokens
+
+    def build_narrative_request(self, session, pages, page_scores=None, input_mode="text"):
+        """기업 개요, 업계 평균, 인사이트와 결론을 작성하는 서술 요청 구성 (입력 텍스트가 없으면 None)"""
+        text = self._pack_pages(self.narrative_packer, session, pages, page_scores, input_mode)
+        if not text:
+            return None
+
+        schema = {
+            "company_name": "",
+            "sector": "",
+            "radar_data": {"metric": RADAR_METRICS, "업계평균": [0] * len(RADAR_METRICS)},
+            "insights": self.template.get("insights", {}),
+            "conclusion": self.template.get("conclusion", {})
+        }
+        system_message = f"{NARRATIVE_PROMPT}\n\nJSON 형식:\n{json.dumps(schema, ensure_ascii=False, indent=2)}"
+        user_message = f"다음 재무제표 페이지를 분석하여 인사이트와 결론을 작성해주세요. 문서 내용:{text}"
+        return system_message, user_message, self.narrative_max_tokens
+
+    def _combine(self, local_result, extracted):
+        """로컬 파싱 결과에 LLM이 추출한 항목을 연도 기준으로 채움 (로컬 파싱 값 우선)"""
+        combined = dict(local_result)
+        years = self._years(local_result)
+        extracted_years = self._years(extracted)
+        for key, value in extracted.items():
+            if key == "year":
+                continue
+            if isinstance(value, list):
+                values = dict(zip(extracted_years, value))
+                local_values = combined.get(key) or [0] * len(years)
+                combined[key] = [
+                    local if local else self._to_number(values.get(year))
+                    for year, local in zip(years, local_values)
+                ]
+            elif not combined.get(key):
+                combined[key] = value
+        return combined
+
+    def _pack_pages(self, packer, session, pages, page_scores, input_mode):
+        """입력 형식에 맞춰 페이지 텍스트 구성 (압축 표가 없으면 페이지 텍스트 사용)"""
+        page_encoder = self.processor.table_encoder.encode_pdf_page if input_mode == "tables" else None
+        packed = packer.pack(session, pages, page_scores, page_encoder=page_encoder)
+        if not packed["text"] and page_encoder is not None:
+            packed = packer.pack(session, pages, page_scores)
+        return packed["text"]
+
+    def merge(self, results):
+        """
+        유형별 추출 결과를 company_data 형식으로 병합 (비율과 성장률은 금액에서 직접 계산)
+
+        Args:
+            results (dict): 요청 이름('재무상태표', '손익계산서', '현금흐름표', '분석')별 파싱된 응답
+
+        Returns:
+            dict: finance_format.json 형식의 company_data
+        """
+        balance = results.get("재무상태표", {})
+        income = results.get("손익계산서", {})
+        cash_flow = results.get("현금흐름표", {})
+        narrative = results.get("분석", {})
+
+        # 모든 유형에 나온 연도를 합쳐 최근 3개 연도를 오름차순으로 사용
+        years = sorted({
+            year for result in (balance, income, cash_flow) for year in self._years(result)
+        })[-3:]
+
+        def series(result, field):
+            values = dict(zip(self._years(result), result.get(field) or []))
+            return [self._to_number(values.get(year)) for year in years]
+
+        revenue = series(income, "매출액")
+        cost_of_sales = series(income, "매출원가")
+        operating_income = series(income, "영업이익")
+        interest_expense = series(income, "이자비용")
+        net_income = series(income, "순이익")
+
+        total_assets = series(balance, "총자산")
+        total_liabilities = series(balance, "총부채")
+        total_equity = series(balance, "자본총계")
+        current_assets = series(balance, "유동자산")
+        current_liabilities = series(balance, "유동부채")
+        receivables = series(balance, "매출채권")
+        inventories = series(balance, "재고자산")
+        payables = series(balance, "매입채무")
+
+        operating_cf = series(cash_flow, "영업활동")
+        investing_cf = series(cash_flow, "투자활동")
+        financing_cf = series(cash_flow, "재무활동")
+        capex = series(cash_flow, "유형자산취득")
+
+        operating_margin = self._ratios(operating_income, revenue, 100, 1)
+        net_margin = self._ratios(net_income, revenue, 100, 1)
+        debt_ratio = self._ratios(total_liabilities, total_equity, 100, 1)
+        current_ratio = self._ratios(current_assets, current_liabilities, 100, 1)
+        roe = self._ratios(net_income, total_equity, 100, 1)
+        roa = self._ratios(net_income, total_assets, 100, 1)
+
+        dso = self._ratios(receivables, revenue, 365, 1)
+        dio = self._ratios(inventories, cost_of_sales, 365, 1)
+        dpo = self._ratios(payables, cost_of_sales, 365, 1)
+
+        # 유형자산 취득액이 없으면 투자활동 현금흐름 전체를 차감
+        fcf = [
+            round(operating - abs(purchase), 1) if purchase else round(operating + investing, 1)
+            for operating, investing, purchase in zip(operating_cf, investing_cf, capex)
+        ]
+
+        company_name = narrative.get("company_name") or balance.get("company_name") or ""
+        report_year = str(balance.get("report_year") or (years[-1] if years else ""))
+
+        industry_average = (narrative.get("radar_data") or {}).get("업계평균") or []
+        industry_average = [self._to_number(value) for value in industry_average][:len(RADAR_METRICS)]
+        industry_average += [0] * (len(RADAR_METRICS) - len(industry_average))
+
+        latest = len(years) - 1
+        radar_values = [0] * len(RADAR_METRICS)
+        if latest >= 0:
+            radar_values = [
+                roe[latest], roa[latest], operating_margin[latest], net_margin[latest],
+                round(100 / debt_ratio[latest], 2) if debt_ratio[latest] else 0,
+                round(current_ratio[latest] / 100, 2)
+            ]
+
+        return {
+            "company_name": company_name,
+            "sector": narrative.get("sector", ""),
+            "report_year": report_year,
+            "performance_data": {
+                "year": years,
+                "매출액": revenue,
+                "영업이익": operating_income,
+                "순이익": net_income,
+                "영업이익률": operating_margin,
+                "순이익률": net_margin
+            },
+            "balance_sheet_data": {
+                "year": years,
+                "총자산": total_assets,
+                "총부채": total_liabilities,
+                "자본총계": total_equity
+            },
+            "stability_data": {
+                "year": years,
+                "부채비율": debt_ratio,
+                "유동비율": current_ratio,
+                "이자보상배율": self._ratios(operating_income, interest_expense, 1, 1)
+            },
+            "cash_flow_data": {
+                "year": years,
+                "영업활동": operating_cf,
+                "투자활동": investing_cf,
+                "재무활동": financing_cf,
+                "FCF": fcf
+            },
+            "working_capital_data": {
+                "year": years,
+                "DSO": dso,
+                "DIO": dio,
+                "DPO": dpo,
+                "CCC": [round(s + i - p, 1) for s, i, p in zip(dso, dio, dpo)]
+            },
+            "profitability_data": {
+                "year": years,
+                "ROE": roe,
+                "ROA": roa,
+                "영업이익률": operating_margin,
+                "순이익률": net_margin
+            },
+            "growth_rates": {
+                "year": years[1:],
+                "총자산성장률": self._growth(total_assets),
+                "매출액성장률": self._growth(revenue),
+                "순이익성장률": self._growth(net_income)
+            },
+            "dupont_data": {
+                "year": years,
+                "순이익률": self._ratios(net_income, revenue, 100, 2),
+                "자산회전율": self._ratios(revenue, total_assets, 1, 2),
+                "재무레버리지": self._ratios(total_assets, total_equity, 1, 2),
+                "ROE": roe
+            },
+            "radar_data": {
+                "metric": RADAR_METRICS,
+                company_name or "기업": radar_values,
+                "업계평균": industry_average
+            },
+            "insights": self._fill_section(self.template.get("insights", {}), narrative.get("insights"), keep_titles=True),
+            "conclusion": self._fill_section(self.template.get("conclusion", {}), narrative.get("conclusion"))
+        }
+
+    def _fill_section(self, template_section, section, keep_titles=False):
+        """서술 요청 결과로 템플릿 섹션을 채움 (빠진 항목은 템플릿 예시 문장을 비우고 평가 기준값만 유지)"""
+        merged = self._blank_text(copy.deepcopy(template_section), keep_titles)
+        if not isinstance(section, dict):
+            return merged
+        for key, value in section.items():
+            if isinstance(merged.get(key), dict) and isinstance(value, dict):
+                merged[key] = self._fill_section(template_section[key], value, keep_titles)
+            else:
+                merged[key] = value
+        return merged
+
+    def _blank_text(self, value, keep_titles=False):
+        """템플릿 예시 문장을 비움 (숫자 기준값은 유지, keep_titles면 섹션 제목도 유지)"""
+        if isinstance(value, dict):
+            return {
+                key: item if keep_titles and key == "title" else self._blank_text(item, keep_titles)
+                for key, item in value.items()
+            }
+        if isinstance(value, list):
+            return [self._blank_text(item, keep_titles) for item in value]
+        if isinstance(value, str):
+            return ""
+        return value
+
+    def _years(self, result):
+        """추출 결과의 연도 목록을 YYYY 문자열로 정규화"""
+        years = []
+        for year in result.get("year") or []:
+            match = re.search(r'\d{4}', str(year))
+            years.append(match.group(0) if match else str(year))
+        return years
+
+    def _to_number(self, value):
+        """응답 값을 숫자로 변환 (쉼표가 포함된 문자열 허용, 변환할 수 없으면 0)"""
+        if isinstance(value, (int, float)):
+            return value
+        try:
+            return float(str(value).replace(",", "").strip())
+        except (TypeError, ValueError):
+            return 0
+
+    def _ratios(self, numerators, denominators, scale, digits):
+        """연도별 비율 계산 (분모가 0이면 0)"""
+        return [
+            round(numerator / denominator * scale, digits) if denominator else 0
+            for numerator, denominator in zip(numerators, denominators)
+        ]
+
+    def _growth(self, values):
+        """전년 대비 성장률(%) 계산 (전년 값이 0이면 0)"""
+        return [
+            round((current - previous) / abs(previous) * 100, 1) if previous else 0
+            for previous, current in zip(values, values[1:])
+        ]
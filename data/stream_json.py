@@ -0,0 +1,191 @@
+import json
+import logging
+
+logger = logging.getLogger("finance_analysis.stream_json")
+
+
+class StreamDivergenceError(ValueError):
+    """스트리밍 응답이 기대한 JSON 구조에서 벗어나 생성을 중단한 경우의 오류
+
+    Attributes:
+        partial_text (str): 중단 시점까지 받은 응답 텍스트
+    """
+
+    def __init__(self, message, partial_text=""):
+        super().__init__(message)
+        self.partial_text = partial_text
+
+
+class StreamingJsonParser:
+    """스트리밍으로 받는 LLM 응답을 한 글자씩 읽어 최상위 JSON 항목이 닫히는 즉시 반환하는 파서
+
+    응답 앞의 설명문이나 ```json 코드 블록 표시는 건너뛰고 첫 '{'부터 최상위 객체로 읽음.
+    JSON으로 읽을 수 없거나, 템플릿(finance_format.json 등)이 주어졌을 때 템플릿에 있는 키의 값 형식
+    (객체/배열/값)이 다르면 값이 끝나기 전에 StreamDivergenceError를 발생시켜 호출한 쪽이 생성을 중단할 수
+    있게 함. 템플릿에 없는 키(설명, 근거 등)는 validate_against_template()과 같이 허용하며,
+    strict_keys=True일 때만 중단함.
+    """
+
+    def __init__(self, template=None, max_preamble_chars=200, strict_keys=False):
+        """
+        StreamingJsonParser 클래스 초기화
+
+        Args:
+            template (dict, optional): 기대하는 최상위 구조 (없으면 구조 검사 없이 항목만 반환)
+            max_preamble_chars (int, optional): 첫 '{' 전에 허용하는 설명문 길이
+            strict_keys (bool, optional): 템플릿에 없는 최상위 키가 나오면 중단할지 여부
+        """
+        self.template = template
+        self.max_preamble_chars = max_preamble_chars
+        self.strict_keys = strict_keys
+        self.text = ""
+        self.sections = {}
+        self.done = False
+
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._expect = "key"          # 최상위 객체에서 다음에 올 요소: key, colon, value, separator
+        self._token_start = None      # 읽고 있는 키 또는 값의 시작 위치
+        self._key = None
+        self._value_is_container = False
+
+    def feed(self, chunk):
+        """
+        응답 조각을 추가하고 새로 완성된 최상위 항목 반환
+
+        Args:
+            chunk (str): 스트리밍으로 받은 텍스트 조각
+
+        Returns:
+            list: 이번 조각에서 완성된 (키, 값) 목록
+
+        Raises:
+            StreamDivergenceError: 응답이 JSON 객체가 아니거나 템플릿 구조에서 벗어난 경우
+        """
+        self.text += chunk
+        completed = []
+        while self._position < len(self.text) and not self.done:
+            section = self._step(self.text[self._position])
+            self._position += 1
+            if section is not None:
+                completed.append(section)
+        return completed
+
+    def _step(self, char):
+        """한 글자를 읽어 상태를 갱신하고 최상위 항목이 완성되면 (키, 값) 반환"""
+        if self._depth == 0:
+            if char == "{":
+                self._depth = 1
+            elif self._position >= self.max_preamble_chars:
+                self._diverge("응답이 JSON 객체로 시작하지 않습니다.")
+            return None
+
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+                if self._depth == 1 and self._expect == "key":
+                    self._key = json.loads(self.text[self._token_start:self._position + 1])
+                    self._check_key(self._key)
+                    self._expect = "colon"
+            return None
+
+        if char.isspace():
+            return None
+
+        if self._depth == 1:
+            if self._expect == "key":
+                if char == '"':
+                    self._in_string = True
+                    self._token_start = self._position
+                elif char == "}" and not self.sections:
+                    self.done = True
+                else:
+                    self._diverge(f"최상위 키 위치에 예상하지 못한 문자 '{char}'")
+                return None
+            if self._expect == "colon":
+                if char != ":":
+                    self._diverge(f"'{self._key}' 뒤에 ':'가 없습니다.")
+                self._expect = "value"
+                return None
+            if self._expect == "value":
+                self._token_start = self._position
+                self._value_is_container = char in "{["
+                self._check_value_type(char)
+                self._expect = "separator"
+                if self._value_is_container:
+                    self._depth += 1
+                elif char == '"':
+                    self._in_string = True
+                return None
+
+            # 값 뒤의 ',' 또는 '}' - 숫자/true/null 같은 값은 여기서 끝남
+            if char in ",}":
+                section = None
+                if not self._value_is_container:
+                    section = self._complete(self.text[self._token_start:self._position])
+                self._expect = "key"
+                self._value_is_container = False
+                if char == "}":
+                    self._depth = 0
+                    self.done = True
+                return section
+            if self._value_is_container:
+                self._diverge(f"'{self._key}' 항목 뒤에 ',' 또는 '}}'가 없습니다.")
+            return None
+
+        # 최상위 값 안쪽 - 괄호 깊이만 추적하고 값이 닫히면 항목 완성
+        if char == '"':
+            self._in_string = True
+        elif char in "{[":
+            self._depth += 1
+        elif char in "}]":
+            self._depth -= 1
+            if self._depth == 1:
+                return self._complete(self.text[self._token_start:self._position + 1])
+        return None
+
+    def _complete(self, value_text):
+        """완성된 최상위 값을 파싱하여 (키, 값) 반환"""
+        try:
+            value = json.loads(value_text)
+        except json.JSONDecodeError as e:
+            self._diverge(f"'{self._key}' 항목을 JSON으로 읽을 수 없습니다: {e}")
+        self.sections[self._key] = value
+        return self._key, value
+
+    def _check_key(self, key):
+        """strict_keys가 켜져 있고 템플릿에 없는 최상위 키면 중단"""
+        if self.strict_keys and self.template is not None and key not in self.template:
+            self._diverge(f"템플릿에 없는 항목 '{key}'")
+
+    def _check_value_type(self, char):
+        """값의 첫 글자로 템플릿과 형식(객체/배열/값)이 같은지 확인"""
+        if self.template is None:
+            return
+        expected = self.template.get(self._key)
+        if isinstance(expected, dict) and char != "{":
+            self._diverge(f"'{self._key}' 항목은 객체여야 합니다.")
+        if isinstance(expected, list) and char != "[":
+            self._diverge(f"'{self._key}' 항목은 배열이어야 합니다.")
+        if not isinstance(expected, (dict, list)) and char in "{[":
+            self._diverge(f"'{self._key}' 항목은 단일 값이어야 합니다.")
+
+    def _diverge(self, reason):
+        logger.warning(f"스트리밍 응답 중단 ({len(self.text)}자 수신): {reason}")
+        raise StreamDivergenceError(reason, self.text)
+
+
+def iter_sections(text, template=None):
+    """완성된 응답 텍스트에서 읽을 수 있는 최상위 항목을 순서대로 반환 (캐시된 응답을 스트리밍과 같은 방식으로 표시할 때 사용)"""
+    parser = StreamingJsonParser(template, max_preamble_chars=len(text) + 1)
+    try:
+        parser.feed(text)
+    except StreamDivergenceError:
+        pass
+    return list(parser.sections.items())
@@ -0,0 +1,190 @@
+import re
+
+from data.pdf_session import PdfDocumentSession
+
+# 페이지 제목 줄을 찾을 때 사용하는 재무제표 이름
+STATEMENT_TITLES = ["재무상태표", "손익계산서", "포괄손익계산서", "현금흐름표", "자본변동표"]
+
+# 페이지 텍스트의 금액 단위 표기 (예: "(단위: 백만원)")
+UNIT_PATTERN = r'단\s*위\s*[:：]\s*([^)\]\n]+)'
+
+
+class TableEncoder:
+    """탐지된 재무제표 페이지의 표를 LLM 입력용 압축 TSV 텍스트로 변환하는 클래스
+
+    레이아웃 텍스트 대신 표 셀만 탭으로 구분하여 전달하므로 공백, 반복 머리글, 머리말/꼬리말 같은
+    페이지 장식이 빠짐. 숫자는 쉼표를 제거하고 (1,234)/△1,234 같은 음수 표기를 -1234로 통일함.
+    제목 줄과 같은 내용인 표 안의 제목/단위/기간 행, 주석 번호 열도 빼고, 소계와 세부 금액이
+    나뉘어 있는 열(기간 머리글이 병합 칸으로 걸쳐 있는 열)은 한 열로 합침.
+    """
+
+    def __init__(self, drop_empty_columns=True, drop_repeated_headers=True, drop_banner_rows=True,
+                 drop_note_column=True, merge_split_columns=True):
+        """
+        TableEncoder 클래스 초기화
+
+        Args:
+            drop_empty_columns (bool, optional): 모든 셀이 비어 있는 열 제거 여부
+            drop_repeated_headers (bool, optional): 첫 행과 같은 머리글 행이 반복되면 제거할지 여부
+            drop_banner_rows (bool, optional): 셀이 하나뿐인 제목/단위/기간 행 제거 여부 (제목 줄에 포함됨)
+            drop_note_column (bool, optional): 머리글이 '주석'인 열 제거 여부
+            merge_split_columns (bool, optional): 왼쪽 머리글이 병합 칸으로 걸친 열을 겹치는 값이 없으면 합칠지 여부
+        """
+        self.drop_empty_columns = drop_empty_columns
+        self.drop_repeated_headers = drop_repeated_headers
+        self.drop_banner_rows = drop_banner_rows
+        self.drop_note_column = drop_note_column
+        self.merge_split_columns = merge_split_columns
+
+    def encode_pdf_page(self, pdf_source, page_num):
+        """
+        PDF 페이지의 제목/단위와 표를 압축 텍스트로 변환
+
+        Args:
+            pdf_source (str | bytes | PdfDocumentSession): PDF 파일 경로, PDF 바이트 또는 문서 세션
+            page_num (int): 페이지 번호 (1부터 시작)
+
+        Returns:
+            str: 압축된 페이지 텍스트 (표가 없으면 빈 문자열)
+        """
+        session, owns_session = PdfDocumentSession.wrap(pdf_source)
+        try:
+            tables = session.get_tables(page_num)
+            if not tables:
+                return ""
+
+            # 표 밖에 있는 제목과 금액 단위는 페이지 텍스트에서 가져옴
+            heading = self._extract_heading(session.get_text(page_num))
+            encoded_tables = [encoded for encoded in (self.encode_table(table) for table in tables) if encoded]
+        finally:
+            if owns_session:
+                session.close()
+
+        if not encoded_tables:
+            return ""
+        return "\n\n".join(([heading] if heading else []) + encoded_tables)
+
+    def encode_table(self, table):
+        """표(행 목록)를 탭 구분 텍스트로 변환 (빈 행/열, 반복 머리글과 제목 줄과 겹치는 행/열 제거)"""
+        pairs = [(row, [self._compact_label(self.normalize_cell(cell)) for cell in row]) for row in table if row]
+        pairs = [(raw, row) for raw, row in pairs if any(row)]
+        if self.drop_banner_rows:
+            pairs = [(raw, row) for raw, row in pairs if not self._is_banner_row(row)]
+        if not pairs:
+            return ""
+
+        # 행마다 열 수가 다를 수 있으므로 가장 긴 행에 맞춤
+        rows = [row for _, row in pairs]
+        column_count = max(len(row) for row in rows)
+        rows = [row + [""] * (column_count - len(row)) for row in rows]
+
+        # 머리글 행에서 왼쪽 칸과 병합된 칸(pdfplumber가 None으로 반환) - 같은 기간의 소계/합계 열
+        header = pairs[0][0]
+        spanned = [0 < index < len(header) and header[index] is None for index in range(column_count)]
+
+        if self.drop_empty_columns:
+            kept_columns = [index for index in range(column_count) if any(row[index] for row in rows)]
+            rows = [[row[index] for index in kept_columns] for row in rows]
+            spanned = [spanned[index] for index in kept_columns]
+
+        if self.drop_note_column and len(rows) > 1:
+            kept_columns = [index for index, cell in enumerate(rows[0]) if cell.replace(" ", "") != "주석"]
+            rows = [[row[index] for index in kept_columns] for row in rows]
+            spanned = [spanned[index] for index in kept_columns]
+
+        if self.merge_split_columns and len(rows) > 1:
+            rows = self._merge_split_columns(rows, spanned)
+
+        if self.drop_repeated_headers and len(rows) > 1:
+            header = rows[0]
+            rows = [header] + [row for row in rows[1:] if row != header]
+
+        # 행 끝의 빈 셀은 구분자도 생략
+        return "\n".join("\t".join(row).rstrip("\t") for row in rows)
+
+    def normalize_cell(self, cell):
+        """셀 값 정규화 - 공백/줄바꿈 정리 및 한국식 숫자 표기 통일"""
+        if cell is None:
+            return ""
+
+        value = re.sub(r'\s+', ' ', str(cell)).strip()
+        if value in ("-", "–", "—", "－"):
+            return ""  # 금액 없음 표기
+
+        # (1,234), △1,234, ▲1,234 는 음수, 쉼표와 통화 기호는 제거
+        number = value.replace(",", "").replace("₩", "").replace(" ", "")
+        negative = False
+        if number.startswith("(") and number.endswith(")"):
+            number = number[1:-1]
+            negative = True
+        if number[:1] in ("△", "▲"):
+            number = number[1:]
+            negative = True
+
+        if re.fullmatch(r'-?\d+(\.\d+)?', number):
+            if negative and not number.startswith("-"):
+                number = "-" + number
+            return number
+
+        return value.replace("\t", " ")
+
+    def _compact_label(self, value):
+        """'자 산 총 계'처럼 글자마다 띄어 쓴 한글 셀의 공백 제거"""
+        if re.fullmatch(r'[가-힣](?: [가-힣])+', value):
+            return value.replace(" ", "")
+        return value
+
+    def _is_banner_row(self, row):
+        """값이 하나뿐인 재무제표 제목, 금액 단위, 회계기간 행인지 여부 (제목 줄에 이미 포함되는 내용)"""
+        cells = [cell for cell in row if cell]
+        if len(cells) != 1:
+            return False
+        compact = re.sub(r'\s+', '', cells[0])
+        return (
+            re.search(UNIT_PATTERN, cells[0]) is not None or
+            any(compact.startswith(statement_title) for statement_title in STATEMENT_TITLES) or
+            re.fullmatch(r'\(?제\d+(?:\(당\)|\(전\))?기.*(?:현재|까지)\)?', compact) is not None
+        )
+
+    def _merge_split_columns(self, rows, spanned):
+        """왼쪽 열의 머리글이 병합 칸으로 걸쳐 있는 열을 겹치는 값이 없으면 왼쪽 열에 합침 (세부 금액/소계 열 분리 해소)
+
+        머리글이 병합되지 않은 빈 칸이면 다른 기간의 열일 수 있으므로 합치지 않음
+
+        Args:
+            rows (list): 머리글 행을 포함한 행 목록
+            spanned (list): 열별로 머리글 칸이 왼쪽 칸과 병합되어 있는지 여부
+        """
+        columns = [[row[index] for row in rows] for index in range(len(rows[0]))]
+        merged = [columns[0]]
+        for column, is_spanned in zip(columns[1:], spanned[1:]):
+            left = merged[-1]
+            if is_spanned and len(merged) > 1 and not any(a and b for a, b in zip(left[1:], column[1:])):
+                merged[-1] = [a or b for a, b in zip(left, column)]
+            else:
+                merged.append(column)
+        return [list(row) for row in zip(*merged)]
+
+    def _compact_title(self, line):
+        """제목 줄에서 '재 무 상 태 표'처럼 띄어 쓴 재무제표 이름만 붙여 씀 (회사명 등 나머지 내용은 그대로 둠)"""
+        for statement_title in sorted(STATEMENT_TITLES, key=len, reverse=True):
+            line = re.sub(r'\s*'.join(map(re.escape, statement_title)), statement_title, line)
+        return line
+
+    def _extract_heading(self, page_text):
+        """페이지 텍스트에서 재무제표 제목 줄과 금액 단위를 찾아 한 줄로 반환"""
+        lines = [line.strip() for line in page_text.splitlines() if line.strip()]
+
+        title = next(
+            (line for line in lines[:8]
+             if any(statement_title in re.sub(r'\s+', '', line) for statement_title in STATEMENT_TITLES)),
+            None
+        )
+        unit_match = re.search(UNIT_PATTERN, page_text)
+
+        parts = []
+        if title:
+            parts.append(self._compact_title(title))
+        if unit_match:
+            parts.append(f"단위: {unit_match.group(1).strip()}")
+        return " · ".join(parts)
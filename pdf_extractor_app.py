@@ -1,18 +1,86 @@
 import streamlit as st
-import pdfplumber
 import re
-import tempfile
 import os
+import time
+import logging
 from io import BytesIO
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from data.cache_store import FileCacheStore
+from data.pdf_session import PdfDocumentSession
+
+logger = logging.getLogger("finance_analysis.pdf_detector")
+
+# 페이지 특징 기본 저장소 - 같은 프로세스의 탐지기 인스턴스(Streamlit 세션) 간에 메모리 캐시 공유
+_default_feature_store = FileCacheStore("page_features", max_bytes=500 * 1024 * 1024, memory_items=8)
+
+
+class KeywordMatcher:
+    """여러 키워드를 한 번의 선형 스캔으로 찾는 다중 패턴 매처
+    
+    키워드 트라이를 하나의 정규식으로 컴파일하여 텍스트의 각 위치에서 가장 긴 키워드를 찾고,
+    그 키워드의 접두사인 키워드들도 함께 발견된 것으로 처리함 (겹치는 키워드 모두 검출)
+    """
+    
+    def __init__(self, keywords):
+        self.keywords = sorted(set(keyword for keyword in keywords if keyword))
+        
+        # 키워드 트라이 생성 ('' 키는 키워드 끝 표시)
+        trie = {}
+        for keyword in self.keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = True
+        
+        # 전방 탐색으로 모든 시작 위치에서 겹치는 매칭까지 검사
+        self._pattern = re.compile('(?=(' + self._trie_to_regex(trie) + '))') if self.keywords else None
+        
+        # 각 키워드에 대해 키워드 목록에 있는 접두사 목록 (같은 위치에서 시작하는 짧은 키워드)
+        keyword_set = set(self.keywords)
+        self._prefix_hits = {
+            keyword: [keyword[:i] for i in range(1, len(keyword) + 1) if keyword[:i] in keyword_set]
+            for keyword in self.keywords
+        }
+    
+    def _trie_to_regex(self, node):
+        """트라이 노드를 정규식 문자열로 변환 (가장 긴 키워드를 우선 매칭)"""
+        branches = [re.escape(char) + self._trie_to_regex(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+    
+    def find_all(self, text):
+        """텍스트에 포함된 키워드 집합 반환"""
+        hits = set()
+        if self._pattern is None:
+            return hits
+        
+        for match in self._pattern.finditer(text):
+            hits.update(self._prefix_hits[match.group(1)])
+        return hits
 
 
 class FinancialStatementDetector:
     """PDF에서 재무제표 페이지를 자동으로 탐지하는 클래스"""
     
-    def __init__(self):
+    # 탐지 로직이 바뀌어 이전 캐시 결과와 달라질 수 있으면 올려야 함
+    CACHE_VERSION = 3
+    
+    def __init__(self, result_cache=None, feature_store=None, statement_indicators=None, use_caches=True):
+        """
+        FinancialStatementDetector 클래스 초기화
+        
+        Args:
+            result_cache (FileCacheStore, optional): 탐지 결과 캐시 (없으면 기본 캐시 사용)
+            feature_store (FileCacheStore, optional): 페이지 특징 저장소 (없으면 공유 기본 저장소 사용)
+            statement_indicators (dict, optional): 재무제표 유형별 키워드/계정과목 (없으면 기본 정의 사용)
+            use_caches (bool, optional): False면 결과 캐시와 특징 저장소 없이 생성 (특징 추출 전용)
+        """
         # 각 재무제표 유형별 특징적인 계정과목 및 키워드 정의
-        self.statement_indicators = {
+        self.statement_indicators = statement_indicators or {
             "재무상태표": {
                 "필수키워드": ["재무상태표", "대차대조표"],
                 "계정과목": [
@@ -56,144 +124,711 @@ class FinancialStatementDetector:
         # 연속 페이지 관련 키워드
         self.continuation_keywords = ["(계속)", "계속", "이익잉여금처분계산서"]
         
+        # 정규화된 키워드 목록과 전체 키워드 매처 (statement_indicators 기준으로 한 번만 생성)
+        self._build_keyword_matcher()
+        
         # 임계값 설정 - 높일수록 더 엄격하게 검출됨
         self.min_score_threshold = 8  # 최소 점수 임계값 (높이면 더 엄격해짐)
         self.min_accounts_required = 3  # 최소 필요 계정과목 수 (높이면 더 엄격해짐)
         self.numeric_content_ratio = 0.2  # 테이블 내 숫자 비율 최소값 (높이면 더 엄격해짐)
+        
+        # 병렬 스캔 설정 - 페이지 수가 이보다 적으면 프로세스 생성 비용이 더 커서 직렬 처리
+        self.parallel_min_pages = 40
+        
+        # 저메모리 모드 - 페이지 특징을 모아두지 않고 일정 페이지마다 문서를 다시 열어 파서 캐시 해제
+        self.low_memory = False
+        self.low_memory_reopen_pages = 50  # 저메모리 모드에서 문서를 다시 여는 페이지 간격
+        
+        # 조기 종료 설정 - 모든 재무제표 유형을 찾은 뒤 비재무제표 페이지가 연속되면 스캔 종료
+        self.early_stop = False
+        self.early_stop_gap = 5  # 재무제표 블록 이후 연속 비재무제표 페이지 수
+        self.early_stop_sets = None  # 예: ("연결", "별도") - 각 세트를 모두 찾아야 종료 (None이면 구분 안 함)
+        
+        # 2단계 탐지 설정 - 1차(PyMuPDF 텍스트) 필터를 통과한 페이지만 pdfplumber 표 분석 수행
+        self.use_prefilter = True
+        self.prefilter_min_accounts = 2  # 1차 필터 통과 최소 계정과목 수 (민감도 설정의 최소값 이하로 유지)
+        self.prefilter_margin = 1  # 통과 페이지 뒤로 함께 분석할 페이지 수 (연속 페이지 보호)
+        # 1차 필터의 연속 페이지 표시 - '계속기업' 같은 본문 표현과 구분하도록 괄호가 있는 형태만 사용
+        self.prefilter_continuation_keywords = ["(계속)", "이익잉여금처분계산서"]
+        self.prefilter_audit = False  # True면 제외된 페이지도 표 분석하여 누락 여부 확인
+        
+        # 목차 기반 탐지 설정 - PDF 북마크나 목차 페이지가 가리키는 재무제표 범위만 스캔
+        self.use_outline = True
+        self.outline_margin = 2  # 목차가 가리키는 범위 앞뒤로 함께 스캔할 페이지 수
+        self.outline_window_pages = 15  # 다음 목차 항목이 없을 때 시작 페이지부터 스캔할 페이지 수
+        self.toc_scan_pages = 10  # 목차 페이지를 찾을 문서 앞부분 페이지 수
+        
+        # 최근 탐지 실행 통계 (1차 필터 제외율, 단계별 소요 시간 등)
+        self.last_scan_stats = {}
+        
+        # 탐지 결과 캐시 - PDF 내용과 탐지 설정이 같으면 이전 결과를 재사용
+        self.use_result_cache = use_caches
+        self.result_cache = None
+        if use_caches:
+            self.result_cache = result_cache if result_cache is not None else FileCacheStore("detection_results")
+        
+        # 페이지 특징 저장소 - 민감도(임계값)만 바뀌면 PDF를 다시 파싱하지 않고 재판정
+        self.use_feature_store = use_caches
+        self.feature_store = None
+        if use_caches:
+            self.feature_store = feature_store if feature_store is not None else _default_feature_store
     
-    def detect_financial_statements(self, pdf_path):
-        """표가 포함된 페이지에서 재무제표 키워드로 탐지하고 연속 페이지도 찾음"""
+    @classmethod
+    def from_extraction_settings(cls, settings):
+        """_extraction_settings()의 설정으로 캐시 저장소 없는 특징 추출 전용 탐지기 생성 (프로세스 풀 작업자용)"""
+        detector = cls(statement_indicators=settings['statement_indicators'], use_caches=False)
+        detector.low_memory = settings['low_memory']
+        detector.low_memory_reopen_pages = settings['low_memory_reopen_pages']
+        return detector
+    
+    def detect_financial_statements(self, pdf_path, workers=None):
+        """표가 포함된 페이지에서 재무제표 키워드로 탐지하고 연속 페이지도 찾음
         
-        # 페이지 번호별 재무제표 유형 저장
-        financial_pages = {}
+        Args:
+            pdf_path (str | bytes | PdfDocumentSession): PDF 파일 경로, PDF 바이트 또는 문서 세션
+            workers (int, optional): 페이지 스캔에 사용할 프로세스 수. 1 이하이거나
+                문서가 작으면 단일 프로세스로 처리
+            
+        Returns:
+            tuple: (재무제표 페이지 목록, 페이지별 재무제표 유형)
+        """
+        financial_pages = []
         statement_types = {}
-        page_scores = {}  # 각 페이지의 점수 저장
-        
-        with pdfplumber.open(pdf_path) as pdf:
-            # 1단계: 계정과목 점수화 시스템을 통한 재무제표 페이지 식별
-            for i, page in enumerate(pdf.pages):
-                # 표가 있는지 확인
-                tables = page.extract_tables()
-                if not tables or len(tables) == 0:
-                    continue  # 표가 없으면 넘어감
-                
-                # 고품질 테이블 필터링 - 작은 테이블은 제외
-                quality_tables = [table for table in tables if len(table) >= 5 and (table[0] and len(table[0]) >= 2)]
-                if not quality_tables:
-                    continue  # 의미있는 테이블이 없으면 넘어감
-                
-                # 테이블 내 숫자 비율 확인
-                numeric_ratio = self._calculate_numeric_ratio(quality_tables)
-                if numeric_ratio < self.numeric_content_ratio:
-                    continue  # 숫자 비율이 낮으면 재무제표가 아닐 가능성이 높음
-                
-                # 페이지 텍스트 추출
-                page_text = page.extract_text() or ""
-                
-                # 계정과목 점수화를 통한 재무제표 유형 판별
-                statement_scores, matched_accounts = self._calculate_statement_scores(page_text, quality_tables)
-                
-                # 가장 높은 점수를 받은 재무제표 유형 선택
-                if statement_scores:
-                    max_score_type = max(statement_scores, key=statement_scores.get)
-                    max_score = statement_scores[max_score_type]
-                    
-                    # 페이지 점수 저장
-                    page_num = i + 1  # 1-인덱스로 저장
-                    page_scores[page_num] = {
-                        'type': max_score_type,
-                        'score': max_score,
-                        'accounts': matched_accounts.get(max_score_type, 0)
-                    }
-                    
-                    # 점수가 일정 임계값 이상이고 계정과목이 충분히 발견된 경우에만 재무제표로 판별
-                    if (max_score >= self.min_score_threshold and 
-                        matched_accounts.get(max_score_type, 0) >= self.min_accounts_required):
-                        
-                        if max_score_type not in financial_pages:
-                            financial_pages[max_score_type] = []
-                        financial_pages[max_score_type].append(page_num)
-                        statement_types[page_num] = max_score_type
-            
-            # 2단계: 엄격한 기준으로 연속 페이지 탐지
-            detected_pages = set()
-            for pages in financial_pages.values():
-                for page_num in pages:
-                    detected_pages.add(page_num)
-            
-            # 초기 재무제표 페이지 저장
-            initial_detected_pages = detected_pages.copy()
-            
-            # PDF의 모든 페이지에 대해 연속 페이지 확인 (엄격한 조건 적용)
-            for i, page in enumerate(pdf.pages):
-                page_num = i + 1
-                
-                # 이미 검출된 페이지는 건너뜁니다
-                if page_num in detected_pages:
-                    continue
-                
-                # 표가 있는지 확인
-                tables = page.extract_tables()
-                if not tables or len(tables) == 0:
-                    continue  # 표가 없으면 연속 페이지가 아님
-                
-                # 고품질 테이블 필터링
-                quality_tables = [table for table in tables if len(table) >= 5 and (table[0] and len(table[0]) >= 2)]
-                if not quality_tables:
-                    continue
-                
-                # 테이블 내 숫자 비율 확인
-                numeric_ratio = self._calculate_numeric_ratio(quality_tables)
-                if numeric_ratio < self.numeric_content_ratio:
-                    continue  # 숫자 비율이 낮으면 연속 페이지가 아닐 가능성이 높음
-                
-                page_text = page.extract_text() or ""
-                
-                # 연속 페이지 더 엄격하게 확인
-                is_continuation = False
-                adjacent_page_type = None
-                
-                # 1. 직전 페이지가 재무제표인 경우만 고려 (뒤 페이지는 고려하지 않음)
-                if page_num - 1 in detected_pages:
-                    prev_page_type = statement_types.get(page_num - 1)
-                    adjacent_page_type = prev_page_type
-                    
-                    # 2. 연속 페이지 키워드 확인
-                    has_continuation_keyword = any(keyword in page_text for keyword in self.continuation_keywords)
-                    
-                    # 3. 테이블 구조 유사성 확인 (더 엄격하게)
-                    similar_table_structure = self._check_similar_table_structure(
-                        pdf.pages[page_num-2].extract_tables() if page_num-2 >= 0 else [],  # 이전 페이지 테이블
-                        quality_tables,  # 현재 페이지 테이블
-                        strict=True  # 엄격한 검사
-                    )
-                    
-                    # 4. 페이지의 재무제표 점수 확인 (일정 수준 이상이어야 함)
-                    page_score = page_scores.get(page_num, {}).get('score', 0)
-                    
-                    # 연속 페이지 판단 - 이전 페이지가 재무제표이고, 다음 조건 중 하나 이상 만족
-                    is_continuation = (
-                        # 연속 키워드가 있고 테이블 구조가 유사함
-                        (has_continuation_keyword and similar_table_structure) or
-                        # 또는 테이블 구조가 매우 유사하고 점수가 일정 수준 이상
-                        (similar_table_structure and page_score >= self.min_score_threshold * 0.7)
-                    )
-                
-                # 연속 페이지로 판단된 경우만 추가
-                if is_continuation and adjacent_page_type:
-                    # 연속 페이지 추가
-                    if adjacent_page_type not in financial_pages:
-                        financial_pages[adjacent_page_type] = []
-                    financial_pages[adjacent_page_type].append(page_num)
-                    statement_types[page_num] = adjacent_page_type
-                    detected_pages.add(page_num)
-        
-        # 결과 정리 - 페이지 목록과 유형 반환
-        all_pages = []
-        for pages in financial_pages.values():
-            all_pages.extend(pages)
-        
-        return sorted(list(set(all_pages))), statement_types
+        
+        for verdict in self.iter_detect_financial_statements(pdf_path, workers):
+            if verdict['type']:
+                financial_pages.append(verdict['page_num'])
+                statement_types[verdict['page_num']] = verdict['type']
+        
+        return financial_pages, statement_types
+    
+    def iter_detect_financial_statements(self, pdf_path, workers=None):
+        """페이지 순서대로 재무제표 판정 결과를 하나씩 반환하는 제너레이터
+        
+        각 페이지의 판정은 해당 페이지와 직전 페이지의 특징에만 의존하므로
+        반환된 판정은 이후 페이지 처리 결과와 관계없이 확정된 값임
+        
+        Args:
+            pdf_path (str | bytes | PdfDocumentSession): PDF 파일 경로, PDF 바이트 또는 문서 세션.
+                세션을 전달하면 추출한 텍스트/표가 세션에 남아 이후 단계에서 재사용됨
+            workers (int, optional): 페이지 스캔에 사용할 프로세스 수
+            
+        Yields:
+            dict: 페이지 판정 결과 (page_num, total_pages, type, is_continuation, statement_set, score, score_type, accounts)
+        """
+        session, owns_session = PdfDocumentSession.wrap(pdf_path, memoize_pages=not self.low_memory)
+        try:
+            yield from self._iter_detect(session, workers)
+        finally:
+            if owns_session:
+                session.close()
+    
+    def _iter_detect(self, session, workers=None):
+        """iter_detect_financial_statements()의 본체 - 열린 문서 세션으로 탐지 수행"""
+        self.last_scan_stats = {}
+        pdf_hash = session.pdf_hash if self.use_result_cache or self.use_feature_store else None
+        
+        # 같은 PDF와 탐지 설정으로 저장된 결과가 있으면 페이지 판정을 그대로 재생
+        cache_key = self._result_cache_key(pdf_hash) if self.use_result_cache else None
+        if cache_key:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                self.last_scan_stats = dict(cached['stats'], cache_hit=True)
+                logger.info(f"재무제표 탐지: 캐시된 결과 사용 ({self.last_scan_stats['total_pages']}페이지)")
+                yield from cached['verdicts']
+                return
+        
+        # 저장된 페이지 특징이 있으면 PDF를 다시 파싱하지 않고 현재 임계값으로 재판정
+        feature_key = self._feature_store_key(pdf_hash) if self.use_feature_store else None
+        stored = self.feature_store.get(feature_key) if feature_key else None
+        if stored is not None:
+            start_time = time.perf_counter()
+            verdicts = []
+            for verdict in self._iter_classify(stored['page_features'], len(stored['page_features'])):
+                verdicts.append(verdict)
+                yield verdict
+            
+            self.last_scan_stats = {
+                'total_pages': len(stored['page_features']),
+                'classify_seconds': time.perf_counter() - start_time,
+                'pages_skipped': len(stored['page_features']) - len(verdicts),
+                'feature_store_hit': True,
+                'cache_hit': False
+            }
+            logger.info(
+                f"재무제표 탐지: 저장된 페이지 특징으로 재판정 ({self.last_scan_stats['total_pages']}페이지, "
+                f"{self.last_scan_stats['classify_seconds'] * 1000:.1f}ms)"
+            )
+            if cache_key:
+                self.result_cache.set(cache_key, {'verdicts': verdicts, 'stats': self.last_scan_stats})
+            return
+        
+        # 1차: PDF 목차가 가리키는 범위와 PyMuPDF 텍스트로 재무제표 가능성이 없는 페이지 제외
+        start_time = time.perf_counter()
+        page_count, candidate_pages, outline_pages = self._select_candidate_pages(session)
+        prefilter_seconds = time.perf_counter() - start_time
+        
+        # 2차: 각 페이지를 한 번만 파싱하여 페이지 특징 레코드를 만들고 순서대로 판정
+        start_time = time.perf_counter()
+        page_features = []
+        verdicts = []
+        
+        def collect_features():
+            for features in self._iter_page_features(session, page_count, workers, candidate_pages):
+                # 저메모리 모드에서는 연속 페이지 판정에 필요한 직전 페이지 특징만 유지
+                if not self.low_memory:
+                    page_features.append(features)
+                yield features
+        
+        for verdict in self._iter_classify(collect_features(), page_count):
+            verdicts.append(verdict)
+            yield verdict
+        table_analysis_seconds = time.perf_counter() - start_time
+        
+        self._record_scan_stats(page_count, candidate_pages, prefilter_seconds, table_analysis_seconds,
+                                page_count - len(verdicts), outline_pages)
+        
+        # 감사 모드: 1차 필터에서 제외된 페이지도 표 분석하여 누락된 후보가 있는지 확인
+        if self.prefilter_audit and candidate_pages is not None:
+            self._audit_prefilter(session, page_count, candidate_pages)
+        
+        # 조기 종료되었거나 저메모리 모드인 경우 일부 페이지 특징만 있으므로 특징 저장소에는 저장하지 않음
+        if feature_key and len(page_features) == page_count:
+            self.feature_store.set(feature_key, {'page_features': page_features})
+        if cache_key:
+            self.result_cache.set(cache_key, {'verdicts': verdicts, 'stats': self.last_scan_stats})
+    
+    def extract_page_features(self, pdf_path, workers=None):
+        """특징 추출 단계: 페이지별 특징 레코드 목록 반환 (저장된 특징이 있으면 재사용)
+        
+        반환된 목록은 classify_page_features()로 임계값만 바꿔가며 반복 판정할 수 있음
+        """
+        session, owns_session = PdfDocumentSession.wrap(pdf_path, memoize_pages=not self.low_memory)
+        try:
+            feature_key = self._feature_store_key(session.pdf_hash) if self.use_feature_store else None
+            if feature_key:
+                stored = self.feature_store.get(feature_key)
+                if stored is not None:
+                    return stored['page_features']
+            
+            page_count, candidate_pages, _ = self._select_candidate_pages(session)
+            page_features = list(self._iter_page_features(session, page_count, workers, candidate_pages))
+        finally:
+            if owns_session:
+                session.close()
+        
+        if feature_key:
+            self.feature_store.set(feature_key, {'page_features': page_features})
+        return page_features
+    
+    def _result_cache_key(self, pdf_hash):
+        """PDF 내용의 SHA-256과 탐지 설정/버전으로 결과 캐시 키 생성"""
+        settings = {
+            'min_score_threshold': self.min_score_threshold,
+            'min_accounts_required': self.min_accounts_required,
+            'numeric_content_ratio': self.numeric_content_ratio,
+            'early_stop': self.early_stop,
+            'early_stop_gap': self.early_stop_gap,
+            'early_stop_sets': self.early_stop_sets
+        }
+        return FileCacheStore.make_key(self._feature_store_key(pdf_hash), settings)
+    
+    def _feature_store_key(self, pdf_hash):
+        """PDF 내용의 SHA-256과 특징 추출 설정/버전으로 페이지 특징 저장 키 생성 (판정 임계값은 제외)"""
+        settings = {
+            'statement_indicators': self.statement_indicators,
+            'continuation_keywords': self.continuation_keywords,
+            'use_prefilter': self.use_prefilter,
+            'prefilter_min_accounts': self.prefilter_min_accounts,
+            'prefilter_margin': self.prefilter_margin,
+            'prefilter_continuation_keywords': self.prefilter_continuation_keywords,
+            'use_outline': self.use_outline,
+            'outline_margin': self.outline_margin,
+            'outline_window_pages': self.outline_window_pages
+        }
+        return FileCacheStore.make_key(self.CACHE_VERSION, pdf_hash, settings)
+    
+    def format_scan_stats(self):
+        """최근 탐지 실행 통계를 화면 표시용 문자열로 반환"""
+        scan_stats = self.last_scan_stats
+        if not scan_stats:
+            return ""
+        
+        if scan_stats.get('cache_hit'):
+            return f"동일한 PDF의 이전 탐지 결과를 재사용했습니다 (전체 {scan_stats['total_pages']}페이지)."
+        
+        if scan_stats.get('feature_store_hit'):
+            summary = (
+                f"저장된 페이지 특징으로 재판정했습니다 (전체 {scan_stats['total_pages']}페이지, "
+                f"{scan_stats['classify_seconds'] * 1000:.0f}ms)."
+            )
+        else:
+            summary = (
+                f"1차 필터: 전체 {scan_stats['total_pages']}페이지 중 {scan_stats['prefilter_rejected']}페이지 제외 "
+                f"({scan_stats['prefilter_rejection_rate']:.0%}) · 1차 {scan_stats['prefilter_seconds']:.1f}초 · "
+                f"표 분석 {scan_stats['table_analysis_seconds']:.1f}초"
+            )
+            if scan_stats.get('outline_pages') is not None:
+                summary += f" · 목차 기반 {scan_stats['outline_pages']}페이지 대상"
+        
+        if scan_stats.get('pages_skipped'):
+            summary += f" · 조기 종료로 {scan_stats['pages_skipped']}페이지 생략"
+        return summary
+    
+    def _select_candidate_pages(self, session):
+        """1차 선별: 목차가 가리키는 범위와 텍스트 필터로 표 분석 대상 페이지 결정
+        
+        목차가 없거나 목차 범위에서 재무제표 후보가 하나도 없으면 전체 페이지를 대상으로 함
+        
+        Returns:
+            tuple: (전체 페이지 수, 2차 분석 대상 페이지 번호 집합 또는 None, 목차 기반 대상 페이지 집합 또는 None)
+        """
+        page_count = session.page_count
+        outline_pages = self._find_outline_pages(session) if self.use_outline else None
+        
+        if not self.use_prefilter:
+            return page_count, outline_pages, outline_pages
+        
+        if outline_pages is not None:
+            candidate_pages = self._prefilter_pages(session, outline_pages)
+            if candidate_pages:
+                return page_count, candidate_pages, outline_pages
+            # 목차의 페이지 번호가 실제 페이지와 다른 경우 등 - 전체 스캔으로 대체
+            logger.info("목차 범위에서 재무제표 후보를 찾지 못해 전체 페이지를 스캔합니다")
+        
+        return page_count, self._prefilter_pages(session), None
+    
+    def _find_outline_pages(self, session):
+        """PDF 북마크 또는 목차 페이지에서 재무제표 항목이 가리키는 페이지 범위 추출
+        
+        Args:
+            session (PdfDocumentSession): 문서 세션
+            
+        Returns:
+            set: 스캔 대상 페이지 번호 집합 (재무제표 목차 항목이 없으면 None)
+        """
+        page_count = session.page_count
+        entries = [(level, title, page) for level, title, page in session.fitz_document.get_toc(simple=True)]
+        if not any(self._is_statement_title(title) for _, title, _ in entries):
+            entries = self._parse_toc_page(session)
+        
+        outline_pages = set()
+        for index, (level, title, page) in enumerate(entries):
+            if page < 1 or not self._is_statement_title(title):
+                continue
+            
+            # 같은 수준 이상의 다음 항목 직전 페이지까지를 해당 항목의 범위로 봄
+            end_page = next(
+                (next_page - 1 for next_level, _, next_page in entries[index + 1:]
+                 if next_level <= level and next_page > page),
+                page + self.outline_window_pages - 1
+            )
+            first_page = max(1, page - self.outline_margin)
+            last_page = min(page_count, end_page + self.outline_margin)
+            outline_pages.update(range(first_page, last_page + 1))
+        
+        return outline_pages or None
+    
+    def _parse_toc_page(self, session):
+        """문서 앞부분의 목차 페이지에서 (수준, 제목, 페이지) 항목 목록 추출"""
+        entries = []
+        for page_num in range(1, min(self.toc_scan_pages, session.page_count) + 1):
+            page_text = session.get_fitz_text(page_num)
+            if '목차' not in re.sub(r'\s+', '', page_text):
+                continue
+            
+            # "재무제표 ........ 12" 형식의 줄에서 제목과 페이지 번호 분리
+            for line in page_text.splitlines():
+                match = re.match(r'^\s*(.*?\S)[\s.·…\-]*?(\d{1,4})\s*$', line)
+                if match and not match.group(1).isdigit():
+                    entries.append((1, match.group(1), int(match.group(2))))
+        
+        return sorted(entries, key=lambda entry: entry[2])
+    
+    def _is_statement_title(self, title):
+        """목차 항목 제목이 재무제표 본문을 가리키는지 확인 (주석 항목 제외)"""
+        normalized = re.sub(r'\s+', '', title)
+        if '주석' in normalized:
+            return False
+        return '재무제표' in normalized or any(
+            keyword in normalized
+            for indicators in self._normalized_indicators.values()
+            for keyword in indicators["필수키워드"]
+        )
+    
+    def _build_keyword_matcher(self):
+        """재무제표 유형별 정규화된 키워드 목록과 전체 키워드를 한 번에 찾는 매처 생성
+        
+        statement_indicators를 변경한 경우 다시 호출해야 함
+        """
+        self._normalized_indicators = {
+            statement_type: {
+                "필수키워드": [re.sub(r'\s+', '', keyword.lower()) for keyword in indicators["필수키워드"]],
+                "계정과목": [re.sub(r'\s+', '', account.lower()) for account in indicators["계정과목"]]
+            }
+            for statement_type, indicators in self.statement_indicators.items()
+        }
+        self.keyword_matcher = KeywordMatcher(
+            keyword
+            for indicators in self._normalized_indicators.values()
+            for keyword in indicators["필수키워드"] + indicators["계정과목"]
+        )
+    
+    def _prefilter_pages(self, session, page_numbers=None):
+        """1차 필터: PyMuPDF 텍스트와 재무제표 키워드로 표 분석이 필요한 페이지 번호 선별
+        
+        Args:
+            session (PdfDocumentSession): 문서 세션
+            page_numbers (set, optional): 검사할 페이지 번호 집합 (없으면 전체 페이지)
+            
+        Returns:
+            set: 2차 분석 대상 페이지 번호 집합
+        """
+        candidate_pages = set()
+        margin_left = 0
+        continuation_keywords = [re.sub(r'\s+', '', keyword) for keyword in self.prefilter_continuation_keywords]
+        if page_numbers is None:
+            page_numbers = range(1, session.page_count + 1)
+        for page_num in sorted(page_numbers):
+            page_text = session.get_fitz_text(page_num)
+            normalized_text = re.sub(r'\s+', '', page_text.lower())
+            hits = self.keyword_matcher.find_all(normalized_text)
+            
+            # 필수키워드, 연속 페이지 표시 또는 충분한 계정과목이 있으면 통과
+            is_candidate = (
+                any(keyword in normalized_text for keyword in continuation_keywords) or
+                any(
+                    any(keyword in hits for keyword in indicators["필수키워드"]) or
+                    sum(1 for account in indicators["계정과목"] if account in hits) >= self.prefilter_min_accounts
+                    for indicators in self._normalized_indicators.values()
+                )
+            )
+            
+            if is_candidate:
+                candidate_pages.add(page_num)
+                margin_left = self.prefilter_margin
+            elif margin_left > 0:
+                # 통과 페이지 직후 페이지는 연속 페이지일 수 있으므로 함께 분석하고,
+                # 계정과목이 하나라도 있으면 연속 페이지가 이어지는 것으로 보고 여유 페이지를 다시 채움
+                candidate_pages.add(page_num)
+                if hits:
+                    margin_left = self.prefilter_margin
+                else:
+                    margin_left -= 1
+        
+        return candidate_pages
+    
+    def _record_scan_stats(self, total_pages, candidate_pages, prefilter_seconds, table_analysis_seconds,
+                           pages_skipped=0, outline_pages=None):
+        """탐지 실행 통계 저장 및 로깅"""
+        rejected_pages = total_pages - len(candidate_pages) if candidate_pages is not None else 0
+        
+        self.last_scan_stats = {
+            'total_pages': total_pages,
+            'prefilter_rejected': rejected_pages,
+            'prefilter_rejection_rate': rejected_pages / total_pages if total_pages > 0 else 0,
+            'prefilter_seconds': prefilter_seconds,
+            'table_analysis_seconds': table_analysis_seconds,
+            'pages_skipped': pages_skipped,  # 조기 종료로 분석하지 않은 페이지 수
+            'outline_pages': len(outline_pages) if outline_pages is not None else None,  # 목차 기반 스캔 범위
+            'feature_store_hit': False,
+            'cache_hit': False
+        }
+        logger.info(
+            f"재무제표 탐지: 전체 {total_pages}페이지 중 1차 필터 제외 {rejected_pages}페이지 "
+            f"({self.last_scan_stats['prefilter_rejection_rate']:.0%}), "
+            f"1차 {prefilter_seconds:.2f}초, 2차 {table_analysis_seconds:.2f}초"
+            + (f", 목차 기반 {len(outline_pages)}페이지 대상" if outline_pages is not None else "")
+            + (f", 조기 종료로 {pages_skipped}페이지 생략" if pages_skipped else "")
+        )
+    
+    def _audit_prefilter(self, session, page_count, candidate_pages):
+        """1차 필터에서 제외된 페이지 중 2차 분석 시 후보가 되었을 페이지 확인 (재현율 검증용)"""
+        missed_pages = []
+        excluded_pages = [page_num for page_num in range(1, page_count + 1) if page_num not in candidate_pages]
+        for audit_features in self._iter_extracted_features(session, excluded_pages):
+            if not self._is_candidate_page(audit_features):
+                continue
+            
+            # 연속 페이지 판정에 필요한 최소 점수를 넘는 페이지는 누락 후보로 기록
+            if max(audit_features['scores'].values()) >= self.min_score_threshold * 0.7:
+                missed_pages.append(audit_features['page_num'])
+        
+        self.last_scan_stats['prefilter_missed_pages'] = missed_pages
+        if missed_pages:
+            logger.warning(f"1차 필터에서 제외되었지만 후보가 될 수 있었던 페이지: {missed_pages}")
+    
+    def _iter_page_features(self, session, page_count, workers=None, candidate_pages=None):
+        """페이지 순서대로 특징 레코드 반환 (가능하면 프로세스 풀로 병렬 처리)
+        
+        candidate_pages가 주어지면 해당 페이지만 표 분석하고 나머지는 빈 레코드로 채움
+        """
+        workers = min(workers or 1, os.cpu_count() or 1)
+        if candidate_pages is None:
+            candidate_pages = set(range(1, page_count + 1))
+        page_indices = [i for i in range(page_count) if i + 1 in candidate_pages]
+        
+        # 작업자 수가 1 이하이거나 분석 대상이 적으면 직렬 처리
+        if workers <= 1 or len(page_indices) < self.parallel_min_pages:
+            extracted = self._iter_extracted_features(session, [i + 1 for i in page_indices])
+            for i in range(page_count):
+                if i + 1 in candidate_pages:
+                    yield next(extracted)
+                else:
+                    yield self._empty_page_features(i + 1)
+            return
+        
+        # 작업자별 부하 균형을 위해 작업자 수보다 많은 페이지 묶음으로 분할
+        shard_size = max(1, -(-len(page_indices) // (workers * 4)))
+        shards = [page_indices[start:start + shard_size] for start in range(0, len(page_indices), shard_size)]
+        
+        # PDF 원본과 특징 추출 설정은 작업자 초기화 시 한 번만 전달 (작업자마다 자체 문서 세션과 탐지기를 만들어 사용)
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_page_worker,
+            initargs=(session.pdf_source, self._extraction_settings())
+        )
+        futures = []
+        try:
+            futures.extend(
+                executor.submit(_extract_pages_features, shard)
+                for shard in shards
+            )
+            
+            # 묶음 순서대로 결과를 받아 앞쪽 페이지부터 순서를 유지하며 반환
+            next_page = 1
+            for future in futures:
+                for features in future.result():
+                    # 1차 필터에서 제외된 페이지는 빈 특징 레코드로 채움
+                    while next_page < features['page_num']:
+                        yield self._empty_page_features(next_page)
+                        next_page += 1
+                    yield features
+                    next_page += 1
+            
+            while next_page <= page_count:
+                yield self._empty_page_features(next_page)
+                next_page += 1
+        finally:
+            # 조기 종료 등으로 소비가 중단되면 아직 시작하지 않은 묶음은 취소하고, 처리 중인 묶음이 끝날 때까지
+            # 기다려 작업자 프로세스가 아무도 읽지 않을 페이지를 계속 파싱하지 않게 함
+            # (shutdown의 cancel_futures 인자는 Python 3.9부터 있으므로 직접 취소)
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+    
+    def _extraction_settings(self):
+        """프로세스 풀 작업자에 전달할 특징 추출 설정 (캐시 저장소 등 탐지기 전체는 전달하지 않음)"""
+        return {
+            'statement_indicators': self.statement_indicators,
+            'low_memory': self.low_memory,
+            'low_memory_reopen_pages': self.low_memory_reopen_pages
+        }
+    
+    def _empty_page_features(self, page_num):
+        """표 분석을 하지 않은 페이지의 기본 특징 레코드"""
+        return {
+            'page_num': page_num,
+            'tables': [],           # 첫 번째 원본 테이블 (연속 페이지 구조 비교용)
+            'quality_tables': [],   # 첫 번째 고품질 테이블
+            'text': "",
+            'numeric_ratio': 0,
+            'column_patterns': [],  # 첫 번째 원본 테이블의 열 패턴
+            'quality_column_patterns': [],  # 첫 번째 고품질 테이블의 열 패턴
+            'scores': {},
+            'matched_accounts': {}
+        }
+    
+    def _iter_extracted_features(self, session, page_numbers):
+        """지정된 페이지들의 특징 레코드를 순서대로 추출
+        
+        각 페이지는 특징 추출 직후 pdfplumber 레이아웃 캐시를 비우며, 저메모리 모드에서는
+        low_memory_reopen_pages마다 pdfplumber 문서를 다시 열어 pdfminer 객체 캐시도 해제함
+        
+        Args:
+            session (PdfDocumentSession): 문서 세션
+            page_numbers (list): 추출할 페이지 번호 목록 (1부터 시작, 오름차순)
+        """
+        for index, page_num in enumerate(page_numbers, start=1):
+            features = self._extract_page_features(session, page_num)
+            session.release_page(page_num)
+            if self.low_memory and index % max(1, self.low_memory_reopen_pages) == 0:
+                session.release_parser()
+            yield features
+    
+    def _extract_page_features(self, session, page_num):
+        """페이지를 한 번 파싱하여 탐지에 필요한 특징(표, 텍스트, 숫자 비율, 열 패턴, 점수)을 추출"""
+        features = self._empty_page_features(page_num)
+        
+        # 표가 있는지 확인 - 판정에는 첫 번째 표만 사용하므로 레코드에는 첫 번째 표만 보관
+        tables = session.get_tables(page_num)
+        features['tables'] = tables[:1]
+        if tables:
+            features['column_patterns'] = self._get_column_data_patterns(tables[0])
+        
+        # 고품질 테이블 필터링 - 작은 테이블은 제외
+        quality_tables = [table for table in tables if len(table) >= 5 and (table[0] and len(table[0]) >= 2)]
+        if not quality_tables:
+            return features  # 의미있는 테이블이 없으면 점수 계산 생략
+        
+        features['quality_tables'] = quality_tables[:1]
+        features['quality_column_patterns'] = self._get_column_data_patterns(quality_tables[0])
+        features['numeric_ratio'] = self._calculate_numeric_ratio(quality_tables)
+        
+        # 페이지 텍스트 추출 및 계정과목 점수화
+        features['text'] = session.get_text(page_num)
+        features['scores'], features['matched_accounts'] = self._calculate_statement_scores(
+            features['text'], quality_tables
+        )
+        
+        return features
+    
+    def classify_page_features(self, page_features):
+        """판정 단계: 페이지 특징 레코드 목록에 현재 임계값을 적용하여 재무제표 페이지와 유형을 판별
+        
+        PDF를 다시 읽지 않는 순수 계산이므로 민감도 변경 시 바로 재판정할 수 있음
+        """
+        financial_pages = []
+        statement_types = {}
+        
+        for verdict in self._iter_classify(page_features, len(page_features)):
+            if verdict['type']:
+                financial_pages.append(verdict['page_num'])
+                statement_types[verdict['page_num']] = verdict['type']
+        
+        return financial_pages, statement_types
+    
+    def _iter_classify(self, page_features, page_count):
+        """페이지 특징 레코드를 순서대로 판정하여 페이지별 판정 결과 반환
+        
+        early_stop이 켜져 있으면 종료 조건을 만족하는 즉시 반환을 멈추므로
+        입력 제너레이터의 나머지 페이지는 파싱되지 않음
+        """
+        prev_features = None
+        prev_type = None
+        prev_set = None
+        
+        # 조기 종료 판단용 - 세트별로 발견된 재무제표 유형
+        found_types = {statement_set: set() for statement_set in (self.early_stop_sets or [None])}
+        pages_since_statement = 0
+        
+        for features in page_features:
+            verdict = self._classify_page(features, prev_features, prev_type)
+            verdict['total_pages'] = page_count
+            
+            # 연결/별도 구분 - 연속 페이지는 직전 페이지의 세트를 따름
+            if not verdict['type']:
+                verdict['statement_set'] = None
+            elif verdict['is_continuation']:
+                verdict['statement_set'] = prev_set
+            else:
+                verdict['statement_set'] = self._get_statement_set(features, verdict['type'])
+            yield verdict
+            
+            prev_features = features
+            prev_type = verdict['type']
+            prev_set = verdict['statement_set']
+            
+            if not self.early_stop:
+                continue
+            
+            if verdict['type']:
+                set_key = verdict['statement_set'] if self.early_stop_sets else None
+                if set_key in found_types:
+                    found_types[set_key].add(verdict['type'])
+                pages_since_statement = 0
+                continue
+            
+            # 모든 세트에서 모든 유형을 찾았고 재무제표 블록 뒤로 비재무제표 페이지가 충분히 이어지면 종료
+            pages_since_statement += 1
+            all_found = all(
+                set(self.statement_indicators.keys()) <= types for types in found_types.values()
+            )
+            if all_found and pages_since_statement >= self.early_stop_gap:
+                return
+    
+    def _get_statement_set(self, features, statement_type):
+        """재무제표 페이지가 연결재무제표인지 별도재무제표인지 판별"""
+        normalized_text = re.sub(r'\s+', '', features['text'].lower())
+        keywords = self._normalized_indicators[statement_type]["필수키워드"]
+        
+        if any(f"연결{keyword}" in normalized_text for keyword in keywords):
+            return "연결"
+        return "별도"
+    
+    def _classify_page(self, features, prev_features=None, prev_type=None):
+        """페이지 특징 레코드에 임계값을 적용하여 한 페이지의 재무제표 여부와 유형을 판별
+        
+        Args:
+            features (dict): 현재 페이지 특징 레코드
+            prev_features (dict, optional): 직전 페이지 특징 레코드
+            prev_type (str, optional): 직전 페이지의 판정 유형 (재무제표가 아니면 None)
+            
+        Returns:
+            dict: 페이지 판정 결과
+        """
+        page_num = features['page_num']
+        verdict = {
+            'page_num': page_num,
+            'type': None,             # 재무제표 유형 (재무제표가 아니면 None)
+            'is_continuation': False,  # 연속 페이지로 판정되었는지 여부
+            'score': 0,               # 최고 점수
+            'score_type': None,       # 최고 점수를 받은 재무제표 유형
+            'accounts': 0             # 최고 점수 유형의 계정과목 수
+        }
+        
+        # 표가 없거나 숫자 비율이 낮으면 재무제표가 아닐 가능성이 높음
+        if not self._is_candidate_page(features):
+            return verdict
+        
+        statement_scores = features['scores']
+        matched_accounts = features['matched_accounts']
+        
+        # 1. 계정과목 점수화 시스템을 통한 재무제표 페이지 식별 - 가장 높은 점수를 받은 유형 선택
+        if statement_scores:
+            max_score_type = max(statement_scores, key=statement_scores.get)
+            verdict['score'] = statement_scores[max_score_type]
+            verdict['score_type'] = max_score_type
+            verdict['accounts'] = matched_accounts.get(max_score_type, 0)
+            
+            # 점수가 일정 임계값 이상이고 계정과목이 충분히 발견된 경우에만 재무제표로 판별
+            if (verdict['score'] >= self.min_score_threshold and 
+                verdict['accounts'] >= self.min_accounts_required):
+                verdict['type'] = max_score_type
+                return verdict
+        
+        # 2. 엄격한 기준으로 연속 페이지 탐지 - 직전 페이지가 재무제표인 경우만 고려 (뒤 페이지는 고려하지 않음)
+        if not prev_type or prev_features is None or prev_features['page_num'] != page_num - 1:
+            return verdict
+        
+        # 연속 페이지 키워드 확인
+        has_continuation_keyword = any(keyword in features['text'] for keyword in self.continuation_keywords)
+        
+        # 테이블 구조 유사성 확인 (더 엄격하게) - 이전 페이지는 캐시된 원본 테이블 사용
+        similar_table_structure = self._check_similar_table_structure(
+            prev_features['tables'],  # 이전 페이지 테이블
+            features['quality_tables'],  # 현재 페이지 테이블
+            strict=True,  # 엄격한 검사
+            prev_patterns=prev_features['column_patterns'],
+            curr_patterns=features['quality_column_patterns']
+        )
+        
+        # 연속 페이지 판단 - 이전 페이지가 재무제표이고, 다음 조건 중 하나 이상 만족
+        is_continuation = (
+            # 연속 키워드가 있고 테이블 구조가 유사함
+            (has_continuation_keyword and similar_table_structure) or
+            # 또는 테이블 구조가 매우 유사하고 점수가 일정 수준 이상
+            (similar_table_structure and verdict['score'] >= self.min_score_threshold * 0.7)
+        )
+        
+        if is_continuation:
+            verdict['type'] = prev_type
+            verdict['is_continuation'] = True
+        
+        return verdict
+    
+    def _is_candidate_page(self, features):
+        """고품질 테이블이 있고 숫자 비율이 임계값 이상인 페이지인지 확인"""
+        return bool(features['quality_tables']) and features['numeric_ratio'] >= self.numeric_content_ratio
     
     def _calculate_numeric_ratio(self, tables):
         """테이블 내 숫자 데이터의 비율 계산"""
@@ -212,8 +847,12 @@ class FinancialStatementDetector:
         
         return numeric_cells / total_cells if total_cells > 0 else 0
     
-    def _check_similar_table_structure(self, prev_tables, curr_tables, strict=False):
-        """이전 페이지와 현재 페이지의 테이블 구조 유사성 확인 (엄격한 버전)"""
+    def _check_similar_table_structure(self, prev_tables, curr_tables, strict=False,
+                                       prev_patterns=None, curr_patterns=None):
+        """이전 페이지와 현재 페이지의 테이블 구조 유사성 확인 (엄격한 버전)
+        
+        prev_patterns/curr_patterns가 주어지면 각 첫 번째 테이블의 열 패턴을 다시 계산하지 않음
+        """
         if not prev_tables or not curr_tables:
             return False
         
@@ -239,8 +878,10 @@ class FinancialStatementDetector:
         # 2. 데이터 유형 패턴 비교 (엄격한 모드에서만)
         if strict:
             # 각 열별 데이터 유형 패턴 비교
-            prev_patterns = self._get_column_data_patterns(prev_table)
-            curr_patterns = self._get_column_data_patterns(curr_table)
+            if prev_patterns is None:
+                prev_patterns = self._get_column_data_patterns(prev_table)
+            if curr_patterns is None:
+                curr_patterns = self._get_column_data_patterns(curr_table)
             
             # 패턴 일치도 계산
             pattern_match = 0
@@ -301,29 +942,28 @@ class FinancialStatementDetector:
         # 텍스트 정규화 (공백 제거, 소문자 변환)
         normalized_text = re.sub(r'\s+', '', page_text.lower())
         
-        # 테이블 텍스트 추출
-        table_text = ""
-        for table in tables:
-            for row in table:
-                table_text += " ".join([str(cell) if cell else "" for cell in row]) + " "
-        
+        # 테이블 텍스트 추출 (셀 구분 공백은 정규화 시 제거되므로 바로 이어붙임)
+        table_text = "".join(str(cell) for table in tables for row in table for cell in row if cell)
         normalized_table_text = re.sub(r'\s+', '', table_text.lower())
         
+        # 모든 유형의 필수키워드/계정과목을 페이지 텍스트와 테이블 텍스트에서 한 번씩만 스캔
+        text_hits = self.keyword_matcher.find_all(normalized_text)
+        table_hits = self.keyword_matcher.find_all(normalized_table_text)
+        numeric_data_quality = None
+        
         # 각 재무제표 유형별로 점수 계산
         for statement_type, indicators in self.statement_indicators.items():
-            # 1. 필수키워드 점수
-            for keyword in indicators["필수키워드"]:
-                normalized_keyword = re.sub(r'\s+', '', keyword.lower())
-                if normalized_keyword in normalized_text:
-                    scores[statement_type] += indicators["키워드가중치"]
-                    break  # 하나의 필수키워드만 카운트
+            normalized_indicators = self._normalized_indicators[statement_type]
+            
+            # 1. 필수키워드 점수 (하나의 필수키워드만 카운트)
+            if any(keyword in text_hits for keyword in normalized_indicators["필수키워드"]):
+                scores[statement_type] += indicators["키워드가중치"]
             
             # 2. 계정과목 점수 및 밀도 계산
-            accounts_found = 0
-            for account in indicators["계정과목"]:
-                normalized_account = re.sub(r'\s+', '', account.lower())
-                if normalized_account in normalized_text or normalized_account in normalized_table_text:
-                    accounts_found += 1
+            accounts_found = sum(
+                1 for account in normalized_indicators["계정과목"]
+                if account in text_hits or account in table_hits
+            )
             
             # 계정과목 매칭 점수 추가
             matched_accounts[statement_type] = accounts_found
@@ -331,8 +971,8 @@ class FinancialStatementDetector:
             
             # 3. 계정과목 밀도 보너스 (높은 밀도는 더 관련성이 높다는 의미)
             if len(normalized_text) > 0:
-                account_density = sum(len(re.sub(r'\s+', '', acc.lower())) for acc in indicators["계정과목"] 
-                                      if re.sub(r'\s+', '', acc.lower()) in normalized_text) / len(normalized_text)
+                account_density = sum(len(account) for account in normalized_indicators["계정과목"]
+                                      if account in text_hits) / len(normalized_text)
                 # 밀도에 따른 보너스 점수 (최대 3점)
                 density_bonus = min(3, int(account_density * 100))
                 scores[statement_type] += density_bonus
@@ -357,8 +997,9 @@ class FinancialStatementDetector:
                 elif statement_type == "자본변동표" and self._has_equity_statement_structure(main_table):
                     scores[statement_type] += 5
                 
-                # 5. 숫자 데이터 품질 확인
-                numeric_data_quality = self._check_numeric_data_quality(main_table)
+                # 5. 숫자 데이터 품질 확인 (유형과 무관하므로 한 번만 계산)
+                if numeric_data_quality is None:
+                    numeric_data_quality = self._check_numeric_data_quality(main_table)
                 if numeric_data_quality > 0.5:  # 숫자 데이터 품질이 좋으면 추가 점수
                     scores[statement_type] += 2
         
@@ -525,25 +1166,44 @@ class FinancialStatementDetector:
         return False
 
 
+# 프로세스 풀 작업자의 문서 세션과 탐지기 (작업자 초기화 시 생성)
+_worker_session = None
+_worker_detector = None
+
+
+def _init_page_worker(pdf_source, settings):
+    """프로세스 풀 작업자 초기화: 작업자 프로세스마다 PDF 원본과 특징 추출 설정을 한 번만 받아 문서 세션과 탐지기 생성"""
+    global _worker_session, _worker_detector
+    _worker_session = PdfDocumentSession(pdf_source, memoize_pages=False)
+    _worker_detector = FinancialStatementDetector.from_extraction_settings(settings)
+
+
+def _extract_pages_features(page_indices):
+    """프로세스 풀 작업자: 작업자 문서 세션에서 지정된 페이지(0-인덱스)의 특징 레코드 추출"""
+    return list(_worker_detector._iter_extracted_features(_worker_session, [i + 1 for i in page_indices]))
+
+
 class PDFViewer:
     """PDF 페이지를 시각적으로 표시하는 클래스"""
     
     def display_pdf_page(self, pdf_path, page_num):
-        """PDF 특정 페이지를 이미지로 변환하여 반환"""
+        """PDF 특정 페이지를 이미지로 변환하여 반환
+        
+        pdf_path는 파일 경로, PDF 바이트 또는 문서 세션이며, 세션을 전달하면
+        이미 열린 문서와 렌더링 결과를 재사용함
+        """
+        session, owns_session = PdfDocumentSession.wrap(pdf_path)
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                if 0 <= page_num < len(pdf.pages):
-                    page = pdf.pages[page_num]
-                    img = page.to_image(resolution=150)
-                    img_bytes = BytesIO()
-                    img.save(img_bytes, format="PNG")
-                    img_bytes.seek(0)
-                    return img_bytes
-                else:
-                    return None
+            if 0 <= page_num < session.page_count:
+                return BytesIO(session.render_page(page_num + 1, resolution=150))
+            else:
+                return None
         except Exception as e:
             st.error(f"PDF 페이지 표시 오류: {e}")
             return None
+        finally:
+            if owns_session:
+                session.close()
 
 
 class FinancialStatementApp:
@@ -601,6 +1261,12 @@ class FinancialStatementApp:
                 self.detector.min_accounts_required = max(2, int(3 + (detection_sensitivity - 5) * 0.5))  # 2~5 범위
                 self.detector.numeric_content_ratio = 0.15 + (detection_sensitivity - 5) * 0.03  # 0.15~0.3 범위
             
+            # 조기 종료 설정 - 연결/별도 재무제표 세트를 각각 찾은 뒤 주석 페이지가 이어지면 스캔 종료
+            if st.checkbox("재무제표 블록 이후 조기 종료", value=False,
+                           help="연결/별도 재무제표를 모두 찾은 뒤 주석 페이지가 이어지면 나머지 페이지 스캔을 생략합니다."):
+                self.detector.early_stop = True
+                self.detector.early_stop_sets = ("연결", "별도")
+            
             st.header("사용 방법")
             st.markdown("""
             1. PDF 파일 업로드
@@ -616,10 +1282,8 @@ class FinancialStatementApp:
         uploaded_file = st.file_uploader("PDF 파일 업로드", type="pdf")
         
         if uploaded_file is not None:
-            # 임시 파일로 저장
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                tmp_file.write(uploaded_file.getvalue())
-                pdf_path = tmp_file.name
+            # 업로드된 PDF를 임시 파일 없이 메모리에서 한 번만 열어 탐지와 페이지 표시에 함께 사용
+            pdf_session = PdfDocumentSession(uploaded_file.getvalue())
             
             try:
                 # 진행 상태 표시
@@ -628,10 +1292,19 @@ class FinancialStatementApp:
                 
                 # 재무제표 페이지 탐지
                 status_text.text("재무제표 페이지 탐지 중...")
-                progress_bar.progress(50)
+                financial_pages = []
+                statement_types = {}
                 
-                # 표가 포함된 페이지에서 재무제표 키워드 탐지 및 연속 페이지 탐지
-                financial_pages, statement_types = self.detector.detect_financial_statements(pdf_path)
+                # 표가 포함된 페이지에서 재무제표 키워드 탐지 및 연속 페이지 탐지 - 페이지별 판정마다 진행 상태 갱신
+                for verdict in self.detector.iter_detect_financial_statements(pdf_session, workers=os.cpu_count()):
+                    if verdict['type']:
+                        financial_pages.append(verdict['page_num'])
+                        statement_types[verdict['page_num']] = verdict['type']
+                    progress_bar.progress(int(100 * verdict['page_num'] / verdict['total_pages']))
+                    status_text.text(
+                        f"재무제표 페이지 탐지 중... {verdict['page_num']}/{verdict['total_pages']}페이지 "
+                        f"(발견 {len(financial_pages)}페이지)"
+                    )
                 
                 progress_bar.progress(100)
                 status_text.empty()
@@ -639,6 +1312,11 @@ class FinancialStatementApp:
                 # 결과 표시
                 st.success("PDF 분석 완료!")
                 
+                # 1차 필터 제외율 및 단계별 소요 시간 (또는 캐시 사용 여부) 표시
+                scan_summary = self.detector.format_scan_stats()
+                if scan_summary:
+                    st.caption(scan_summary)
+                
                 # 탐지된 페이지 정보 표시
                 st.subheader("📋 탐지된 재무제표 페이지")
                 
@@ -688,7 +1366,7 @@ class FinancialStatementApp:
                     )
                     
                     # PDF 페이지 표시
-                    img_bytes = self.viewer.display_pdf_page(pdf_path, selected_page-1)  # 0-인덱스로 변환
+                    img_bytes = self.viewer.display_pdf_page(pdf_session, selected_page-1)  # 0-인덱스로 변환
                     if img_bytes:
                         # 재무제표 유형 표시
                         statement_type = statement_types.get(selected_page, "재무제표")
@@ -715,11 +1393,8 @@ class FinancialStatementApp:
                 st.error(f"오류 발생: {str(e)}")
             
             finally:
-                # 임시 파일 삭제
-                try:
-                    os.unlink(pdf_path)
-                except:
-                    pass
+                # 문서 세션 해제
+                pdf_session.close()
         
         # 푸터
         st.markdown("---")
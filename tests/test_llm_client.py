@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from data.llm_client import LLMClientPool, RateLimiter, load_pool_settings
+
+
+def message(input_tokens):
+    return SimpleNamespace(
+        content=[SimpleNamespace(text="{}")],
+        stop_reason="end_turn",
+        usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=10)
+    )
+
+
+class StubStream:
+    def __init__(self, final_message):
+        self.text_stream = iter(["{", "}"])
+        self.final_message = final_message
+
+    def get_final_message(self):
+        return self.final_message
+
+
+class StubClient:
+    def __init__(self, final_message):
+        self.messages = SimpleNamespace(stream=self.stream)
+        self.final_message = final_message
+
+    @contextmanager
+    def stream(self, **request):
+        yield StubStream(self.final_message)
+
+
+def test_token_limit_is_off_by_default():
+    limiter = RateLimiter()
+
+    assert limiter.reserve(200000) == 0
+    assert limiter.reserve(200000) == 0
+
+
+def test_full_bucket_sends_request_larger_than_burst_without_waiting():
+    limiter = RateLimiter(requests_per_minute=None, tokens_per_minute=40000)
+
+    assert limiter.reserve(14800) == 0
+    assert limiter.reserve(14800) == 0
+    assert limiter.reserve(14800) == pytest.approx(4400 / 40000 * 60, abs=0.1)
+
+
+def test_request_larger_than_minute_limit_only_drains_the_bucket():
+    limiter = RateLimiter(requests_per_minute=None, tokens_per_minute=10000)
+
+    assert limiter.reserve(50000) == 0
+    assert limiter.reserve(1000) == pytest.approx(1000 / 10000 * 60, abs=0.1)
+
+
+def test_request_limit_spaces_requests_after_burst():
+    limiter = RateLimiter(requests_per_minute=60, burst_seconds=2)
+
+    assert limiter.reserve(0) == 0
+    assert limiter.reserve(0) == 0
+    assert limiter.reserve(0) == pytest.approx(1, abs=0.1)
+
+
+def test_stream_settles_usage_from_final_message():
+    pool = LLMClientPool(requests_per_minute=None, tokens_per_minute=10000)
+    request = {"system": "", "messages": [{"role": "user", "content": "a" * 35}]}
+
+    with pool.stream(StubClient(message(input_tokens=6010)), request) as stream:
+        assert "".join(stream.text_stream) == "{}"
+
+    assert pool.stats()["requests"] == 1
+    # 추정 10토큰 대신 실제 6010토큰이 차감되어 3990토큰만 남음
+    assert pool.limiter.reserve(5000) == pytest.approx(1010 / 10000 * 60, abs=0.1)
+
+
+def test_aborted_stream_counts_request_and_reraises():
+    pool = LLMClientPool(requests_per_minute=None)
+
+    with pytest.raises(ValueError):
+        with pool.stream(StubClient(message(input_tokens=100)), {"messages": []}):
+            raise ValueError("구조 불일치")
+
+    assert pool.stats() == {"requests": 1, "retries": 0, "failures": 0, "wait_seconds": 0.0}
+
+
+def test_pool_settings_from_environment(monkeypatch):
+    monkeypatch.setenv("LLM_REQUESTS_PER_MINUTE", "4000")
+    monkeypatch.setenv("LLM_TOKENS_PER_MINUTE", "400000")
+    monkeypatch.setenv("LLM_MAX_IN_FLIGHT", "0")
+    monkeypatch.setenv("LLM_MAX_RETRIES", "abc")
+
+    assert load_pool_settings() == {
+        "requests_per_minute": 4000,
+        "tokens_per_minute": 400000,
+        "max_in_flight": float("inf"),
+        "max_retries": 4
+    }
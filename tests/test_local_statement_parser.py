@@ -0,0 +1,45 @@
+from data.local_statement_parser import LocalStatementParser
+
+
+class StubSession:
+    """페이지별 (텍스트, 표 목록)을 돌려주는 문서 세션 스텁"""
+
+    def __init__(self, pages):
+        self.pages = pages
+
+    def get_text(self, page_num):
+        return self.pages[page_num][0]
+
+    def get_tables(self, page_num):
+        return self.pages[page_num][1]
+
+
+def parse(tables, statement_type="재무상태표"):
+    session = StubSession({1: ("(단위: 백만원)", tables)})
+    return LocalStatementParser().parse(session, statement_type, [1])
+
+
+def test_unfound_optional_fields_are_requested_from_llm():
+    result, missing = parse([[
+        ["과목", "2024", "2023"],
+        ["자산총계", "1,000", "900"],
+        ["부채총계", "400", "300"],
+        ["자본총계", "600", "600"],
+    ]])
+
+    assert result["총자산"] == [9.0, 10.0]
+    assert set(missing) == {"유동자산", "유동부채", "매출채권", "재고자산", "매입채무"}
+    assert result["재고자산"] == [0, 0]
+
+
+def test_tables_with_other_periods_are_skipped_or_reordered():
+    result, _ = parse([
+        [["과목", "2024", "2023"], ["자산총계", "1,000", "900"]],
+        [["과목", "2022", "2023", "2024"], ["부채총계", "1", "2", "3"]],
+        [["과목", "2023", "2024"], ["자본총계", "500", "600"]],
+    ])
+
+    assert result["year"] == ["2023", "2024"]
+    assert result["자본총계"] == [5.0, 6.0]
+    # 기간이 세 개인 표의 부채총계 대신 자산총계 - 자본총계로 계산
+    assert result["총부채"] == [4.0, 4.0]
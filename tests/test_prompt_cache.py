@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+from data.financial_statement_processor import FinancialStatementProcessor
+from data.llm_cache import PromptUsageLog, SingleFlight, cacheable_system, format_usage_stats
+from data.llm_client import LLMClientPool
+
+
+class StubMessages:
+    """messages.create() 요청 인자를 기록하고 정해진 사용량으로 응답하는 스텁"""
+
+    def __init__(self, usages):
+        self.requests = []
+        self.usages = list(usages)
+
+    def create(self, **request):
+        self.requests.append(request)
+        return SimpleNamespace(
+            content=[SimpleNamespace(text='{"company_name": "테스트"}')],
+            stop_reason="end_turn",
+            usage=SimpleNamespace(**self.usages[len(self.requests) - 1])
+        )
+
+
+def usage(input_tokens, output_tokens, cache_creation=0, cache_read=0):
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cache_creation_input_tokens": cache_creation,
+        "cache_read_input_tokens": cache_read
+    }
+
+
+def make_processor(usages):
+    processor = FinancialStatementProcessor(client_pool=LLMClientPool(), single_flight=SingleFlight())
+    processor.use_response_cache = False
+    processor.client = SimpleNamespace(messages=StubMessages(usages))
+    return processor
+
+
+def test_cacheable_system_marks_system_prompt_as_ephemeral_block():
+    assert cacheable_system("고정 프롬프트") == [
+        {"type": "text", "text": "고정 프롬프트", "cache_control": {"type": "ephemeral"}}
+    ]
+
+
+def test_cacheable_system_keeps_existing_blocks():
+    blocks = [{"type": "text", "text": "이미 블록"}]
+    assert cacheable_system(blocks) is blocks
+
+
+def test_request_sends_system_prompt_with_cache_control():
+    processor = make_processor([usage(100, 20, cache_creation=1500)])
+
+    processor._call_claude_api("고정 프롬프트", "문서 내용")
+
+    request = processor.client.messages.requests[0]
+    assert request["system"] == cacheable_system("고정 프롬프트")
+    assert request["messages"] == [{"role": "user", "content": "문서 내용"}]
+
+
+def test_request_sends_plain_system_prompt_when_prompt_cache_is_off():
+    processor = make_processor([usage(1600, 20)])
+    processor.use_prompt_cache = False
+
+    processor._call_claude_api("고정 프롬프트", "문서 내용")
+
+    assert processor.client.messages.requests[0]["system"] == "고정 프롬프트"
+
+
+def test_requests_record_cache_write_then_read():
+    processor = make_processor([usage(100, 20, cache_creation=1500), usage(120, 25, cache_read=1500)])
+
+    processor._call_claude_api("고정 프롬프트", "첫 문서")
+    processor._call_claude_api("고정 프롬프트", "둘째 문서")
+
+    summary = processor.usage_log.summary()
+    assert summary["requests"] == 2
+    assert summary["input_tokens"] == 220
+    assert summary["output_tokens"] == 45
+    assert summary["cache_creation_input_tokens"] == 1500
+    assert summary["cache_read_input_tokens"] == 1500
+    assert summary["cache_read_ratio"] == 1500 / 3220
+
+
+def test_usage_log_ignores_responses_without_usage():
+    usage_log = PromptUsageLog()
+
+    assert usage_log.record(SimpleNamespace(content=[])) is None
+    assert usage_log.summary()["requests"] == 0
+    assert format_usage_stats(usage_log) == ""
+
+
+def test_usage_log_treats_missing_cache_fields_as_zero():
+    usage_log = PromptUsageLog()
+
+    entry = usage_log.record(SimpleNamespace(usage=SimpleNamespace(input_tokens=10, output_tokens=5)), "continuation")
+
+    assert entry == {
+        "label": "continuation",
+        "input_tokens": 10,
+        "output_tokens": 5,
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 0
+    }
+    assert "캐시 쓰기 0" in format_usage_stats(usage_log)
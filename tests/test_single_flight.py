@@ -0,0 +1,132 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from data.llm_cache import SingleFlight
+
+
+class SessionRerun(BaseException):
+    """Streamlit 재실행처럼 Exception이 아닌 중단"""
+
+
+def start_follower(flight, key, func, results, timeout=None):
+    def run():
+        try:
+            results.append(flight.do(key, func, timeout=timeout))
+        except BaseException as error:
+            results.append(error)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_followers_share_leader_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def leader():
+        calls.append("leader")
+        release.wait()
+        return "응답"
+
+    results = []
+    threads = [start_follower(flight, "key", leader, results) for _ in range(3)]
+    wait_until(lambda: flight.followers == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["leader"]
+    assert sorted(leader for _, leader in results) == [False, False, True]
+    assert {text for text, _ in results} == {"응답"}
+
+
+def test_followers_receive_leader_error():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def leader():
+        release.wait()
+        raise ValueError("API 오류")
+
+    results = []
+    threads = [start_follower(flight, "key", leader, results) for _ in range(2)]
+    wait_until(lambda: flight.followers == 1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert [type(result) for result in results] == [ValueError, ValueError]
+
+
+def test_follower_takes_over_when_leader_session_is_interrupted():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def interrupted_leader():
+        release.wait()
+        raise SessionRerun()
+
+    leader_results = []
+    leader_thread = start_follower(flight, "key", interrupted_leader, leader_results)
+    wait_until(lambda: flight.leaders == 1)
+
+    follower_results = []
+    follower_thread = start_follower(flight, "key", lambda: "다시 요청한 응답", follower_results)
+    wait_until(lambda: flight.followers == 1)
+    release.set()
+    leader_thread.join()
+    follower_thread.join()
+
+    assert isinstance(leader_results[0], SessionRerun)
+    assert follower_results == [("다시 요청한 응답", True)]
+    assert flight.leaders == 2
+
+
+def test_follower_stops_waiting_after_timeout():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    leader_thread = start_follower(flight, "key", lambda: release.wait() and "응답", [])
+    wait_until(lambda: flight.leaders == 1)
+
+    with pytest.raises(TimeoutError):
+        flight.do("key", lambda: "실행되면 안 됨", timeout=0.05)
+
+    release.set()
+    leader_thread.join()
+
+
+def test_async_follower_takes_over_when_leader_task_is_cancelled():
+    flight = SingleFlight()
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def slow_leader():
+            started.set()
+            await asyncio.sleep(10)
+            return "취소될 응답"
+
+        async def fresh_leader():
+            return "다시 요청한 응답"
+
+        leader_task = asyncio.create_task(flight.do_async("key", slow_leader))
+        await started.wait()
+        follower_task = asyncio.create_task(flight.do_async("key", fresh_leader, timeout=5))
+        await asyncio.sleep(0.01)
+        leader_task.cancel()
+        return await follower_task
+
+    assert asyncio.run(scenario()) == ("다시 요청한 응답", True)
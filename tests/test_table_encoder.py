@@ -0,0 +1,39 @@
+from data.table_encoder import TableEncoder
+
+
+def test_subtotal_columns_under_merged_period_header_are_merged():
+    table = [
+        ["과 목", "주석", "제 55 (당) 기", None, "제 54 (전) 기", None],
+        ["Ⅰ. 유동자산", "", "", "500,000", "", "450,000"],
+        ["현금및현금성자산", "4", "100,000", "", "90,000", ""],
+        ["재고자산", "7", "(1,200)", "", "△1,100", ""],
+    ]
+
+    assert TableEncoder().encode_table(table) == "\n".join([
+        "과목\t제 55 (당) 기\t제 54 (전) 기",
+        "Ⅰ. 유동자산\t500000\t450000",
+        "현금및현금성자산\t100000\t90000",
+        "재고자산\t-1200\t-1100",
+    ])
+
+
+def test_headerless_column_without_merged_header_is_kept_separate():
+    # 전기 소계가 머리글 없는 별도 열로 나뉜 경우 - 당기 열에 합치면 전기 금액이 당기로 옮겨짐
+    table = [
+        ["과목", "당기", "", "전기"],
+        ["유동자산", "500,000", "", ""],
+        ["현금", "", "90,000", "100,000"],
+    ]
+
+    assert TableEncoder().encode_table(table) == "\n".join([
+        "과목\t당기\t\t전기",
+        "유동자산\t500000",
+        "현금\t\t90000\t100000",
+    ])
+
+
+def test_heading_compacts_statement_title_but_keeps_company_name():
+    encoder = TableEncoder()
+
+    assert encoder._extract_heading("주식회사 풍전비철 재 무 상 태 표\n(단위 : 원)") == "주식회사 풍전비철 재무상태표 · 단위: 원"
+    assert encoder._extract_heading("포 괄 손 익 계 산 서 (계속)") == "포괄손익계산서 (계속)"
@@ -3,20 +3,116 @@ import json
 import logging
 import re
 import requests
-from anthropic import Anthropic
+from data.llm_client import default_client_pool
+from data.llm_cache import (
+    default_response_cache, default_single_flight, make_response_key, cacheable_system, PromptUsageLog
+)
+from data.stream_json import StreamingJsonParser, StreamDivergenceError, iter_sections
+from data.json_repair import repair_json, validate_against_template
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("financial_analyzer.valuation")
 
+# 가치 평가 응답의 최상위 구조 (스트리밍 중 구조 검사용, 프롬프트의 JSON 형식과 같음)
+VALUATION_TEMPLATE = {
+    "company": "",
+    "ebitda_valuation": {},
+    "dcf_valuation": {},
+    "assumptions": {},
+    "calculations": {},
+    "summary": ""
+}
+
+# 가치 평가 지침과 JSON 형식 - 기업과 무관한 고정 내용이므로 시스템 프롬프트에 넣어 프롬프트 캐시로 재사용
+# (캐시가 적중하려면 매 요청 같은 바이트여야 하므로 기업별 값을 넣지 않음)
+VALUATION_INSTRUCTIONS = """다음 형식으로 분석해주세요:
+
+1. EBITDA와 DCF 두가지 방식으로 보수적, 기본, 낙관적 3가지로 기업가치를 평가
+2. 결과는 다음 JSON 구조로 출력하되, 계산 과정과 가정에 대한 설명도 포함할 것:
+
+{
+  "company": "분석 대상 기업명",
+  "ebitda_valuation": {
+    "conservative": 숫자값,
+    "base": 숫자값,
+    "optimistic": 숫자값
+  },
+  "dcf_valuation": {
+    "conservative": 숫자값,
+    "base": 숫자값,
+    "optimistic": 숫자값
+  },
+  "assumptions": {
+    "ebitda_multipliers": {
+      "conservative": 숫자값,
+      "base": 숫자값,
+      "optimistic": 숫자값
+    },
+    "discount_rates": {
+      "conservative": 숫자값,
+      "base": 숫자값,
+      "optimistic": 숫자값
+    },
+    "growth_rates": {
+      "conservative": 숫자값,
+      "base": 숫자값,
+      "optimistic": 숫자값
+    },
+    "terminal_growth_rates": {
+      "conservative": 숫자값,
+      "base": 숫자값,
+      "optimistic": 숫자값
+    }
+  },
+  "calculations": {
+    "ebitda_description": "EBITDA 계산 방식에 대한 설명",
+    "dcf_description": "DCF 계산 방식에 대한 간략한 설명"
+  },
+  "summary": "기업 가치 평가에 대한 종합적인 분석 및 설명"
+}
+
+중요:
+1. 금액 단위는 억원으로 통일하세요. 원 단위로 표기된 금액은 억원 단위로 변환하세요 (1억원 = 100,000,000원).
+2. 각 시나리오별 계산에 사용된 가정(EBITDA 승수, 할인율, 성장률 등)을 명확히 포함할 것
+3. EBITDA와 DCF 계산 방식에 대한 간략한 설명 포함
+4. JSON 구조는 유지하되, 각 항목에 대한 설명을 포함하여 결과의 신뢰성 제공
+5. 모든 숫자값은 단위를 제외한 숫자만 출력하고, 콤마(,)나 소수점 외 다른 기호 사용 금지"""
+
+
 class ValuationAnalyzer:
     """LLM을 이용한 기업 가치 평가를 위한 클래스"""
     
-    def __init__(self):
-        """분석기 클래스 초기화"""
+    def __init__(self, response_cache=None, client_pool=None, single_flight=None):
+        """분석기 클래스 초기화
+        
+        Args:
+            response_cache (FileCacheStore, optional): LLM 응답 캐시 (없으면 공유 기본 캐시 사용)
+            client_pool (LLMClientPool, optional): API 클라이언트 풀 (없으면 프로세스 공유 풀 사용)
+            single_flight (SingleFlight, optional): 진행 중인 같은 요청 공유 (없으면 프로세스 공유 목록 사용)
+        """
         self.client = None
+        self.client_pool = client_pool if client_pool is not None else default_client_pool
+        
+        # 여러 세션이 같은 기업을 동시에 평가하면 API를 한 번만 호출하고 응답을 함께 사용
+        self.single_flight = single_flight if single_flight is not None else default_single_flight
+        self.model = "claude-3-7-sonnet-20250219"
+        
+        # LLM 응답 캐시 - 같은 기업/재무 데이터로 다시 분석하면 API를 호출하지 않음
+        self.use_response_cache = True
+        self.response_cache = response_cache if response_cache is not None else default_response_cache
+        
+        # 출력 한도로 잘린 응답은 나머지만 이어서 생성하도록 요청 (최대 횟수)
+        self.max_continuations = 1
+        
+        # 요청별 제한 시간(초) - 진행 중인 같은 요청을 기다리는 세션도 같은 기준으로 기다림
+        self.request_timeout = 180
+        
+        # 프롬프트 캐시 - 고정된 시스템 프롬프트(평가 지침 + JSON 형식)를 캐시 지점으로 표시하고 요청별 사용량 기록
+        self.use_prompt_cache = True
+        self.usage_log = PromptUsageLog()
     
-    def analyze_company_value(self, company_info, financial_data, industry_info, api_key):
+    def analyze_company_value(self, company_info, financial_data, industry_info, api_key, on_section=None):
         """LLM을 이용한 기업 가치 분석
         
         Args:
@@ -24,6 +120,8 @@ class ValuationAnalyzer:
             financial_data (dict): 재무 데이터
             industry_info (dict): 산업 정보
             api_key (str): Anthropic API 키
+            on_section (callable, optional): 응답을 스트리밍으로 받으며 ebitda_valuation 같은 최상위 항목이
+                완성될 때마다 호출할 함수 (키, 값) - 응답이 VALUATION_TEMPLATE 구조에서 벗어나면 생성을 중단함
             
         Returns:
             dict: LLM 분석 결과
@@ -35,32 +133,71 @@ class ValuationAnalyzer:
             }
         
         try:
-            # Anthropic 클라이언트 초기화
-            self.client = Anthropic(api_key=api_key)
-            
             # 재무 데이터 준비
             finances, ratios = self._prepare_financial_data(financial_data)
             sector_info = self._prepare_industry_info(industry_info)
             
             # 프롬프트 생성
             prompt = self._create_valuation_prompt(company_info, finances, ratios, sector_info)
+            system_message = (
+                "당신은 기업 가치 평가와 M&A 분석을 전문으로 하는 금융 애널리스트입니다. 주어진 기업의 재무 데이터를 바탕으로 정확한 기업 가치 평가를 수행하고, 결과를 JSON 형식으로 반환합니다.\n\n"
+                + VALUATION_INSTRUCTIONS
+            )
+            messages = [{
+                "role": "user",
+                "content": prompt
+            }]
+            temperature = 0.2
+            max_tokens = 4000
+            
+            # 같은 요청의 저장된 응답이 있으면 API 호출 없이 사용
+            cache_key = (
+                make_response_key(self.model, system_message, messages, temperature, max_tokens)
+                if self.use_response_cache else None
+            )
+            cached = self.response_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                logger.info("기업 가치 분석: 캐시된 LLM 응답 사용")
+                if on_section is not None:
+                    for key, value in iter_sections(cached, VALUATION_TEMPLATE):
+                        on_section(key, value)
+                return self._parse_llm_response(cached)
+            
+            # API 키별 공유 클라이언트 (연결 재사용, 속도 제한과 재시도는 클라이언트 풀에서 처리)
+            self.client = self.client_pool.client(api_key)
             
             # Anthropic API 호출
-            response = self.client.messages.create(
-                model="claude-3-7-sonnet-20250219",  # Claude 모델 사용
-                # model="claude-3-5-sonnet-20240620",
-                system="당신은 기업 가치 평가와 M&A 분석을 전문으로 하는 금융 애널리스트입니다. 주어진 기업의 재무 데이터를 바탕으로 정확한 기업 가치 평가를 수행하고, 결과를 JSON 형식으로 반환합니다.",
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }],
-                temperature=0.2,
-                max_tokens=4000
+            request = {
+                "model": self.model,  # Claude 모델 사용
+                # "model": "claude-3-5-sonnet-20240620",
+                "system": cacheable_system(system_message) if self.use_prompt_cache else system_message,
+                "messages": messages,
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                "timeout": self.request_timeout
+            }
+            
+            # 다른 세션에서 같은 평가 요청이 진행 중이면 새로 호출하지 않고 그 응답을 함께 사용
+            flight_key = cache_key or make_response_key(self.model, system_message, messages, temperature, max_tokens)
+            response_text, leader = self.single_flight.do(
+                flight_key, lambda: self._request_valuation(request, cache_key, on_section),
+                timeout=self.request_timeout * (self.max_continuations + 1)
             )
+            if not leader:
+                logger.info("기업 가치 분석: 진행 중인 같은 요청의 응답 사용")
+                if on_section is not None:
+                    for key, value in iter_sections(response_text, VALUATION_TEMPLATE):
+                        on_section(key, value)
             
             # 응답 파싱
-            return self._parse_llm_response(response.content[0].text)
+            return self._parse_llm_response(response_text)
             
+        except StreamDivergenceError as e:
+            return {
+                "status": "error",
+                "message": f"응답이 JSON 형식에서 벗어나 생성을 중단했습니다: {str(e)}",
+                "raw_content": e.partial_text
+            }
         except Exception as e:
             logger.error(f"LLM 분석 오류: {str(e)}")
             return {
@@ -68,6 +205,49 @@ class ValuationAnalyzer:
                 "message": f"분석 중 오류가 발생했습니다: {str(e)}"
             }
     
+    def _request_valuation(self, request, cache_key, on_section=None):
+        """API를 호출하고(잘린 응답은 이어서 요청) 응답 텍스트를 캐시에 저장하여 반환"""
+        messages = request["messages"]
+        parser = None
+        if on_section is None:
+            response = self.client_pool.call(self.client.messages.create, request)
+            self.usage_log.record(response)
+        else:
+            # 프롬프트가 계산 과정 설명을 요구하므로 JSON 앞의 짧은 설명문은 허용
+            parser = StreamingJsonParser(VALUATION_TEMPLATE, max_preamble_chars=1000)
+            response = self._stream_response(request, parser, on_section)
+            self.usage_log.record(response)
+        response_text = response.content[0].text
+        
+        # 출력 한도로 잘린 경우 받은 부분을 assistant 메시지로 넘겨 나머지만 생성
+        for _ in range(self.max_continuations):
+            if response.stop_reason != "max_tokens":
+                break
+            logger.info(f"기업 가치 분석: 잘린 응답 이어서 요청 ({len(response_text)}자 수신)")
+            response_text = response_text.rstrip()
+            response = self.client_pool.call(self.client.messages.create, dict(request, messages=messages + [
+                {"role": "assistant", "content": response_text}
+            ]))
+            self.usage_log.record(response, "continuation")
+            continuation = response.content[0].text
+            response_text += continuation
+            if parser is not None:
+                for key, value in parser.feed(continuation):
+                    on_section(key, value)
+        
+        # 출력 한도로 잘리지 않은 응답만 저장
+        if cache_key and response.stop_reason != "max_tokens":
+            self.response_cache.set(cache_key, response_text)
+        return response_text
+    
+    def _stream_response(self, request, parser, on_section):
+        """응답을 스트리밍으로 받아 완성된 최상위 항목을 전달하고 최종 메시지 반환 (구조가 어긋나면 중단)"""
+        with self.client_pool.stream(self.client, request) as stream:
+            for text in stream.text_stream:
+                for key, value in parser.feed(text):
+                    on_section(key, value)
+            return stream.get_final_message()
+    
     def _prepare_financial_data(self, financial_data):
         """재무 데이터 준비"""
         years = financial_data.get("years", [])
@@ -165,79 +345,35 @@ class ValuationAnalyzer:
         
         {sector_info}
         
-        다음 형식으로 분석해주세요:
-        
-        1. EBITDA와 DCF 두가지 방식으로 보수적, 기본, 낙관적 3가지로 기업가치를 평가
-        2. 결과는 다음 JSON 구조로 출력하되, 계산 과정과 가정에 대한 설명도 포함할 것:
-        
-        {{
-          "company": "{company_name}",
-          "ebitda_valuation": {{
-            "conservative": 숫자값,
-            "base": 숫자값,
-            "optimistic": 숫자값
-          }},
-          "dcf_valuation": {{
-            "conservative": 숫자값,
-            "base": 숫자값,
-            "optimistic": 숫자값
-          }},
-          "assumptions": {{
-            "ebitda_multipliers": {{
-              "conservative": 숫자값,
-              "base": 숫자값,
-              "optimistic": 숫자값
-            }},
-            "discount_rates": {{
-              "conservative": 숫자값,
-              "base": 숫자값,
-              "optimistic": 숫자값
-            }},
-            "growth_rates": {{
-              "conservative": 숫자값,
-              "base": 숫자값,
-              "optimistic": 숫자값
-            }},
-            "terminal_growth_rates": {{
-              "conservative": 숫자값,
-              "base": 숫자값,
-              "optimistic": 숫자값
-            }}
-          }},
-          "calculations": {{
-            "ebitda_description": "EBITDA 계산 방식에 대한 설명",
-            "dcf_description": "DCF 계산 방식에 대한 간략한 설명"
-          }},
-          "summary": "기업 가치 평가에 대한 종합적인 분석 및 설명"
-        }}
-        
-        중요:
-        1. 금액 단위는 억원으로 통일하세요. 원 단위로 표기된 금액은 억원 단위로 변환하세요 (1억원 = 100,000,000원).
-        2. 각 시나리오별 계산에 사용된 가정(EBITDA 승수, 할인율, 성장률 등)을 명확히 포함할 것
-        3. EBITDA와 DCF 계산 방식에 대한 간략한 설명 포함
-        4. JSON 구조는 유지하되, 각 항목에 대한 설명을 포함하여 결과의 신뢰성 제공
-        5. 모든 숫자값은 단위를 제외한 숫자만 출력하고, 콤마(,)나 소수점 외 다른 기호 사용 금지
+        위 데이터로 기업 가치를 평가해주세요.
         """
         return prompt
     
     def _parse_llm_response(self, response):
-        """LLM 응답 파싱"""
+        """LLM 응답 파싱
+        
+        바로 읽을 수 없으면 주석, 마지막 쉼표, 잘린 괄호 등을 고쳐서 다시 읽고,
+        VALUATION_TEMPLATE과 다른 항목은 warnings로 함께 반환함
+        """
         try:
             # 텍스트에서 JSON 부분만 추출
             json_pattern = r'({[\s\S]*})'
             match = re.search(json_pattern, response)
             
-            if match:
-                json_str = match.group(1)
-                valuation_data = json.loads(json_str)
-            else:
-                # 응답이 이미 JSON 형식이면 바로 로드
-                valuation_data = json.loads(response)
+            try:
+                valuation_data = json.loads(match.group(1) if match else response)
+            except json.JSONDecodeError:
+                valuation_data, _ = repair_json(response)
             
-            return {
+            result = {
                 "status": "success",
                 "valuation_data": valuation_data
             }
+            issues = validate_against_template(valuation_data, VALUATION_TEMPLATE)
+            if issues:
+                logger.warning(f"가치 평가 응답 검증: {', '.join(issues)}")
+                result["warnings"] = issues
+            return result
         
         except json.JSONDecodeError as e:
             logger.error(f"JSON 파싱 오류: {str(e)}")
@@ -245,4 +381,4 @@ class ValuationAnalyzer:
                 "status": "error",
                 "message": f"JSON 파싱 오류: {str(e)}",
                 "raw_content": response
-            }
\ No newline at end of file
+            }